@@ -4,10 +4,11 @@ import altair as alt
 import pandas as pd
 import streamlit as st
 from millify import millify
-from sqlalchemy import func
 
 from constants import COLORS
-from database.models import Amenities, Cities, ListingsCore, Neighborhoods
+from database.engine import SERVE, create_session
+from database.page_queries import dataset_counts, listings_by_city
+from database.query_cache import cached_query, cached_scalar, describe_query_cache
 
 # Configure the page -----------------------------------------------------------
 st.set_page_config(
@@ -26,34 +27,22 @@ st.sidebar.markdown("Developed by Ben Harman and powered by Streamlit.")
 if st.sidebar.button("🌐 benharman.dev"):
     webbrowser.open_new_tab("https://benharman.dev")
 
-# Establish a connection to the SQLite database
-conn = st.experimental_connection("listings_sqlite", type="sql")
-
-
-# Generate metrics--------------------------------------------------------------
-listings_count = conn.session.query(func.count(ListingsCore.listing_id)).scalar()
-amenities_count = conn.session.query(func.count(Amenities.amenity_id)).scalar()
-cities_count = conn.session.query(func.count(Cities.city_id)).scalar()
-neighborhoods_count = conn.session.query(
-    func.count(Neighborhoods.neighborhood_id)
-).scalar()
-
-
-# Generate listings count by city chart ----------------------------------------
-# Define the listings count SQL query
-listings_city_counts = pd.DataFrame(
-    (
-        conn.session.query(
-            Cities.city.label("City"),
-            func.count(ListingsCore.listing_id).label("Count"),
-        )
-        .join(
-            Neighborhoods, Neighborhoods.neighborhood_id == ListingsCore.neighborhood_id
-        )
-        .join(Cities, Cities.city_id == ListingsCore.city_id)
-        .group_by(Cities.city)
-    ).all()
-)
+# Generate metrics and listings count by city --------------------------------
+# Page sessions share the pooled, read-only serving engine; closing the session at the end of the block returns
+# its connection to the pool rather than leaving it to the garbage collector
+with create_session(SERVE) as session:
+    # Page queries are cached per dataset version and shared by every session
+    counts = {
+        name: cached_scalar(session, statement)
+        for name, statement in dataset_counts().items()
+    }
+    listings_count = counts["listings"]
+    amenities_count = counts["amenities"]
+    cities_count = counts["cities"]
+    neighborhoods_count = counts["neighborhoods"]
+
+    # Listings count by city
+    listings_city_counts = cached_query(session, listings_by_city())
 
 
 listings_city_counts_chart = (
@@ -103,7 +92,9 @@ with chart_col:
     metric3.metric("Listings", millify(listings_count))
 
     st.markdown(
-        "First review was on **May 3, 2009** and data was last updated on **March 31, 2023**. Some cities had data up to May 17th but were excluded to only keep complete quarters. Listings with no reviews in or after 2022 were deemed inactive and removed. Because I am primarily interested in studying short term rentals (STRs), listings with 7+ nights required for a booking were also filtered out. Host and listing IDs were anonymized and listing geocoordinates removed for privacy."
+        "First review was on **May 3, 2009** and data was last updated on **March 31, 2023**. Some cities had data up to May 17th but were excluded to only keep complete quarters. Listings with no reviews in or after 2022 were deemed inactive and removed. Because I am primarily interested in studying short term rentals (STRs), listings with 7+ nights required for a booking were also filtered out. Host and listing IDs were anonymized. Listing coordinates are kept to place listings on the maps; they are the approximate locations Inside Airbnb publishes, which Airbnb offsets by up to 150 meters to protect hosts' privacy."
     )
 
     st.altair_chart(listings_city_counts_chart, use_container_width=True)
+
+st.sidebar.caption(describe_query_cache())
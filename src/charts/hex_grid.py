@@ -0,0 +1,125 @@
+"""
+Hexagonal grid for the density maps, in pure NumPy.
+
+A city's listings are projected to metres on an equirectangular projection around the city's reference latitude
+(x east, y north) and binned into pointy-top hexagons, addressed by axial coordinates (q, r). Every resolution in
+RESOLUTIONS is a cell size: the distance between the centres of neighbouring cells.
+
+The build (`setup/generate_hex_cell_stats.py`) stores per-cell aggregates with the cell's (q, r), size and reference
+latitude; the Maps page turns those back into outlines with `hex_features`, so no geometry is stored.
+"""
+
+import math
+
+import numpy as np
+
+from database.spatial import EARTH_RADIUS_METERS
+
+# Cell sizes in metres, coarsest first
+RESOLUTIONS = {
+    "2 km": 2_000,
+    "1 km": 1_000,
+    "500 m": 500,
+}
+
+SQRT_3 = math.sqrt(3)
+
+
+def reference_latitude(latitudes):
+    """Latitude a city's grid is projected around: the median of its listings, to 0.01 degree."""
+    return round(float(np.median(latitudes)), 2)
+
+
+def project(latitudes, longitudes, reference):
+    """Degrees to (x, y) metres on the equirectangular projection around the reference latitude."""
+    x = EARTH_RADIUS_METERS * np.radians(longitudes) * math.cos(math.radians(reference))
+    y = EARTH_RADIUS_METERS * np.radians(latitudes)
+    return x, y
+
+
+def unproject(x, y, reference):
+    """(x, y) metres back to (latitudes, longitudes) in degrees."""
+    latitudes = np.degrees(np.asarray(y) / EARTH_RADIUS_METERS)
+    longitudes = np.degrees(
+        np.asarray(x) / (EARTH_RADIUS_METERS * math.cos(math.radians(reference)))
+    )
+    return latitudes, longitudes
+
+
+def hex_bin(x, y, cell_size):
+    """
+    Axial coordinates of the cell each point falls in.
+
+    Returns:
+    - (q, r) integer arrays aligned with the points.
+    """
+    radius = cell_size / SQRT_3
+    q = (SQRT_3 / 3 * np.asarray(x) - np.asarray(y) / 3) / radius
+    r = (2 / 3 * np.asarray(y)) / radius
+
+    # Round in cube coordinates (q + r + s = 0), fixing the component that moved the most
+    s = -q - r
+    rounded_q, rounded_r, rounded_s = np.round(q), np.round(r), np.round(s)
+    error_q = np.abs(rounded_q - q)
+    error_r = np.abs(rounded_r - r)
+    error_s = np.abs(rounded_s - s)
+    fix_q = (error_q > error_r) & (error_q > error_s)
+    fix_r = ~fix_q & (error_r > error_s)
+    rounded_q = np.where(fix_q, -rounded_r - rounded_s, rounded_q)
+    rounded_r = np.where(fix_r, -rounded_q - rounded_s, rounded_r)
+    return rounded_q.astype(np.int64), rounded_r.astype(np.int64)
+
+
+def hex_centers(q, r, cell_size):
+    """(x, y) metres of the centres of cells."""
+    q, r = np.asarray(q), np.asarray(r)
+    return cell_size * (q + r / 2), cell_size * SQRT_3 / 2 * r
+
+
+def hex_outline(q, r, cell_size, reference):
+    """
+    Closed ring of a cell's corners as [longitude, latitude] pairs.
+
+    The ring runs clockwise, like the neighborhood shapes: Vega's map projections take a counter-clockwise ring as
+    everything outside it.
+    """
+    center_x, center_y = hex_centers(q, r, cell_size)
+    angles = np.radians(30 - 60 * np.arange(7))
+    radius = cell_size / SQRT_3
+    latitudes, longitudes = unproject(
+        center_x + radius * np.cos(angles),
+        center_y + radius * np.sin(angles),
+        reference,
+    )
+    return [[float(lon), float(lat)] for lat, lon in zip(latitudes, longitudes)]
+
+
+def hex_features(cells):
+    """
+    GeoJSON features of grid cells.
+
+    Parameters:
+    - cells: DataFrame with q, r, cell_size_meters and reference_latitude columns; every other column becomes a
+      feature property.
+
+    Returns:
+    - List of GeoJSON Feature dicts, one hexagon per cell.
+    """
+    cell_columns = ["q", "r", "cell_size_meters", "reference_latitude"]
+    # NaN (e.g. no prices in a cell) becomes null, which JSON can hold
+    properties = cells.drop(columns=cell_columns)
+    properties = properties.astype(object).where(properties.notna(), None)
+    return [
+        {
+            "type": "Feature",
+            "geometry": {
+                "type": "Polygon",
+                "coordinates": [hex_outline(q, r, cell_size, reference)],
+            },
+            "properties": values,
+        }
+        for (q, r, cell_size, reference), values in zip(
+            cells[cell_columns].itertuples(index=False, name=None),
+            properties.to_dict("records"),
+        )
+    ]
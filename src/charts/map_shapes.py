@@ -0,0 +1,42 @@
+"""
+Neighborhood shapes for the Maps page, served from local disk.
+
+`setup/generate_map_shapes.py` writes a simplified, coordinate-quantized copy of each city's neighbourhoods.geojson
+to data/maps/. The page loads a city's shapes from there, falling back to the full-resolution file under data/usa/
+when no simplified copy exists. Parsed files are cached per process and re-read only when they change.
+"""
+
+import os
+
+from utilities import JsonFileCache
+
+SOURCE_DIR = "data/usa"
+MAPS_DIR = "data/maps"
+
+_shape_caches = {}
+
+
+def source_shapes_path(city):
+    return os.path.join(SOURCE_DIR, city, "neighbourhoods.geojson")
+
+
+def simplified_shapes_path(city):
+    return os.path.join(MAPS_DIR, f"{city}.geojson")
+
+
+def load_neighborhood_shapes(city):
+    """
+    Load the neighborhood features of a city.
+
+    Returns:
+    - The GeoJSON features, or None if the city has no shapes on disk.
+    """
+    path = simplified_shapes_path(city)
+    if not os.path.exists(path):
+        path = source_shapes_path(city)
+
+    if path not in _shape_caches:
+        _shape_caches[path] = JsonFileCache(path)
+
+    shapes = _shape_caches[path].get()
+    return shapes["features"] if shapes is not None else None
@@ -1,91 +1,26 @@
-from datetime import datetime
-
 import altair as alt
 
 alt.data_transformers.enable("vegafusion")
 
-import pandas as pd
-from dateutil.relativedelta import relativedelta
-from sqlalchemy import func
-
-from constants import COLORS
-from database.models import (
-    Cities,
-    Hosts,
-    ListingsCore,
-    ListingsReviewsSummary,
-    Neighborhoods,
-    RoomTypes,
+from charts.overview_data import (
+    active_listings_hosts_age_data,
+    neighborhood_listings_count_data,
+    room_types_data,
 )
-from utilities import load_chart_data_from_file
-
-
-def calculate_age(start_date_str, end_date_str="2023-10-01"):
-    if start_date_str is None:
-        return None
-
-    start_date = datetime.strptime(start_date_str, "%Y-%m-%d")
-    end_date = datetime.strptime(end_date_str, "%Y-%m-%d")
-    delta = relativedelta(end_date, start_date)
-    return delta.years
+from charts.store import load_chart_data
+from constants import COLORS
 
 
 def chart_active_listings_hosts_age(session, city):
-    print(f"Processing city: {city}")  # Logging the current city
+    # Load stored chart data for the city
+    source = load_chart_data("chart_active_listings_hosts_age", city)
 
-    # Construct the chart name to match the JSON key
-    chart_name = f"chart_active_listings_hosts_age_{city}"
-
-    # Load chart data from JSON file
-    data_values = load_chart_data_from_file(chart_name)
-
-    # If data exists in the JSON file, use it
-    if data_values:
-        source = pd.DataFrame(data_values)
-        print(f"Loaded data from JSON file for city: {city}")
+    # If data exists in the chart store, use it
+    if source is not None:
+        print(f"Loaded stored chart data for city: {city}")
     # Otherwise, perform the database query
     else:
-        query = (
-            session.query(
-                ListingsCore, ListingsReviewsSummary, Hosts, Neighborhoods, Cities
-            )
-            .join(
-                ListingsReviewsSummary,
-                ListingsReviewsSummary.listing_id == ListingsCore.listing_id,
-            )
-            .join(Hosts, Hosts.host_id == ListingsCore.host_id)
-            .join(
-                Neighborhoods,
-                Neighborhoods.neighborhood_id == ListingsCore.neighborhood_id,
-            )
-            .join(Cities, Cities.city_id == ListingsCore.city_id)
-            .filter(ListingsCore.was_active_most_recent_quarter == 1)
-        )
-
-        if city != "All Cities":
-            query = query.filter(Cities.city == city)
-
-        data = []
-        for lc, lrs, h, n, c in query:
-            host_age = calculate_age(h.host_since)
-            listing_age = calculate_age(lrs.first_review)
-
-            if host_age is not None:
-                data.append({"id": lc.host_id, "age": host_age, "type": "Hosts"})
-
-            if listing_age is not None:
-                data.append(
-                    {"id": lc.listing_id, "age": listing_age, "type": "Listings"}
-                )
-
-        source = pd.DataFrame(data)
-
-        if source.empty:
-            print(f"No data available for city: {city}")
-            return None
-
-        # Grouping by 'age' and 'type' and counting the occurrences
-        source = source.groupby(["age", "type"]).size().reset_index(name="count")
+        source = active_listings_hosts_age_data(session, city)
 
     # Check if DataFrame is empty and log it
     if source.empty:
@@ -111,34 +46,15 @@ def chart_active_listings_hosts_age(session, city):
 
 
 def chart_room_types(session, city):
-    print(f"Processing room types for city: {city}")  # Logging the current city
-
-    # Construct the chart name to match the JSON key
-    chart_name = f"chart_room_types_{city}"
-
-    # Load chart data from JSON file
-    data_values = load_chart_data_from_file(chart_name)
+    # Load stored chart data for the city
+    source = load_chart_data("chart_room_types", city)
 
-    # If data exists in the JSON file, use it
-    if data_values:
-        source = pd.DataFrame(data_values)
-        print(f"Loaded data from JSON file for city: {city}")
+    # If data exists in the chart store, use it
+    if source is not None:
+        print(f"Loaded stored chart data for city: {city}")
     # Otherwise, perform the database query
     else:
-        query = (
-            session.query(RoomTypes.room_type, func.count(ListingsCore.listing_id))
-            .join(RoomTypes, RoomTypes.room_type_id == ListingsCore.room_type_id)
-            .group_by(RoomTypes.room_type)
-        )
-
-        if city != "All Cities":
-            query = query.filter(ListingsCore.city_id == Cities.city_id).filter(
-                Cities.city == city
-            )
-
-        data = [{"Room Type": rt, "Count": count} for rt, count in query]
-
-        source = pd.DataFrame(data)
+        source = room_types_data(session, city)
 
     # Check if DataFrame is empty and log it
     if source.empty:
@@ -164,42 +80,14 @@ def chart_room_types(session, city):
 
 
 def chart_neighborhood_listings_count(session, city):
-    print(f"Processing listing counts by neighborhoods for city: {city}")
+    # Load stored chart data for the city
+    source = load_chart_data("chart_neighborhood_listings_count", city)
 
-    # Construct the chart name to match the JSON key
-    chart_name = f"chart_neighborhood_listings_count_{city}"
-
-    # Load chart data from JSON file
-    data_values = load_chart_data_from_file(chart_name)
-
-    # If data exists in the JSON file, use it
-    if data_values:
-        source = pd.DataFrame(data_values)
-        print(f"Loaded data from JSON file for city: {city}")
+    # If data exists in the chart store, use it
+    if source is not None:
+        print(f"Loaded stored chart data for city: {city}")
     else:
-        query = (
-            session.query(
-                Neighborhoods.neighborhood, func.count(ListingsCore.listing_id)
-            )
-            .join(
-                ListingsCore,
-                ListingsCore.neighborhood_id == Neighborhoods.neighborhood_id,
-            )
-            .group_by(Neighborhoods.neighborhood)
-        )
-
-        if city != "All Cities":
-            query = query.filter(ListingsCore.city_id == Cities.city_id).filter(
-                Cities.city == city
-            )
-
-        listing_counts = [
-            {"Neighborhood": n, "Listing Count": count} for n, count in query
-        ]
-
-        source = pd.DataFrame(listing_counts)
-
-        # Optionally: Save the new data to a JSON file here
+        source = neighborhood_listings_count_data(session, city)
 
     # Check if DataFrame is empty and log it
     if source.empty:
@@ -0,0 +1,137 @@
+"""
+Data producers for the overview charts.
+
+Each producer queries the database and returns the tidy DataFrame its chart in `overview_charts` renders. They do
+not import Altair, so the chart-data build can run them without building chart specs.
+"""
+
+import pandas as pd
+from sqlalchemy import Integer, func, inspect, type_coerce
+
+from database.models import (
+    BuildMetadata,
+    Hosts,
+    ListingsCore,
+    ListingsReviewsSummary,
+    Neighborhoods,
+    RoomTypes,
+)
+from database.scoping import CURRENT_COHORT, scoped
+
+# Reference date of databases built before the scrape date was stamped
+DEFAULT_AS_OF_DATE = "2023-10-01"
+
+
+def dataset_as_of_date(session):
+    """Date the dataset runs up to: the scrape date stamped into BuildMetadata by the build."""
+    scrape_date = None
+    if inspect(session.get_bind()).has_table(BuildMetadata.__tablename__):
+        scrape_date = (
+            session.query(BuildMetadata.value)
+            .filter(BuildMetadata.key == "scrape_date")
+            .scalar()
+        )
+    return pd.Timestamp(scrape_date or DEFAULT_AS_OF_DATE)
+
+
+def whole_years_between(start_dates: pd.Series, end_date: pd.Timestamp) -> pd.Series:
+    """
+    Whole years from each start date to the end date, matching relativedelta(end, start).years. Start dates after
+    the end date count as zero years.
+    """
+    years = end_date.year - start_dates.dt.year
+    before_anniversary = (start_dates.dt.month > end_date.month) | (
+        (start_dates.dt.month == end_date.month) & (start_dates.dt.day > end_date.day)
+    )
+    return (years - before_anniversary.astype(int)).clip(lower=0)
+
+
+def day_numbers_to_timestamps(days: pd.Series) -> pd.Series:
+    """Timestamps of raw day numbers (see models.DayNumber); missing days become NaT."""
+    return pd.to_datetime(days, unit="D", origin="unix")
+
+
+def active_listings_hosts_age_data(session, city):
+    print(f"Processing city: {city}")  # Logging the current city
+
+    query = (
+        session.query(
+            ListingsCore.host_id,
+            # Raw day numbers, converted to timestamps in one step rather than decoded to strings row by row
+            type_coerce(Hosts.host_since, Integer),
+            ListingsCore.listing_id,
+            type_coerce(ListingsReviewsSummary.first_review, Integer),
+        )
+        .join(
+            ListingsReviewsSummary,
+            ListingsReviewsSummary.listing_id == ListingsCore.listing_id,
+        )
+        .join(Hosts, Hosts.host_id == ListingsCore.host_id)
+    )
+
+    query = scoped(query, city, cohort=CURRENT_COHORT)
+
+    rows = pd.DataFrame(
+        query.all(), columns=["host_id", "host_since", "listing_id", "first_review"]
+    )
+
+    if rows.empty:
+        return pd.DataFrame(columns=["age", "type", "count"])
+
+    as_of_date = dataset_as_of_date(session)
+
+    # Each host is counted once, however many active listings they have
+    hosts = rows.drop_duplicates(subset="host_id")
+    host_ages = whole_years_between(
+        day_numbers_to_timestamps(hosts["host_since"]), as_of_date
+    )
+    listing_ages = whole_years_between(
+        day_numbers_to_timestamps(rows["first_review"]), as_of_date
+    )
+
+    ages = pd.concat(
+        [
+            pd.DataFrame({"age": host_ages, "type": "Hosts"}),
+            pd.DataFrame({"age": listing_ages, "type": "Listings"}),
+        ],
+        ignore_index=True,
+    ).dropna(subset=["age"])
+    ages["age"] = ages["age"].astype(int)
+
+    # Grouping by 'age' and 'type' and counting the occurrences
+    return ages.groupby(["age", "type"]).size().reset_index(name="count")
+
+
+def room_types_data(session, city):
+    print(f"Processing room types for city: {city}")  # Logging the current city
+
+    query = (
+        session.query(RoomTypes.room_type, func.count(ListingsCore.listing_id))
+        .join(RoomTypes, RoomTypes.room_type_id == ListingsCore.room_type_id)
+        .group_by(RoomTypes.room_type)
+    )
+
+    query = scoped(query, city)
+
+    data = [{"Room Type": rt, "Count": count} for rt, count in query]
+
+    return pd.DataFrame(data)
+
+
+def neighborhood_listings_count_data(session, city):
+    print(f"Processing listing counts by neighborhoods for city: {city}")
+
+    query = (
+        session.query(Neighborhoods.neighborhood, func.count(ListingsCore.listing_id))
+        .join(
+            ListingsCore,
+            ListingsCore.neighborhood_id == Neighborhoods.neighborhood_id,
+        )
+        .group_by(Neighborhoods.neighborhood)
+    )
+
+    query = scoped(query, city)
+
+    listing_counts = [{"Neighborhood": n, "Listing Count": count} for n, count in query]
+
+    return pd.DataFrame(listing_counts)
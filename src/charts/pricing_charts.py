@@ -1,43 +1,23 @@
 import altair as alt
-import pandas as pd
-from sqlalchemy import func
 
+from charts.pricing_data import (
+    mean_room_type_prices_data,
+    median_neighborhood_prices_data,
+)
+from charts.store import load_chart_data
 from constants import COLORS
-from database.models import Cities, ListingsCore, Neighborhoods, RoomTypes
-from utilities import load_chart_data_from_file
 
 
 def chart_mean_room_type_prices(session, city):
-    print(
-        f"Processing price distribution by room types for city: {city}"
-    )  # Logging the current city
+    # Load stored chart data for the city
+    source = load_chart_data("chart_mean_room_type_prices", city)
 
-    # Construct the chart name to match the JSON key
-    chart_name = f"chart_price_dist_by_room_type_{city}"
-
-    # Load chart data from JSON file
-    data_values = load_chart_data_from_file(chart_name)
-
-    # If data exists in the JSON file, use it
-    if data_values:
-        source = pd.DataFrame(data_values)
-        print(f"Loaded data from JSON file for city: {city}")
+    # If data exists in the chart store, use it
+    if source is not None:
+        print(f"Loaded stored chart data for city: {city}")
     # Otherwise, perform the database query
     else:
-        query = (
-            session.query(RoomTypes.room_type, func.avg(ListingsCore.price))
-            .join(RoomTypes, RoomTypes.room_type_id == ListingsCore.room_type_id)
-            .group_by(RoomTypes.room_type)
-        )
-
-        if city != "All Cities":
-            query = query.filter(ListingsCore.city_id == Cities.city_id).filter(
-                Cities.city == city
-            )
-
-        data = [{"Room Type": rt, "Average Price": price} for rt, price in query]
-
-        source = pd.DataFrame(data)
+        source = mean_room_type_prices_data(session, city)
 
     # Check if DataFrame is empty and log it
     if source.empty:
@@ -65,59 +45,15 @@ def chart_mean_room_type_prices(session, city):
 
 
 def chart_median_neighborhood_prices(session, city):
-    print(
-        f"Processing price distribution by room types for city: {city}"
-    )  # Logging the current city
-
-    # Construct the chart name to match the JSON key
-    chart_name = f"chart_median_neighborhood_prices_{city}"
-
-    # Load chart data from JSON file
-    data_values = load_chart_data_from_file(chart_name)
+    # Load stored chart data for the city
+    source = load_chart_data("chart_median_neighborhood_prices", city)
 
-    # If data exists in the JSON file, use it
-    if data_values:
-        source = pd.DataFrame(data_values)
-        print(f"Loaded data from JSON file for city: {city}")
+    # If data exists in the chart store, use it
+    if source is not None:
+        print(f"Loaded stored chart data for city: {city}")
     # Otherwise, perform the database query
     else:
-        query = session.query(Neighborhoods.neighborhood, ListingsCore.price).join(
-            Neighborhoods, Neighborhoods.neighborhood_id == ListingsCore.neighborhood_id
-        )
-
-        if city != "All Cities":
-            query = query.filter(ListingsCore.city_id == Cities.city_id).filter(
-                Cities.city == city
-            )
-
-        # Execute the query and get data
-        data = query.all()
-
-        # Processing the data to calculate medians
-        neighborhoods = {}
-        for neighborhood, price in data:
-            if neighborhood not in neighborhoods:
-                neighborhoods[neighborhood] = []
-            neighborhoods[neighborhood].append(price)
-
-        # Calculate median and sort by median price
-        median_prices = []
-        for neighborhood, prices in neighborhoods.items():
-            prices.sort()
-            n = len(prices)
-            median = (
-                prices[n // 2]
-                if n % 2 != 0
-                else (prices[n // 2 - 1] + prices[n // 2]) / 2
-            )
-            median_prices.append({"Neighborhood": neighborhood, "Median Price": median})
-
-        # Sort neighborhoods by median price in descending order
-        median_prices = sorted(
-            median_prices, key=lambda x: x["Median Price"], reverse=True
-        )
-
-        source = pd.DataFrame(median_prices)
+        source = median_neighborhood_prices_data(session, city)
 
     # Check if DataFrame is empty and log it
     if source.empty:
@@ -0,0 +1,67 @@
+"""
+Data producers for the pricing charts.
+
+Each producer queries the database and returns the tidy DataFrame its chart in `pricing_charts` renders, without
+importing Altair.
+"""
+
+import pandas as pd
+from sqlalchemy import func
+
+from database.models import ListingsCore, Neighborhoods, RoomTypes
+from database.scoping import scoped
+
+
+def mean_room_type_prices_data(session, city):
+    print(
+        f"Processing price distribution by room types for city: {city}"
+    )  # Logging the current city
+
+    query = (
+        session.query(RoomTypes.room_type, func.avg(ListingsCore.price))
+        .join(RoomTypes, RoomTypes.room_type_id == ListingsCore.room_type_id)
+        .group_by(RoomTypes.room_type)
+    )
+
+    query = scoped(query, city)
+
+    data = [{"Room Type": rt, "Average Price": price} for rt, price in query]
+
+    return pd.DataFrame(data)
+
+
+def median_neighborhood_prices_data(session, city):
+    print(
+        f"Processing median prices by neighborhood for city: {city}"
+    )  # Logging the current city
+
+    query = session.query(Neighborhoods.neighborhood, ListingsCore.price).join(
+        Neighborhoods, Neighborhoods.neighborhood_id == ListingsCore.neighborhood_id
+    )
+
+    query = scoped(query, city)
+
+    # Execute the query and get data
+    data = query.all()
+
+    # Processing the data to calculate medians
+    neighborhoods = {}
+    for neighborhood, price in data:
+        if neighborhood not in neighborhoods:
+            neighborhoods[neighborhood] = []
+        neighborhoods[neighborhood].append(price)
+
+    # Calculate median and sort by median price
+    median_prices = []
+    for neighborhood, prices in neighborhoods.items():
+        prices.sort()
+        n = len(prices)
+        median = (
+            prices[n // 2] if n % 2 != 0 else (prices[n // 2 - 1] + prices[n // 2]) / 2
+        )
+        median_prices.append({"Neighborhood": neighborhood, "Median Price": median})
+
+    # Sort neighborhoods by median price in descending order
+    median_prices = sorted(median_prices, key=lambda x: x["Median Price"], reverse=True)
+
+    return pd.DataFrame(median_prices)
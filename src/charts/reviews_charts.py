@@ -1,76 +1,23 @@
 import altair as alt
-import numpy as np
-import pandas as pd
-from sqlalchemy import and_, create_engine, func
-from sqlalchemy.orm import aliased
 
-from database.models import Cities, Hosts, ListingsCore, ListingsReviewsSummary
-from utilities import load_chart_data_from_file
+from charts.reviews_data import (
+    review_scores_price_correlation_data,
+    review_scores_superhost_data,
+)
+from charts.store import load_chart_data
 
 
 def chart_review_scores_superhost(session, city):
-    print(f"Processing superhost review scores for city: {city}")
+    source = load_chart_data("chart_review_scores_superhost", city)
 
-    chart_name = f"chart_review_scores_superhost_{city}"
-    data_values = load_chart_data_from_file(chart_name)
-
-    if data_values:
-        source = pd.DataFrame(data_values)
-        print(f"Loaded data from JSON file for city: {city}")
+    if source is not None:
+        print(f"Loaded stored chart data for city: {city}")
     else:
-        query = (
-            session.query(ListingsReviewsSummary, Hosts.host_is_superhost)
-            .join(
-                ListingsCore,
-                ListingsReviewsSummary.listing_id == ListingsCore.listing_id,
-            )
-            .join(Hosts, ListingsCore.host_id == Hosts.host_id)
-        )
-
-        if city != "All Cities":
-            query = query.filter(Cities.city == city)
+        source = review_scores_superhost_data(session, city)
 
-        data = []
-        for rs, host_is_superhost in query:
-            data.append(
-                {
-                    "Superhost": host_is_superhost,
-                    "Accuracy": rs.review_scores_accuracy,
-                    "Cleanliness": rs.review_scores_cleanliness,
-                    "Checkin": rs.review_scores_checkin,
-                    "Communication": rs.review_scores_communication,
-                    "Location": rs.review_scores_location,
-                    "Value": rs.review_scores_value,
-                }
-            )
-
-        source = pd.DataFrame(data)
-
-        if source.empty:
-            print(f"No data available for city: {city}")
-            return None
-
-        source["Superhost"] = source["Superhost"].apply(
-            lambda x: "Superhost" if x == 1 else "Non-Superhost"
-        )
-
-        # Melting the DataFrame to have review types as a single column
-        source = source.melt(
-            id_vars=["Superhost"],
-            value_vars=[
-                "Accuracy",
-                "Cleanliness",
-                "Checkin",
-                "Communication",
-                "Location",
-                "Value",
-            ],
-            var_name="review_type",
-            value_name="score",
-        )
-
-        # Group by Superhost status and review type and then calculate the median
-        source = source.groupby(["Superhost", "review_type"]).median().reset_index()
+    if source.empty:
+        print(f"No data available for city: {city}")
+        return None
 
     # Calculate the minimum score to adjust y-axis
     min_score = source["score"].min() - 0.25
@@ -94,68 +41,16 @@ def chart_review_scores_superhost(session, city):
 
 
 def chart_review_scores_price_correlation(session, city):
-    print(f"Processing review scores vs price correlation for city: {city}")
-
-    chart_name = f"chart_review_scores_price_correlation_{city}"
-    data_values = load_chart_data_from_file(chart_name)
+    source = load_chart_data("chart_review_scores_price_correlation", city)
 
-    if data_values:
-        source = pd.DataFrame(data_values)
-        print(f"Loaded data from JSON file for city: {city}")
+    if source is not None:
+        print(f"Loaded stored chart data for city: {city}")
     else:
-        # Perform a query to get all types of review scores and prices
-        query = session.query(ListingsReviewsSummary, ListingsCore.price).join(
-            ListingsCore,
-            ListingsReviewsSummary.listing_id == ListingsCore.listing_id,
-        )
-
-        if city != "All Cities":
-            query = query.filter(Cities.city == city)
-
-        data = []
-        for rs, price in query:
-            data.append(
-                {
-                    "price": price,
-                    "Accuracy": rs.review_scores_accuracy,
-                    "Cleanliness": rs.review_scores_cleanliness,
-                    "Checkin": rs.review_scores_checkin,
-                    "Communication": rs.review_scores_communication,
-                    "Location": rs.review_scores_location,
-                    "Value": rs.review_scores_value,
-                }
-            )
-
-        source = pd.DataFrame(data)
-
-        if source.empty:
-            print(f"No data available for city: {city}")
-            return None
+        source = review_scores_price_correlation_data(session, city)
 
-        # Assigning price percentiles
-        source["price_percentile"] = pd.qcut(
-            source["price"], 20, labels=False, duplicates="drop"
-        )
-
-        # Melting the DataFrame to have review types as a single column
-        source = source.melt(
-            id_vars=["price_percentile"],
-            value_vars=[
-                "Accuracy",
-                "Cleanliness",
-                "Checkin",
-                "Communication",
-                "Location",
-                "Value",
-            ],
-            var_name="review_type",
-            value_name="score",
-        )
-
-        # Group by price percentiles and review type and then calculate the median
-        source = (
-            source.groupby(["price_percentile", "review_type"]).median().reset_index()
-        )
+    if source.empty:
+        print(f"No data available for city: {city}")
+        return None
 
     # Calculate the 5th percentile value across all review groups
     min_score_percentile = source["score"].quantile(0.00)
@@ -0,0 +1,128 @@
+"""
+Data producers for the review charts.
+
+Each producer queries the database and returns the tidy DataFrame its chart in `reviews_charts` renders, without
+importing Altair.
+"""
+
+import pandas as pd
+from sqlalchemy import case, func, literal, select, union_all
+
+from database.models import Hosts, ListingsCore, ListingsReviewsSummary
+from database.scoping import scoped
+
+REVIEW_SCORE_COLUMNS = {
+    "Accuracy": ListingsReviewsSummary.review_scores_accuracy,
+    "Cleanliness": ListingsReviewsSummary.review_scores_cleanliness,
+    "Checkin": ListingsReviewsSummary.review_scores_checkin,
+    "Communication": ListingsReviewsSummary.review_scores_communication,
+    "Location": ListingsReviewsSummary.review_scores_location,
+    "Value": ListingsReviewsSummary.review_scores_value,
+}
+
+
+def grouped_median(scores, group_column):
+    """
+    Median score per group and review type, computed in SQL.
+
+    Parameters:
+    - scores: Subquery with a `group_column` column, a `review_type` column and a `score` column.
+    - group_column: Name of the grouping column.
+
+    Returns:
+    - A select returning one row per (group, review type), ordered by both, with the median of the non-null scores
+      (the mean of the two middle scores when their count is even, as pandas does).
+    """
+    partition = (scores.c[group_column], scores.c.review_type)
+    ranked = (
+        select(
+            scores.c[group_column],
+            scores.c.review_type,
+            scores.c.score,
+            func.row_number()
+            .over(partition_by=partition, order_by=scores.c.score)
+            .label("row_number"),
+            func.count().over(partition_by=partition).label("row_count"),
+        )
+        .where(scores.c.score.is_not(None))
+        .subquery()
+    )
+
+    return (
+        select(
+            ranked.c[group_column],
+            ranked.c.review_type,
+            func.avg(ranked.c.score, type_=ranked.c.score.type).label("score"),
+        )
+        .where(
+            ranked.c.row_number.in_(
+                [(ranked.c.row_count + 1) // 2, (ranked.c.row_count + 2) // 2]
+            )
+        )
+        .group_by(ranked.c[group_column], ranked.c.review_type)
+        .order_by(ranked.c[group_column], ranked.c.review_type)
+    )
+
+
+def review_scores_superhost_data(session, city):
+    print(f"Processing superhost review scores for city: {city}")
+
+    superhost = case(
+        (Hosts.host_is_superhost == 1, "Superhost"), else_="Non-Superhost"
+    ).label("Superhost")
+
+    # One (Superhost, review type, score) row per listing and review type, unpivoted in SQL
+    scores = union_all(
+        *[
+            scoped(
+                select(
+                    superhost,
+                    literal(review_type).label("review_type"),
+                    column.label("score"),
+                )
+                .join(
+                    ListingsCore,
+                    ListingsReviewsSummary.listing_id == ListingsCore.listing_id,
+                )
+                .join(Hosts, ListingsCore.host_id == Hosts.host_id),
+                city,
+            )
+            for review_type, column in REVIEW_SCORE_COLUMNS.items()
+        ]
+    ).subquery()
+
+    rows = session.execute(grouped_median(scores, "Superhost")).all()
+
+    if not rows:
+        return pd.DataFrame()
+
+    return pd.DataFrame(rows, columns=["Superhost", "review_type", "score"])
+
+
+def review_scores_price_correlation_data(session, city):
+    print(f"Processing review scores vs price correlation for city: {city}")
+
+    # Only the price and the review score columns are fetched, straight into a frame
+    statement = scoped(
+        select(ListingsCore.price, *REVIEW_SCORE_COLUMNS.values()).join(
+            ListingsCore,
+            ListingsReviewsSummary.listing_id == ListingsCore.listing_id,
+        ),
+        city,
+    )
+    source = pd.DataFrame(
+        session.execute(statement).all(), columns=["price", *REVIEW_SCORE_COLUMNS]
+    )
+
+    if source.empty:
+        return source
+
+    # Assigning price percentiles
+    price_percentile = pd.qcut(source["price"], 20, labels=False, duplicates="drop")
+
+    # Median of each review type per price percentile, then one row per (percentile, review type)
+    medians = source[sorted(REVIEW_SCORE_COLUMNS)].groupby(price_percentile).median()
+    medians.index.name = "price_percentile"
+    medians.columns.name = "review_type"
+
+    return medians.stack(dropna=False).rename("score").reset_index()
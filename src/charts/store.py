@@ -0,0 +1,215 @@
+"""
+Sharded chart-data store.
+
+Chart data is stored as one Arrow IPC file per (chart, city) under data/charts/, with a small JSON manifest listing
+the shards. A page reads the manifest and memory-maps only the shards it renders, and a single shard can be
+rewritten without touching the others. When no manifest exists, the legacy data/charts_data.json is used.
+
+Writers hold an exclusive lock on data/charts.lock while they read and rewrite the manifest, so concurrent shard
+rebuilds do not drop each other's entries. Readers do not lock; the manifest is replaced atomically.
+"""
+
+import fcntl
+import hashlib
+import json
+import os
+import shutil
+import time
+from contextlib import contextmanager
+from functools import lru_cache
+
+import pandas as pd
+import pyarrow as pa
+
+from utilities import JsonFileCache, load_chart_data_from_file
+
+STORE_DIR = "data/charts"
+MANIFEST_PATH = os.path.join(STORE_DIR, "manifest.json")
+# Outside STORE_DIR so clear_shards can remove the directory while holding it
+LOCK_PATH = f"{STORE_DIR}.lock"
+STORE_FORMAT = "arrow-ipc"
+
+_manifest_cache = JsonFileCache(MANIFEST_PATH)
+
+# Shards memory-mapped by this process, and the time spent mapping them; repeat reads are counted by _read_table
+_shard_maps = {"maps": 0, "last_map_seconds": None, "total_map_seconds": 0.0}
+
+
+def _shard_file(chart_name, city):
+    return f"{chart_name}/{city}.arrow"
+
+
+@contextmanager
+def _manifest_lock():
+    os.makedirs(os.path.dirname(LOCK_PATH) or ".", exist_ok=True)
+    with open(LOCK_PATH, "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _read_manifest():
+    if not os.path.exists(MANIFEST_PATH):
+        return {"format": STORE_FORMAT, "shards": {}}
+    with open(MANIFEST_PATH, "r") as file:
+        return json.load(file)
+
+
+def _write_manifest(manifest):
+    # Write to a temporary file first so readers never see a partially written manifest
+    temp_path = f"{MANIFEST_PATH}.tmp"
+    with open(temp_path, "w") as file:
+        json.dump(manifest, file, indent=4, sort_keys=True)
+    os.replace(temp_path, MANIFEST_PATH)
+
+
+def _write_table(table, path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = f"{path}.tmp"
+    with pa.OSFile(temp_path, "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(temp_path, path)
+
+    with open(path, "rb") as file:
+        return hashlib.sha256(file.read()).hexdigest()
+
+
+def _shard_entry(chart_name, city, values):
+    if values is None or len(values) == 0:
+        return None
+
+    if isinstance(values, pd.DataFrame):
+        table = pa.Table.from_pandas(values, preserve_index=False)
+    else:
+        table = pa.Table.from_pylist(values)
+
+    shard_file = _shard_file(chart_name, city)
+    digest = _write_table(table, os.path.join(STORE_DIR, shard_file))
+    return {"file": shard_file, "rows": table.num_rows, "sha256": digest}
+
+
+def _remove_unlisted_shards(manifest):
+    # Shards of cities and charts no longer in the manifest would otherwise stay on disk
+    listed = {
+        entry["file"]
+        for chart in manifest["shards"].values()
+        for entry in chart.values()
+        if entry is not None
+    }
+    for directory, _, files in os.walk(STORE_DIR, topdown=False):
+        for name in files:
+            path = os.path.join(directory, name)
+            shard_file = os.path.relpath(path, STORE_DIR).replace(os.sep, "/")
+            if name.endswith(".arrow") and shard_file not in listed:
+                os.remove(path)
+        if directory != STORE_DIR and not os.listdir(directory):
+            os.rmdir(directory)
+
+
+def write_shards(charts_data_values: dict, replace=False):
+    """
+    Write chart data shards and record them in the manifest.
+
+    Parameters:
+    - charts_data_values: Dict mapping (chart name, city) to a DataFrame, a list of records or None.
+    - replace: Drop every shard not in charts_data_values and delete its file; otherwise the other shards are kept
+      as they are.
+    """
+    with _manifest_lock():
+        manifest = {"format": STORE_FORMAT, "shards": {}}
+        if not replace:
+            manifest = _read_manifest()
+
+        for (chart_name, city), values in charts_data_values.items():
+            entry = _shard_entry(chart_name, city, values)
+            manifest["shards"].setdefault(chart_name, {})[city] = entry
+
+        _write_manifest(manifest)
+        if replace:
+            _remove_unlisted_shards(manifest)
+
+
+def clear_shards():
+    """Remove every shard, leaving an empty manifest so charts are rebuilt from the database."""
+    with _manifest_lock():
+        if os.path.exists(STORE_DIR):
+            shutil.rmtree(STORE_DIR)
+        os.makedirs(STORE_DIR)
+        _write_manifest({"format": STORE_FORMAT, "shards": {}})
+
+
+def remove_shard(chart_name, city):
+    """Drop a shard so the chart is rebuilt from the database on its next render."""
+    with _manifest_lock():
+        manifest = _read_manifest()
+        entry = manifest["shards"].get(chart_name, {}).pop(city, None)
+        if entry is not None:
+            os.remove(os.path.join(STORE_DIR, entry["file"]))
+        _write_manifest(manifest)
+
+
+@lru_cache(maxsize=256)
+def _read_table(shard_file, digest):
+    # The digest is part of the cache key so a rewritten shard is mapped again
+    start = time.perf_counter()
+    with pa.memory_map(os.path.join(STORE_DIR, shard_file), "r") as source:
+        table = pa.ipc.open_file(source).read_all()
+
+    elapsed = time.perf_counter() - start
+    _shard_maps["maps"] += 1
+    _shard_maps["last_map_seconds"] = elapsed
+    _shard_maps["total_map_seconds"] += elapsed
+    return table
+
+
+def store_load_stats():
+    """
+    Load counts, cache hits and timings of the chart-data store for this process.
+
+    Returns:
+    - Dict with the manifest's parse stats (see utilities.JsonFileCache) under "manifest", and the shards' map
+      count, cached reads and map timings under "shards".
+    """
+    return {
+        "manifest": _manifest_cache.stats(),
+        "shards": {**_shard_maps, "hits": _read_table.cache_info().hits},
+    }
+
+
+def load_chart_data(chart_name, city):
+    """
+    Load the stored data of a chart for a city.
+
+    Returns a DataFrame, or None if nothing is stored so the caller should query the database.
+    """
+    manifest = _manifest_cache.get()
+
+    if manifest is None:
+        data_values = load_chart_data_from_file(f"{chart_name}_{city}")
+        return pd.DataFrame(data_values) if data_values else None
+
+    entry = manifest["shards"].get(chart_name, {}).get(city)
+    if entry is None:
+        return None
+
+    return _read_table(entry["file"], entry["sha256"]).to_pandas()
+
+
+def convert_charts_data_json(path="data/charts_data.json"):
+    """Split a legacy charts_data.json into shards; keys are "<chart name>_<city>"."""
+    with open(path, "r") as file:
+        charts_data_values = json.load(file)
+
+    shards = {}
+    for key, values in charts_data_values.items():
+        chart_name, city = key.rsplit("_", 1)
+        shards[(chart_name, city)] = values
+
+    write_shards(shards, replace=True)
+
+
+if __name__ == "__main__":
+    convert_charts_data_json()
@@ -0,0 +1,219 @@
+"""
+SQL agent behind the AI Chat page.
+
+The LLM client, database wrapper and agent are built once per process; the page caches them as Streamlit resources.
+Instead of introspecting the database and sampling rows for every question, the agent is handed the compact schema
+summary from `chat.schema` up front. Two process-wide caches, both keyed by the dataset version, cut out the
+remaining round trips:
+
+- Answers, keyed by the normalized question, so a repeated or example question is answered without the model.
+- The SQL the agent ran and its result, keyed by the normalized SQL, so rephrased questions that end up running the
+  same query skip the database.
+
+Agent SQL runs in the sandbox of `database.sandbox`: read-only connections, a CPU-step budget and a row cap.
+
+Setting the AIRBNB_ADVISOR_FAKE_LLM environment variable replaces the OpenAI client with a local LLM that replays
+FAKE_LLM_RESPONSES, so the page and the caches can be exercised without an API key.
+"""
+
+import os
+import re
+import sqlite3
+import threading
+from collections import OrderedDict
+
+from langchain.agents import create_sql_agent
+from langchain.agents.agent_toolkits import SQLDatabaseToolkit
+from langchain.agents.agent_toolkits.sql.prompt import SQL_PREFIX
+from langchain.agents.agent_types import AgentType
+from langchain.llms.fake import FakeListLLM
+from langchain.llms.openai import OpenAI
+from langchain.sql_database import SQLDatabase
+
+import constants
+from chat.schema import schema_summary, table_summaries
+from database.console import ConsoleQueryError
+from database.query_cache import normalize_sql, shared_query_cache
+from database.sandbox import QueryBudgetExceeded, shared_agent_executor
+
+MODEL = "gpt-3.5-turbo-instruct"
+
+FAKE_LLM_ENV = "AIRBNB_ADVISOR_FAKE_LLM"
+
+# One full agent turn: a query, then a final answer. The fake LLM cycles through these.
+FAKE_LLM_RESPONSES = [
+    "Thought: I should count the listings.\n"
+    "Action: sql_db_query\n"
+    "Action Input: SELECT COUNT(*) FROM ListingsCore",
+    "Thought: I now know the final answer\n"
+    "Final Answer: The answer comes from the fake LLM.",
+]
+
+MAX_ANSWERS = 256
+MAX_SQL_RESULTS = 256
+
+SCHEMA_PREFIX = (
+    SQL_PREFIX
+    + "\n\nThe database has these tables; you do not need to list them or look up their schema:\n"
+)
+
+
+def using_fake_llm():
+    return bool(os.environ.get(FAKE_LLM_ENV))
+
+
+def create_llm(openai_api_key=None):
+    """The OpenAI client, or the fake stand-in when FAKE_LLM_ENV is set."""
+    if using_fake_llm():
+        return FakeListLLM(responses=FAKE_LLM_RESPONSES)
+
+    return OpenAI(
+        openai_api_key=openai_api_key,
+        temperature=0,
+        streaming=True,
+        model=MODEL,
+    )
+
+
+def normalize_question(question):
+    """Lowercase, collapse whitespace and drop trailing punctuation so trivially different questions share an entry."""
+    return re.sub(r"\s+", " ", question).strip().lower().rstrip("?.! ")
+
+
+class VersionedCache:
+    """LRU cache whose keys start with a dataset version; entries of other versions are dropped on first sight."""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._version = None
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            if key[0] != self._version:
+                self._entries.clear()
+                self._version = key[0]
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        with self._lock:
+            if key[0] != self._version:
+                return
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self)}
+
+    def __len__(self):
+        return len(self._entries)
+
+
+_answers = VersionedCache(MAX_ANSWERS)
+_sql_results = VersionedCache(MAX_SQL_RESULTS)
+
+
+def dataset_version(path=constants.DATABASE_PATH):
+    return shared_query_cache().dataset_version(path)
+
+
+def truncate_value(value, length):
+    """Shorten long strings in a result, as SQLDatabase does, so a wide text column cannot flood the prompt."""
+    if isinstance(value, str) and 0 < length < len(value):
+        return value[: length - 3] + "..."
+    return value
+
+
+class SandboxedSQLDatabase(SQLDatabase):
+    """
+    SQLDatabase whose queries run in the agent sandbox of `database.sandbox` instead of on its engine. Results of SQL
+    the agent already ran on this dataset version are reused.
+    """
+
+    def run(self, command, fetch="all"):
+        executor = shared_agent_executor()
+        key = (dataset_version(executor.path), normalize_sql(command), fetch)
+
+        result = _sql_results.get(key)
+        if result is None:
+            rows = executor.run(command, max_rows=1 if fetch == "one" else None).rows
+            rows = [
+                tuple(truncate_value(value, self._max_string_length) for value in row)
+                for row in rows
+            ]
+            result = str(rows) if rows else ""
+            _sql_results.put(key, result)
+        return result
+
+    def run_no_throw(self, command, fetch="all"):
+        # Rejected and failed queries go back to the agent as an observation, so it can correct them
+        try:
+            return self.run(command, fetch)
+        except (ConsoleQueryError, QueryBudgetExceeded, sqlite3.Error) as error:
+            return f"Error: {error}"
+
+
+def create_database(engine):
+    """
+    Database wrapper for the agent.
+
+    The engine only reflects the tables once; queries go through the sandbox. The table info tool
+    answers from the precomputed schema summary instead of reflecting tables and sampling rows.
+    """
+    summaries = table_summaries()
+    return SandboxedSQLDatabase(
+        engine,
+        include_tables=list(summaries),
+        sample_rows_in_table_info=0,
+        custom_table_info=summaries,
+    )
+
+
+def create_agent(llm, db):
+    """
+    Zero-shot SQL agent over the database.
+
+    Parameters:
+    - llm: LangChain LLM, e.g. from `create_llm`.
+    - db: Database wrapper, e.g. from `create_database`.
+    """
+    toolkit = SQLDatabaseToolkit(db=db, llm=llm)
+
+    return create_sql_agent(
+        llm=llm,
+        toolkit=toolkit,
+        verbose=True,
+        agent_type=AgentType.ZERO_SHOT_REACT_DESCRIPTION,
+        # The summary has no braces, so it survives the prefix's str.format
+        prefix=SCHEMA_PREFIX + schema_summary(),
+    )
+
+
+def cached_answer(question):
+    """Answer given to the same question on this dataset version, or None."""
+    return _answers.get((dataset_version(), normalize_question(question)))
+
+
+def store_answer(question, answer):
+    _answers.put((dataset_version(), normalize_question(question)), answer)
+
+
+def describe_chat_cache():
+    """One-line summary of the answer and SQL result caches for the sidebar."""
+    answers = _answers.stats()
+    sql_results = _sql_results.stats()
+    return (
+        f"Chat cache: {answers['entries']} answers ({answers['hits']} hits), "
+        f"{sql_results['entries']} SQL results ({sql_results['hits']} hits)."
+    )
@@ -0,0 +1,54 @@
+"""
+Compact schema description for the AI Chat agent.
+
+The description is built from the models rather than by introspecting the database, so it costs nothing per question
+and carries each table's `_description`. Tables are listed one per line, e.g.
+
+    ListingsCore: Entity table for unique listings. Columns: listing_id INTEGER PK, host_id INTEGER -> Hosts.host_id, ...
+"""
+
+from database.models import CustomBase
+
+# Table types the agent has no use for; packed tables hold compressed arrays SQL cannot read
+HIDDEN_TABLE_TYPES = {"metadata", "packed"}
+
+
+def chat_models():
+    """Models the agent may query, in the order they are defined."""
+    return [
+        model
+        for model in CustomBase.__subclasses__()
+        if model.get_table_type() not in HIDDEN_TABLE_TYPES
+    ]
+
+
+def column_summary(column):
+    summary = f"{column.name} {column.type}"
+    # Encoded columns (see models.DayNumber and models.ScaledScore) say how to decode them in SQL
+    note = getattr(column.type, "storage_note", None)
+    if note:
+        summary += f" ({note.replace('<column>', column.name)})"
+    if column.primary_key:
+        summary += " PK"
+    for foreign_key in column.foreign_keys:
+        summary += f" -> {foreign_key.target_fullname}"
+    return summary
+
+
+def table_summary(model):
+    """One-line description of a table: its name, `_description` and columns."""
+    columns = ", ".join(column_summary(column) for column in model.__table__.columns)
+    return f"{model.__tablename__}: {model.get_description()}. Columns: {columns}"
+
+
+def table_summaries():
+    """
+    Returns:
+    - Dict mapping each table name to its one-line description, in the order the models are defined.
+    """
+    return {model.__tablename__: table_summary(model) for model in chat_models()}
+
+
+def schema_summary():
+    """Description of every table the agent may query, one line per table."""
+    return "\n".join(table_summaries().values())
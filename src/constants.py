@@ -261,8 +261,9 @@ COLUMN_IMPORT_TYPES = {
     "host_identity_verified": "str",
     "neighbourhood": "str",
     "neighbourhood_cleansed": "str",
-    "latitude": "float32",
-    "longitude": "float32",
+    # float32 would round longitudes to about 8 millionths of a degree, coarser than they are stored
+    "latitude": "float64",
+    "longitude": "float64",
     "property_type": "str",
     "room_type": "str",
     "accommodates": "float32",
@@ -0,0 +1,141 @@
+"""
+Packed storage of listing availability.
+
+Availability (the days a listing can be booked in the next 30, 60, 90 and 365 days of the scrape) is stored in
+ListingsAvailability as one row per city of compressed NumPy arrays (see models.PackedArray), sorted by listing_id,
+rather than as a row per listing. Nothing in SQL can read it; the accessors here decode a city's arrays and look
+listings up with a binary search, so every lookup is vectorized.
+
+Values returned are floats in days, NaN where the listing has no value (or no row). Further per-listing series,
+such as calendar-derived occupancy, fit the same layout as another packed column.
+"""
+
+import numpy as np
+import pandas as pd
+
+from database.models import Cities, ListingsAvailability
+
+# Availability columns, mapped to the number of days they cover
+AVAILABILITY_WINDOWS = {
+    "availability_30": 30,
+    "availability_60": 60,
+    "availability_90": 90,
+    "availability_365": 365,
+}
+
+
+def _missing(window):
+    # The largest value of the column's dtype marks a missing value
+    return np.iinfo(getattr(ListingsAvailability, window).type.dtype).max
+
+
+def pack_availability(listings):
+    """
+    Arrays of one city's row of ListingsAvailability.
+
+    Parameters:
+    - listings: DataFrame with a listing_id column and the AVAILABILITY_WINDOWS columns, NaN where missing.
+
+    Returns:
+    - Dict of the ListingsAvailability columns other than city_id.
+    """
+    listings = listings.sort_values("listing_id")
+    row = {
+        "listing_count": len(listings),
+        "listing_ids": listings["listing_id"].to_numpy(),
+    }
+    for window, days in AVAILABILITY_WINDOWS.items():
+        values = listings[window].to_numpy(dtype=float)
+        # Out-of-range values cannot be stored in the column's dtype, so they are treated as missing
+        missing = np.isnan(values) | (values < 0) | (values > days)
+        row[window] = np.where(missing, _missing(window), np.round(values))
+    return row
+
+
+def store_availability(session, listings):
+    """
+    Replace the stored availability with the listings'.
+
+    Parameters:
+    - session: Read-write session on the database being built.
+    - listings: DataFrame with listing_id, city and AVAILABILITY_WINDOWS columns.
+    """
+    city_ids = dict(session.query(Cities.city, Cities.city_id).all())
+
+    session.query(ListingsAvailability).delete()
+    for city, city_listings in listings.groupby("city"):
+        if city not in city_ids:
+            continue
+        session.add(
+            ListingsAvailability(
+                city_id=city_ids[city], **pack_availability(city_listings)
+            )
+        )
+    session.commit()
+
+
+def load_availability(session, city_ids=None, windows=None):
+    """
+    Decode the stored availability.
+
+    Parameters:
+    - city_ids: Cities to read, or None for every city.
+    - windows: AVAILABILITY_WINDOWS columns to decode, or None for all of them.
+
+    Returns:
+    - DataFrame with a listing_id column and one float column per window, sorted by listing_id.
+    """
+    windows = list(windows or AVAILABILITY_WINDOWS)
+    query = session.query(
+        ListingsAvailability.listing_ids,
+        *[getattr(ListingsAvailability, window) for window in windows],
+    )
+    if city_ids is not None:
+        query = query.filter(ListingsAvailability.city_id.in_(city_ids))
+    rows = query.all()
+
+    availability = {
+        "listing_ids": np.concatenate(
+            [row.listing_ids for row in rows] or [np.empty(0, dtype=np.int32)]
+        )
+    }
+    for window in windows:
+        values = np.concatenate(
+            [getattr(row, window) for row in rows] or [np.empty(0)]
+        ).astype(float)
+        values[values == _missing(window)] = np.nan
+        availability[window] = values
+
+    frame = pd.DataFrame(availability).rename(columns={"listing_ids": "listing_id"})
+    # Each city's ids are sorted; listing ids are unique across cities, so one more sort orders them all
+    return frame.sort_values("listing_id", ignore_index=True)
+
+
+def availability_of(session, listing_ids, window="availability_30", city_ids=None):
+    """
+    Availability of listings in one window.
+
+    Parameters:
+    - listing_ids: Array-like of listing ids.
+    - window: One of the AVAILABILITY_WINDOWS columns.
+    - city_ids: Cities the listings are in, or None to read every city.
+
+    Returns:
+    - Float array of days aligned with listing_ids, NaN for listings without a value.
+    """
+    if window not in AVAILABILITY_WINDOWS:
+        raise ValueError(f"Unknown availability window: {window}")
+
+    listing_ids = np.asarray(listing_ids, dtype=np.int64)
+    availability = load_availability(session, city_ids, windows=[window])
+    stored_ids = availability["listing_id"].to_numpy()
+    values = np.full(len(listing_ids), np.nan)
+    if not len(stored_ids):
+        return values
+
+    positions = np.minimum(
+        np.searchsorted(stored_ids, listing_ids), len(stored_ids) - 1
+    )
+    found = stored_ids[positions] == listing_ids
+    values[found] = availability[window].to_numpy()[positions[found]]
+    return values
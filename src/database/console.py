@@ -0,0 +1,204 @@
+"""
+Ad-hoc read-only SQL console.
+
+Analysts' queries run on their own read-only connection, and are limited three ways:
+
+- Only a single SELECT, WITH or VALUES statement is accepted. On top of that, a SQLite authorizer denies every
+  action except reading, so a statement that slips past the text check still cannot write, attach or pragma.
+- Every fetch is bounded by a deadline enforced through the progress handler. A single function call is one step
+  of the virtual machine, which the progress handler cannot interrupt, so no string or blob may be longer than
+  MAX_VALUE_BYTES either (e.g. `randomblob(900000000)` fails at once instead of allocating ~1 GB).
+- At most MAX_ROWS rows are returned.
+
+Results are fetched a page at a time from the open cursor, so a large result set is never materialised. A cursor
+that is left unread for IDLE_TIMEOUT_SECONDS is closed, so an abandoned result does not hold its connection open.
+"""
+
+import re
+import sqlite3
+import threading
+import time
+
+import pandas as pd
+
+import constants
+from database.executor import connect_readonly, deadline
+
+ALLOWED_STATEMENTS = ("SELECT", "WITH", "VALUES")
+
+# First keyword of a statement, after any leading comments
+LEADING_KEYWORD = re.compile(r"(?:\s|--[^\n]*|/\*.*?\*/)*(\w+)", re.DOTALL)
+
+PAGE_SIZE = 100
+MAX_ROWS = 10_000
+CONSOLE_TIMEOUT_SECONDS = 5
+IDLE_TIMEOUT_SECONDS = 300
+
+# Longest string or blob a console query may build or read
+MAX_VALUE_BYTES = 1_000_000
+
+# Authorizer actions a read-only query needs; everything else is denied
+ALLOWED_ACTIONS = {
+    sqlite3.SQLITE_SELECT,
+    sqlite3.SQLITE_READ,
+    sqlite3.SQLITE_FUNCTION,
+    sqlite3.SQLITE_RECURSIVE,
+}
+
+
+class ConsoleQueryError(Exception):
+    pass
+
+
+def authorize_read_only(action, *args):
+    return sqlite3.SQLITE_OK if action in ALLOWED_ACTIONS else sqlite3.SQLITE_DENY
+
+
+def validate_sql(sql):
+    """
+    Check a console query against the statement allow-list.
+
+    Returns:
+    - The statement without surrounding whitespace or a trailing semicolon.
+
+    Raises:
+    - ConsoleQueryError if the text is empty, holds more than one statement or is not an allowed statement.
+    """
+    sql = sql.strip().rstrip(";").strip()
+    if not sql:
+        raise ConsoleQueryError("Enter a query to run.")
+
+    # A semicolon that completes a statement (rather than sitting in a literal or comment) means another follows
+    for match in re.finditer(";", sql):
+        if sqlite3.complete_statement(sql[: match.end()]):
+            raise ConsoleQueryError("Run one statement at a time.")
+
+    keyword = LEADING_KEYWORD.match(sql)
+    keyword = keyword.group(1).upper() if keyword else ""
+    if keyword not in ALLOWED_STATEMENTS:
+        raise ConsoleQueryError(
+            f"Only {', '.join(ALLOWED_STATEMENTS)} statements can be run here."
+        )
+
+    return sql
+
+
+class ConsoleCursor:
+    """
+    An open console query, read one page at a time.
+
+    Parameters:
+    - sql: Query text; validated against the allow-list.
+    - path: Database file.
+    - page_size: Rows per page.
+    - max_rows: Rows after which the query is cut off.
+    - timeout: Deadline in seconds of running the query and of each page fetch.
+    - idle_timeout: Seconds after the last fetch at which the cursor is closed.
+    """
+
+    def __init__(
+        self,
+        sql,
+        path=constants.DATABASE_PATH,
+        page_size=PAGE_SIZE,
+        max_rows=MAX_ROWS,
+        timeout=CONSOLE_TIMEOUT_SECONDS,
+        idle_timeout=IDLE_TIMEOUT_SECONDS,
+    ):
+        self.sql = validate_sql(sql)
+        self.page_size = page_size
+        self.max_rows = max_rows
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+        self.rows_fetched = 0
+        self.pages_fetched = 0
+        self.elapsed_seconds = 0.0
+        self.truncated = False
+        self.exhausted = False
+        self.closed_idle = False
+        self._pending = []
+        # Reentrant: next_page closes the cursor while holding it, and the idle timer closes it from another thread
+        self._lock = threading.RLock()
+        self._idle_timer = None
+
+        self._connection = connect_readonly(path)
+        self._connection.set_authorizer(authorize_read_only)
+        self._connection.setlimit(sqlite3.SQLITE_LIMIT_LENGTH, MAX_VALUE_BYTES)
+        try:
+            self.plan = [
+                row[3]
+                for row in self._connection.execute(f"EXPLAIN QUERY PLAN {self.sql}")
+            ]
+
+            start = time.perf_counter()
+            with deadline(self._connection, timeout):
+                self._cursor = self._connection.execute(self.sql)
+            self.elapsed_seconds += time.perf_counter() - start
+        except Exception:
+            self.close()
+            raise
+
+        self.columns = [column[0] for column in self._cursor.description or []]
+        self._restart_idle_timer()
+
+    def _restart_idle_timer(self):
+        if self._idle_timer is not None:
+            self._idle_timer.cancel()
+        if self.exhausted:
+            return
+        self._idle_timer = threading.Timer(self.idle_timeout, self._close_idle)
+        self._idle_timer.daemon = True
+        self._idle_timer.start()
+
+    def _close_idle(self):
+        with self._lock:
+            if not self.exhausted:
+                self.closed_idle = True
+                self.close()
+
+    def next_page(self):
+        """
+        Fetch the next page of rows.
+
+        Returns:
+        - DataFrame of up to page_size rows; empty once the query is exhausted.
+        """
+        with self._lock:
+            if self.exhausted:
+                return pd.DataFrame(columns=self.columns)
+
+            size = min(self.page_size, self.max_rows - self.rows_fetched)
+
+            start = time.perf_counter()
+            try:
+                with deadline(self._connection, self.timeout):
+                    # One row past the page tells whether the query has more rows
+                    rows = self._pending + self._cursor.fetchmany(
+                        size + 1 - len(self._pending)
+                    )
+            except Exception:
+                self.close()
+                raise
+            self.elapsed_seconds += time.perf_counter() - start
+
+            self._pending = rows[size:]
+            rows = rows[:size]
+            self.rows_fetched += len(rows)
+            self.pages_fetched += 1
+
+            if not self._pending:
+                self.close()
+            elif self.rows_fetched >= self.max_rows:
+                self.truncated = True
+                self.close()
+
+            self._restart_idle_timer()
+            return pd.DataFrame(rows, columns=self.columns)
+
+    def close(self):
+        with self._lock:
+            self.exhausted = True
+            self._pending = []
+            if self._idle_timer is not None:
+                self._idle_timer.cancel()
+            self._connection.close()
@@ -0,0 +1,246 @@
+"""
+One place to open the SQLite database.
+
+Every script and page gets its engine, sessions or raw connections from here, in one of two profiles:
+
+- BUILD: read-write, for the scripts that create and populate the database.
+- SERVE: for the app and for build steps that only read a finished database. Connections open the file read-only
+  and immutable, so SQLite skips locking and change detection. Each connection memory-maps the file, keeps a larger
+  page cache and sets `query_only`. The engine pools a fixed number of connections that every session reuses.
+
+An immutable connection never notices the file changing under it, so a new database is deployed by replacing the
+file rather than writing to it in place; the shared SERVE engine is recreated when the file is replaced.
+
+With the AIRBNB_ADVISOR_IN_MEMORY environment variable set, SERVE connections read from a copy of the database in
+RAM instead of the file. The copy is made with SQLite's backup API the first time it is needed (and again when the
+file is replaced) and lives in the `memdb` VFS, where every connection of the process shares it. Databases larger
+than AIRBNB_ADVISOR_IN_MEMORY_MAX_MB MiB (1024 by default) are served from the file.
+`setup/compare_serving_modes.py` reports the cost of the copy against the query time it saves.
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
+
+import constants
+
+BUILD = "build"
+SERVE = "serve"
+
+# Connections kept open by the SERVE engine, and extra ones opened under load
+SERVE_POOL_SIZE = 8
+SERVE_MAX_OVERFLOW = 8
+
+PRAGMAS = {
+    BUILD: {
+        "cache_size": -65_536,  # KiB, so 64 MiB
+        "temp_store": "MEMORY",
+    },
+    SERVE: {
+        "mmap_size": 268_435_456,  # 256 MiB, more than the whole database
+        "cache_size": -32_768,  # KiB, so 32 MiB per connection
+        "temp_store": "MEMORY",
+        "query_only": "ON",
+    },
+}
+
+IN_MEMORY_ENV = "AIRBNB_ADVISOR_IN_MEMORY"
+IN_MEMORY_MAX_MB_ENV = "AIRBNB_ADVISOR_IN_MEMORY_MAX_MB"
+
+# Databases larger than this are served from the file even in in-memory mode, unless IN_MEMORY_MAX_MB_ENV is set
+DEFAULT_MAX_IN_MEMORY_MB = 1024
+
+
+def serve_from_memory():
+    return bool(os.environ.get(IN_MEMORY_ENV))
+
+
+def max_in_memory_bytes():
+    """Size above which a database is served from the file, from IN_MEMORY_MAX_MB_ENV (in MiB) if it is set."""
+    value = os.environ.get(IN_MEMORY_MAX_MB_ENV) or DEFAULT_MAX_IN_MEMORY_MB
+    try:
+        return int(float(value) * 1_048_576)
+    except ValueError:
+        raise ValueError(
+            f"{IN_MEMORY_MAX_MB_ENV} must be a number of MiB, not {value!r}"
+        ) from None
+
+
+def _file_signature(path):
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+
+class MemoryCopy:
+    """
+    A database file copied into the `memdb` VFS.
+
+    The copy lives as long as any connection to it is open; the copy keeps one open itself until it is closed.
+    """
+
+    def __init__(self, path, signature):
+        self.path = path
+        self.signature = signature
+        self.size_bytes = os.path.getsize(path)
+        self.name = (
+            "/"
+            + hashlib.sha1(f"{os.path.abspath(path)}{signature}".encode()).hexdigest()[
+                :16
+            ]
+        )
+
+        start = time.perf_counter()
+        self._keeper = sqlite3.connect(
+            f"file:{self.name}?vfs=memdb", uri=True, check_same_thread=False
+        )
+        source = sqlite3.connect(f"file:{path}?mode=ro&immutable=1", uri=True)
+        try:
+            source.backup(self._keeper)
+        finally:
+            source.close()
+        self.load_seconds = time.perf_counter() - start
+
+    def connect(self):
+        return sqlite3.connect(
+            f"file:{self.name}?vfs=memdb&mode=ro", uri=True, check_same_thread=False
+        )
+
+    def close(self):
+        self._keeper.close()
+
+
+# (path, process) -> (file signature, MemoryCopy or None if the file is served from disk)
+_memory_copies = {}
+_memory_lock = threading.Lock()
+
+
+def memory_copy(path=constants.DATABASE_PATH):
+    """
+    The in-memory copy of a database file, made on first use and remade once the file has been replaced.
+
+    Returns:
+    - MemoryCopy, or None if the file is larger than max_in_memory_bytes() or SQLite has no `memdb` VFS.
+    """
+    key = (path, os.getpid())
+    signature = _file_signature(path)
+
+    with _memory_lock:
+        if key in _memory_copies and _memory_copies[key][0] == signature:
+            return _memory_copies[key][1]
+
+        if key in _memory_copies and _memory_copies[key][1] is not None:
+            # Connections still reading the old copy keep it alive until they close
+            _memory_copies[key][1].close()
+
+        copy = None
+        size_bytes = os.path.getsize(path)
+        limit_bytes = max_in_memory_bytes()
+        if size_bytes > limit_bytes:
+            print(
+                f"Serving {path} from disk: {size_bytes / 1_048_576:.1f} MiB is over the "
+                f"{limit_bytes / 1_048_576:.1f} MiB in-memory limit"
+            )
+        else:
+            try:
+                copy = MemoryCopy(path, signature)
+                print(
+                    f"Loaded {path} into memory: {copy.size_bytes / 1_048_576:.1f} MiB "
+                    f"in {copy.load_seconds:.2f} s"
+                )
+            except sqlite3.OperationalError as error:
+                print(
+                    f"Serving {path} from disk: could not copy it into memory ({error})"
+                )
+
+        _memory_copies[key] = (signature, copy)
+        return copy
+
+
+def connect(profile=BUILD, path=constants.DATABASE_PATH, in_memory=None):
+    """
+    Open a raw sqlite3 connection with the profile's settings.
+
+    Connections may be used from any thread; callers (the engine's pool, the query executors) make sure only one
+    thread uses a connection at a time.
+
+    Parameters:
+    - profile: BUILD or SERVE.
+    - path: Database file.
+    - in_memory: Whether a SERVE connection reads the in-memory copy of the file; defaults to the IN_MEMORY_ENV
+      setting.
+    """
+    if in_memory is None:
+        in_memory = serve_from_memory()
+
+    copy = memory_copy(path) if profile == SERVE and in_memory else None
+    if copy is not None:
+        connection = copy.connect()
+    elif profile == SERVE:
+        connection = sqlite3.connect(
+            f"file:{path}?mode=ro&immutable=1", uri=True, check_same_thread=False
+        )
+    else:
+        connection = sqlite3.connect(path, check_same_thread=False)
+
+    for pragma, value in PRAGMAS[profile].items():
+        connection.execute(f"PRAGMA {pragma} = {value}")
+    return connection
+
+
+def create_database_engine(profile=BUILD, path=constants.DATABASE_PATH, in_memory=None):
+    """A new engine on the database whose connections come from `connect`."""
+    pool_args = {}
+    if profile == SERVE:
+        pool_args = {"pool_size": SERVE_POOL_SIZE, "max_overflow": SERVE_MAX_OVERFLOW}
+
+    # The URL only picks the dialect and tells callers the file path; `creator` opens the connections
+    return create_engine(
+        f"sqlite:///{path}",
+        creator=lambda: connect(profile, path, in_memory),
+        poolclass=QueuePool,
+        echo=False,  # echo=True will show generated SQL, remove in production
+        **pool_args,
+    )
+
+
+_engines = {}
+_engine_signatures = {}
+_engines_lock = threading.Lock()
+
+
+def get_engine(profile=BUILD, path=constants.DATABASE_PATH):
+    """
+    The process-wide engine of a profile, created on first use.
+
+    The SERVE engine is replaced (and the old one's idle connections closed) once the file has been replaced, since
+    its immutable connections would keep reading the old file.
+    """
+    # Keyed by process too: a forked build worker must not reuse its parent's pooled connections
+    key = (profile, path, os.getpid())
+    signature = _file_signature(path) if profile == SERVE else None
+
+    with _engines_lock:
+        if key in _engines and _engine_signatures[key] == signature:
+            return _engines[key]
+
+        if key in _engines:
+            _engines[key].dispose()
+        _engines[key] = create_database_engine(profile, path)
+        _engine_signatures[key] = signature
+        return _engines[key]
+
+
+def create_session(profile=BUILD, path=constants.DATABASE_PATH):
+    """A new session on the process-wide engine of a profile."""
+    return sessionmaker(
+        autocommit=False, autoflush=False, bind=get_engine(profile, path)
+    )()
@@ -0,0 +1,165 @@
+"""
+Concurrent, deadline-bounded execution of read-only SQL.
+
+Queries run on a bounded thread pool, each on one of a fixed set of read-only SQLite connections. A query that runs
+past its deadline is interrupted through SQLite's progress handler, so a slow query costs at most its deadline and
+never blocks the others. Results go through the shared page query cache, keyed by the hash of the normalized SQL
+and the dataset version.
+"""
+
+import hashlib
+import os
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+
+import pandas as pd
+
+import constants
+from database.engine import SERVE, connect
+from database.query_cache import normalize_sql, shared_query_cache
+
+# Connections (and worker threads) shared by every session
+POOL_SIZE = 4
+
+# Default deadline of a query
+QUERY_TIMEOUT_SECONDS = 10
+
+# SQLite virtual machine instructions between deadline checks
+PROGRESS_INTERVAL = 10_000
+
+
+class QueryTimeout(Exception):
+    pass
+
+
+def connect_readonly(path):
+    """Open a read-only SQLite connection, with the serving settings, that may be used from any worker thread."""
+    return connect(SERVE, path)
+
+
+@contextmanager
+def deadline(connection, seconds):
+    """
+    Interrupt any statement run on the connection once `seconds` have passed.
+
+    SQLite calls the progress handler every PROGRESS_INTERVAL instructions; returning True aborts the statement
+    with an "interrupted" OperationalError.
+    """
+    expires_at = time.monotonic() + seconds
+    connection.set_progress_handler(
+        lambda: time.monotonic() > expires_at, PROGRESS_INTERVAL
+    )
+    try:
+        yield
+    except sqlite3.OperationalError as error:
+        if str(error) == "interrupted":
+            raise QueryTimeout(f"Query exceeded {seconds} s deadline") from error
+        raise
+    finally:
+        connection.set_progress_handler(None, 0)
+
+
+class ReadOnlyConnectionPool:
+    """Fixed-size pool of read-only connections to one database file, opened on first use."""
+
+    def __init__(self, path, size=POOL_SIZE):
+        self.path = path
+        self._idle = queue.LifoQueue()
+        for _ in range(size):
+            self._idle.put(None)
+
+    @contextmanager
+    def connection(self):
+        connection = self._idle.get()
+        if connection is None:
+            connection = connect_readonly(self.path)
+        try:
+            yield connection
+        finally:
+            self._idle.put(connection)
+
+
+class QueryExecutor:
+    def __init__(self, path=constants.DATABASE_PATH, pool_size=POOL_SIZE):
+        self.path = path
+        self.pool_size = pool_size
+        self._lock = threading.Lock()
+        self._threads = ThreadPoolExecutor(
+            max_workers=pool_size, thread_name_prefix="sql-executor"
+        )
+        self._pool = None
+        self._pool_signature = None
+
+    def _current_pool(self):
+        # A redeployed database file gets fresh connections; old ones stay open until their queries finish
+        stat = os.stat(self.path)
+        signature = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            if signature != self._pool_signature:
+                self._pool = ReadOnlyConnectionPool(self.path, self.pool_size)
+                self._pool_signature = signature
+            return self._pool
+
+    def _execute(self, pool, sql, timeout):
+        with pool.connection() as connection, deadline(connection, timeout):
+            cursor = connection.execute(sql)
+            columns = [column[0] for column in cursor.description or []]
+            rows = cursor.fetchall()
+        return pd.DataFrame(rows, columns=columns)
+
+    def run_queries(self, queries, timeout=QUERY_TIMEOUT_SECONDS, use_cache=True):
+        """
+        Run queries concurrently and yield their results as they finish.
+
+        Parameters:
+        - queries: Dict mapping a caller's key to a SQL string.
+        - timeout: Deadline of each query in seconds.
+        - use_cache: Serve and store results in the shared page query cache.
+
+        Yields:
+        - (key, DataFrame) for each query, or (key, exception) if it failed or timed out. Cached results come first.
+        """
+        cache = shared_query_cache()
+        version = cache.dataset_version(self.path)
+        pool = self._current_pool()
+
+        futures = {}
+        for key, sql in queries.items():
+            sql = normalize_sql(sql)
+            cache_key = (version, hashlib.sha256(sql.encode()).hexdigest())
+
+            frame = cache.get(cache_key) if use_cache else None
+            if frame is not None:
+                yield key, frame
+                continue
+
+            future = self._threads.submit(self._execute, pool, sql, timeout)
+            futures[future] = (key, cache_key)
+
+        for future in as_completed(futures):
+            key, cache_key = futures[future]
+            try:
+                frame = future.result()
+            except (sqlite3.Error, QueryTimeout) as error:
+                yield key, error
+                continue
+
+            cache.put(cache_key, frame)
+            yield key, frame.copy()
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def shared_executor():
+    """The process-wide executor on the app database, created on first use."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = QueryExecutor()
+        return _executor
@@ -1,5 +1,20 @@
-from sqlalchemy import REAL, Column, ForeignKey, Integer, String
+import zlib
+from datetime import date, datetime
+
+import numpy as np
+from sqlalchemy import (
+    REAL,
+    Column,
+    ForeignKey,
+    Index,
+    Integer,
+    LargeBinary,
+    SmallInteger,
+    String,
+    UniqueConstraint,
+)
 from sqlalchemy.orm import registry
+from sqlalchemy.types import TypeDecorator
 
 mapper_registry = registry()
 Base = mapper_registry.generate_base()
@@ -20,6 +35,120 @@ class CustomBase(Base):
         return cls._description
 
 
+# Compact Column Types ---------------------------------------------------------------------------------------------
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+def _is_missing(value):
+    # Missing values reach the models as None, NaN (from pandas) or empty strings
+    return value is None or value != value or value == ""
+
+
+class DayNumber(TypeDecorator):
+    """
+    A date stored as the number of days since 1970-01-01.
+
+    Python sees ISO date strings ("2023-06-30"), as when the column was a string; dates, datetimes and ISO strings
+    are accepted as values and in comparisons. The integer takes 2 to 3 bytes instead of 10 and compares and indexes
+    as a number.
+    """
+
+    impl = Integer
+    cache_ok = True
+    storage_note = (
+        "days since 1970-01-01; date(<column> * 86400, 'unixepoch') gives the ISO date"
+    )
+
+    def process_bind_param(self, value, dialect):
+        if _is_missing(value):
+            return None
+        if isinstance(value, str):
+            value = date.fromisoformat(value[:10])
+        elif isinstance(value, datetime):
+            value = value.date()
+        return value.toordinal() - EPOCH_ORDINAL
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        return date.fromordinal(int(value) + EPOCH_ORDINAL).isoformat()
+
+
+class ScaledScore(TypeDecorator):
+    """
+    A score with two decimals stored as a small integer in hundredths.
+
+    Python sees floats (4.87 is stored as 487). Aggregates over the column are decoded too when they are given its
+    type, e.g. `func.avg(column, type_=column.type)`.
+    """
+
+    impl = SmallInteger
+    cache_ok = True
+    scale = 100
+    storage_note = "hundredths; <column> / 100.0 gives the score"
+
+    def process_bind_param(self, value, dialect):
+        if _is_missing(value):
+            return None
+        return round(float(value) * self.scale)
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        return value / self.scale
+
+
+class FixedPointCoordinate(TypeDecorator):
+    """
+    A latitude or longitude stored as an integer in millionths of a degree (about 11 cm).
+
+    Python sees floats. Every coordinate fits in 32 bits, so SQLite stores it in 4 bytes instead of an 8-byte REAL,
+    and the R*Tree of `database.spatial` indexes the same integers exactly.
+    """
+
+    impl = Integer
+    cache_ok = True
+    scale = 1_000_000
+    storage_note = "millionths of a degree; <column> / 1e6 gives degrees"
+
+    def process_bind_param(self, value, dialect):
+        if _is_missing(value):
+            return None
+        return round(float(value) * self.scale)
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        return value / self.scale
+
+
+class PackedArray(TypeDecorator):
+    """
+    A NumPy array of fixed-size numbers stored as one zlib-compressed blob.
+
+    Python sees (read-only) arrays of the column's dtype; anything NumPy can convert to that dtype is accepted as a
+    value. The blob cannot be read in SQL, so tables of packed columns are read through their accessor module.
+    """
+
+    impl = LargeBinary
+    cache_ok = True
+
+    def __init__(self, dtype):
+        super().__init__()
+        # Kept as its string, e.g. "<u2", so the type stays hashable for the statement cache
+        self.dtype = np.dtype(dtype).str
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        return zlib.compress(np.ascontiguousarray(value, dtype=self.dtype).tobytes())
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        return np.frombuffer(zlib.decompress(value), dtype=self.dtype)
+
+
 # Simple Lookup Tables -----------------------------------------------------------------------------------------------
 class HostResponseTimes(CustomBase):
     __tablename__ = "HostResponseTimes"
@@ -56,8 +185,13 @@ class Neighborhoods(CustomBase):
         "Heirarchical lookup table for listing neighborhoods; child to Cities"
     )
 
+    __table_args__ = (
+        # Names are only unique within a city; markets share names such as "Midtown" or "South Park"
+        UniqueConstraint("city_id", "neighborhood"),
+    )
+
     neighborhood_id = Column(Integer, primary_key=True, autoincrement=True)
-    neighborhood = Column(String, unique=True)
+    neighborhood = Column(String)
     city_id = Column(Integer, ForeignKey("Cities.city_id"))
 
 
@@ -107,7 +241,8 @@ class Hosts(CustomBase):
     _description = "Entity table for unique hosts"
 
     host_id = Column(Integer, primary_key=True)
-    host_since = Column(String)
+    # Day number; see DayNumber
+    host_since = Column(DayNumber)
     host_response_time_id = Column(
         Integer, ForeignKey("HostResponseTimes.host_response_time_id")
     )
@@ -124,6 +259,25 @@ class ListingsCore(CustomBase):
     __tablename__ = "ListingsCore"
     _table_type = "entity"
     _description = "Entity table for unique listings"
+    __table_args__ = (
+        # City-scoped metrics filter on the current and year-earlier cohorts
+        Index(
+            "ix_ListingsCore_city_cohorts",
+            "city_id",
+            "was_active_most_recent_quarter",
+            "was_active_four_quarters_prior",
+        ),
+        # Neighborhood and room type charts group a city's prices; both indexes cover those queries
+        Index(
+            "ix_ListingsCore_city_neighborhood_price",
+            "city_id",
+            "neighborhood_id",
+            "price",
+        ),
+        Index(
+            "ix_ListingsCore_city_room_type_price", "city_id", "room_type_id", "price"
+        ),
+    )
 
     listing_id = Column(Integer, primary_key=True)
     host_id = Column(Integer, ForeignKey("Hosts.host_id"))
@@ -153,6 +307,10 @@ class ListingsReviewsSummary(CustomBase):
     __tablename__ = "ListingsReviewsSummary"
     _table_type = "extension"
     _description = "Extension table for listing reviews summary"
+    __table_args__ = (
+        # Active-quarter flags are set from a range on last_review; first_review is checked from the index
+        Index("ix_ListingsReviewsSummary_review_dates", "last_review", "first_review"),
+    )
 
     listing_id = Column(
         Integer, ForeignKey("ListingsCore.listing_id"), primary_key=True
@@ -160,15 +318,51 @@ class ListingsReviewsSummary(CustomBase):
     number_of_reviews = Column(Integer)
     number_of_reviews_last_12m = Column(Integer)
     number_of_reviews_last_30d = Column(Integer)
-    first_review = Column(String)
-    last_review = Column(String)
-    review_scores_rating = Column(Integer)
-    review_scores_accuracy = Column(Integer)
-    review_scores_cleanliness = Column(Integer)
-    review_scores_checkin = Column(Integer)
-    review_scores_communication = Column(Integer)
-    review_scores_location = Column(Integer)
-    review_scores_value = Column(Integer)
+    # Dates as day numbers and scores in hundredths; setup/migrate_compact_columns.py converts older databases
+    # (see setup/benchmark_compact_columns.py)
+    first_review = Column(DayNumber)
+    last_review = Column(DayNumber)
+    review_scores_rating = Column(ScaledScore)
+    review_scores_accuracy = Column(ScaledScore)
+    review_scores_cleanliness = Column(ScaledScore)
+    review_scores_checkin = Column(ScaledScore)
+    review_scores_communication = Column(ScaledScore)
+    review_scores_location = Column(ScaledScore)
+    review_scores_value = Column(ScaledScore)
+
+
+class ListingsLocation(CustomBase):
+    __tablename__ = "ListingsLocation"
+    _table_type = "extension"
+    _description = "Extension table for listing coordinates"
+
+    # Indexed for box and radius lookups by the R*Tree of database.spatial
+    listing_id = Column(
+        Integer, ForeignKey("ListingsCore.listing_id"), primary_key=True
+    )
+    latitude = Column(FixedPointCoordinate)
+    longitude = Column(FixedPointCoordinate)
+
+
+class ListingsAvailability(CustomBase):
+    __tablename__ = "ListingsAvailability"
+    _table_type = "packed"
+    _description = "Packed table of the days listings are available to book, one row of arrays per city"
+
+    # Read through database.availability. Each array holds one value per listing of the city, aligned with the
+    # sorted listing_ids; a window takes 1 to 2 bytes per listing before compression, where a row per listing took
+    # a rowid, four integers and a B-tree cell
+    city_id = Column(
+        Integer, ForeignKey("Cities.city_id"), primary_key=True, autoincrement=False
+    )
+    listing_count = Column(Integer)
+    listing_ids = Column(PackedArray("<i4"))
+
+    # Days available in the next 30, 60, 90 and 365 days of the scrape; the dtype's largest value marks a missing one
+    availability_30 = Column(PackedArray("u1"))
+    availability_60 = Column(PackedArray("u1"))
+    availability_90 = Column(PackedArray("u1"))
+    availability_365 = Column(PackedArray("<u2"))
 
 
 # Junction Tables -----------------------------------------------------------------------------------------------
@@ -177,11 +371,26 @@ class ListingsAmenities(CustomBase):
     _table_type = "junction"
     _description = "Junction table for listing amenities"
 
-    # While it seems unnecessary to have a primary key for a junction table, SQLAlchemy requires it and using a
-    # composite key here nearly doubles the database size
-    listing_amenity_id = Column(Integer, primary_key=True, autoincrement=True)
-    listing_id = Column(Integer, ForeignKey("ListingsCore.listing_id"))
-    amenity_id = Column(Integer, ForeignKey("Amenities.amenity_id"))
+    # Clustered on its real key without a rowid: the table itself is the (amenity_id, listing_id) index, so both
+    # lookup directions take half the space of a surrogate id with an index on each key order
+    # (see setup/benchmark_amenity_storage.py)
+    amenity_id = Column(
+        Integer,
+        ForeignKey("Amenities.amenity_id"),
+        primary_key=True,
+        autoincrement=False,
+    )
+    listing_id = Column(
+        Integer,
+        ForeignKey("ListingsCore.listing_id"),
+        primary_key=True,
+        autoincrement=False,
+    )
+
+    __table_args__ = (
+        Index("ix_ListingsAmenities_listing_amenity", "listing_id", "amenity_id"),
+        {"sqlite_with_rowid": False},
+    )
 
 
 class AmenityPriceImpacts(CustomBase):
@@ -205,3 +414,72 @@ class AmenityPriceImpacts(CustomBase):
 
     # Total count of listings with this amenity
     amenity_count = Column(Integer)
+
+
+class NeighborhoodStats(CustomBase):
+    __tablename__ = "NeighborhoodStats"
+    _table_type = "analysis"
+    _description = (
+        "Analysis table of listing aggregates per neighborhood; built for the map page"
+    )
+
+    neighborhood_id = Column(
+        Integer, ForeignKey("Neighborhoods.neighborhood_id"), primary_key=True
+    )
+    city_id = Column(Integer, ForeignKey("Cities.city_id"), index=True)
+
+    # Copied from Neighborhoods so the map reads a city's rows without a join
+    neighborhood = Column(String)
+
+    # Listings with a host, and those active in the most recent quarter
+    listing_count = Column(Integer)
+    active_listing_count = Column(Integer)
+
+    # Listings hosted by superhosts, and their share of all listings as a percentage
+    superhost_listing_count = Column(Integer)
+    superhost_share = Column(REAL)
+
+    median_price = Column(REAL)
+    mean_rating = Column(REAL)
+
+    # Area of the neighborhood's polygons in neighbourhoods.geojson, and listings per square kilometre; null for
+    # neighborhoods without a polygon
+    area_square_km = Column(REAL)
+    listing_density = Column(REAL)
+
+
+class HexCellStats(CustomBase):
+    __tablename__ = "HexCellStats"
+    _table_type = "analysis"
+    _description = "Analysis table of listing aggregates per hexagonal grid cell; built for the map page"
+
+    # A cell is addressed by its axial coordinates on a city's grid of one cell size (see charts/hex_grid.py);
+    # clustered on that key, so the map reads one city and resolution as a single range
+    city_id = Column(
+        Integer, ForeignKey("Cities.city_id"), primary_key=True, autoincrement=False
+    )
+    cell_size_meters = Column(Integer, primary_key=True, autoincrement=False)
+    q = Column(Integer, primary_key=True, autoincrement=False)
+    r = Column(Integer, primary_key=True, autoincrement=False)
+
+    # Latitude the city's grid is projected around, needed to draw the cell
+    reference_latitude = Column(REAL)
+
+    # Listings with a host, the median of their prices, and the share hosted by superhosts as a percentage
+    listing_count = Column(Integer)
+    median_price = Column(REAL)
+    superhost_share = Column(REAL)
+
+    __table_args__ = ({"sqlite_with_rowid": False},)
+
+
+# Metadata Tables -----------------------------------------------------------------------------------------------
+class BuildMetadata(CustomBase):
+    __tablename__ = "BuildMetadata"
+    _table_type = "metadata"
+    _description = (
+        "Key/value metadata about the database build, such as the dataset version stamp"
+    )
+
+    key = Column(String, primary_key=True)
+    value = Column(String)
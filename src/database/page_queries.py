@@ -0,0 +1,91 @@
+"""
+Statements behind the Home and Maps pages.
+
+The pages run these through the page query cache; `setup/advise_indexes.py` replays the same statements, so the
+indexes the pages rely on are checked along with the metric and chart queries.
+"""
+
+from sqlalchemy import func, select
+
+from database.models import (
+    Amenities,
+    Cities,
+    HexCellStats,
+    ListingsCore,
+    NeighborhoodStats,
+    Neighborhoods,
+)
+
+# Neighborhood layers the map can be colored by, mapped to their NeighborhoodStats columns
+MAP_LAYERS = {
+    "Listings": "listing_count",
+    "Active listings": "active_listing_count",
+    "Superhost share (%)": "superhost_share",
+    "Median price ($)": "median_price",
+    "Mean rating": "mean_rating",
+    "Listings per km²": "listing_density",
+}
+
+# Grid layers the map can be colored by, mapped to their HexCellStats columns
+HEX_LAYERS = {
+    "Listings": "listing_count",
+    "Superhost share (%)": "superhost_share",
+    "Median price ($)": "median_price",
+}
+
+
+def dataset_counts():
+    """Count statements of the Home page's dataset overview, by name."""
+    return {
+        "listings": select(func.count(ListingsCore.listing_id)),
+        "amenities": select(func.count(Amenities.amenity_id)),
+        "cities": select(func.count(Cities.city_id)),
+        "neighborhoods": select(func.count(Neighborhoods.neighborhood_id)),
+    }
+
+
+def listings_by_city():
+    """Listing count of every city, for the Home page chart."""
+    return (
+        select(
+            Cities.city.label("City"),
+            func.count(ListingsCore.listing_id).label("Count"),
+        )
+        .join(
+            Neighborhoods, Neighborhoods.neighborhood_id == ListingsCore.neighborhood_id
+        )
+        .join(Cities, Cities.city_id == ListingsCore.city_id)
+        .group_by(Cities.city)
+    )
+
+
+def neighborhood_stats(city):
+    """Precomputed aggregates of a city's neighborhoods (setup/generate_neighborhood_stats.py)."""
+    return (
+        select(
+            NeighborhoodStats.neighborhood,
+            *[getattr(NeighborhoodStats, column) for column in MAP_LAYERS.values()],
+            NeighborhoodStats.superhost_listing_count,
+            NeighborhoodStats.area_square_km,
+        )
+        .join(Cities, Cities.city_id == NeighborhoodStats.city_id)
+        .filter(Cities.city == city)
+    )
+
+
+def hex_cells(city, cell_size_meters):
+    """A city's cells of one size (setup/generate_hex_cell_stats.py), with their grid coordinates."""
+    return (
+        select(
+            HexCellStats.q,
+            HexCellStats.r,
+            HexCellStats.cell_size_meters,
+            HexCellStats.reference_latitude,
+            *[getattr(HexCellStats, column) for column in HEX_LAYERS.values()],
+        )
+        .join(Cities, Cities.city_id == HexCellStats.city_id)
+        .filter(
+            Cities.city == city,
+            HexCellStats.cell_size_meters == cell_size_meters,
+        )
+    )
@@ -0,0 +1,187 @@
+"""
+Process-wide cache of page query results.
+
+The Streamlit pages run the same aggregate queries on every rerun and for every session, against a database that
+only changes when a new build is deployed. Results are cached once per process, keyed by the normalized SQL, its
+parameters and the dataset version stamped into BuildMetadata at build time, so every session shares them and a
+newly deployed database is never served results from the previous one.
+"""
+
+import os
+import re
+import sqlite3
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+from sqlalchemy import text
+
+from database import models
+
+MAX_ENTRIES = 256
+
+
+def read_dataset_version(path):
+    """Dataset version stamped into BuildMetadata at build time, or None if the database has no stamp."""
+    connection = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        row = connection.execute(
+            f"SELECT value FROM {models.BuildMetadata.__tablename__} WHERE key = ?",
+            ("dataset_version",),
+        ).fetchone()
+    except sqlite3.OperationalError:
+        # Built before BuildMetadata existed
+        return None
+    finally:
+        connection.close()
+
+    return row[0] if row else None
+
+
+def normalize_sql(sql):
+    """Collapse whitespace and drop the trailing semicolon so formatting differences share an entry."""
+    return re.sub(r"\s+", " ", sql).strip().rstrip(";").strip()
+
+
+class QueryResultCache:
+    def __init__(self, max_entries=MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._results = OrderedDict()
+        self._versions = {}
+        self.hits = 0
+        self.misses = 0
+
+    def dataset_version(self, path):
+        """
+        Version stamp of a database file.
+
+        The stamp is read once per file; a stat on each call notices when a new file has been deployed. Databases
+        built before the stamp existed fall back to the file's modification time and size.
+        """
+        stat = os.stat(path)
+        signature = (path, stat.st_mtime_ns, stat.st_size)
+
+        with self._lock:
+            if signature in self._versions:
+                return self._versions[signature]
+
+        version = read_dataset_version(path) or f"{stat.st_mtime_ns}-{stat.st_size}"
+
+        with self._lock:
+            # Only the current file's version and results are kept
+            self._versions = {signature: version}
+            for key in [key for key in self._results if key[0] != version]:
+                del self._results[key]
+        return version
+
+    def get(self, key):
+        """Cached result for a key whose first item is the dataset version, or None (counted as a miss)."""
+        with self._lock:
+            if key in self._results:
+                self._results.move_to_end(key)
+                self.hits += 1
+                return self._results[key].copy()
+            self.misses += 1
+            return None
+
+    def put(self, key, frame):
+        with self._lock:
+            self._results[key] = frame
+            self._results.move_to_end(key)
+            while len(self._results) > self.max_entries:
+                self._results.popitem(last=False)
+
+    def get_or_query(self, session, statement, params=None):
+        """
+        Result of a query as a DataFrame, from the cache if the same query already ran on this dataset version.
+
+        Parameters:
+        - session: SQLAlchemy session bound to the SQLite database.
+        - statement: SQL string or SQLAlchemy select.
+        - params: Bound parameters of a SQL string.
+
+        Returns:
+        - A copy of the cached DataFrame, so callers can modify it freely.
+        """
+        if isinstance(statement, str):
+            sql = normalize_sql(statement)
+            params = params or {}
+            executable = text(sql)
+        else:
+            compiled = statement.compile(dialect=session.get_bind().dialect)
+            sql = normalize_sql(str(compiled))
+            params = compiled.params
+            executable = statement
+
+        key = (
+            self.dataset_version(session.get_bind().url.database),
+            sql,
+            tuple(sorted((name, repr(value)) for name, value in params.items())),
+        )
+
+        frame = self.get(key)
+        if frame is not None:
+            return frame
+
+        if isinstance(statement, str):
+            result = session.execute(executable, params)
+        else:
+            result = session.execute(executable)
+        frame = pd.DataFrame(result.all(), columns=list(result.keys()))
+
+        self.put(key, frame)
+        return frame.copy()
+
+    def stats(self):
+        with self._lock:
+            requests = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self._results),
+                "hit_rate": self.hits / requests if requests else None,
+                "dataset_version": next(iter(self._versions.values()), None),
+            }
+
+
+_query_cache = QueryResultCache()
+
+
+def shared_query_cache():
+    """The process-wide cache, for executors that run queries outside a SQLAlchemy session."""
+    return _query_cache
+
+
+def cached_query(session, statement, params=None):
+    """Run a page query through the process-wide result cache; see `QueryResultCache.get_or_query`."""
+    return _query_cache.get_or_query(session, statement, params)
+
+
+def cached_scalar(session, statement, params=None):
+    """First column of the first row of a cached query, or None if it returned no rows."""
+    frame = cached_query(session, statement, params)
+    if frame.empty:
+        return None
+
+    value = frame.iloc[0, 0]
+    # Unwrap NumPy scalars so Streamlit widgets get plain Python values
+    return value.item() if hasattr(value, "item") else value
+
+
+def query_cache_stats():
+    """Hits, misses, hit rate, entry count and dataset version of the page query cache for this process."""
+    return _query_cache.stats()
+
+
+def describe_query_cache():
+    """One-line summary of the page query cache for the sidebar stats panel."""
+    stats = query_cache_stats()
+    if stats["hit_rate"] is None:
+        return "Query cache is empty."
+
+    return (
+        f"Query cache: {stats['hit_rate']:.0%} hit rate "
+        f"({stats['hits']} hits, {stats['misses']} misses, {stats['entries']} results) "
+        f"on dataset {stats['dataset_version'][:8]}."
+    )
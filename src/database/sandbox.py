@@ -0,0 +1,217 @@
+"""
+Sandboxed execution of SQL written by the AI Chat agent.
+
+Agent queries never touch the app's read-write engine. Each one runs on a small dedicated pool of read-only
+connections and is limited four ways:
+
+- Only a single SELECT, WITH or VALUES statement is accepted, and the console's authorizer denies anything but reads.
+- A budget of SQLite virtual machine steps, counted through the progress handler, caps the CPU a query may use;
+  a wall-clock deadline backs it up.
+- A query without a trailing LIMIT gets one, so an unbounded result is cut off inside SQLite rather than after it.
+- No more than MAX_ROWS rows are fetched, even if the query's own LIMIT is higher.
+
+Each query's latency, rows returned and virtual machine steps used are logged. Python's sqlite3 exposes no count of
+rows scanned, so the step count (to a resolution of STEP_INTERVAL), which grows with the rows a query visits, stands
+in for it.
+"""
+
+import os
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+import constants
+from database.console import authorize_read_only, validate_sql
+from database.executor import ReadOnlyConnectionPool
+
+# Kept apart from the page executor's pool so agent queries cannot starve page queries
+AGENT_POOL_SIZE = 2
+
+# Roughly a second of CPU; a grouped scan of every ListingsAmenities row fits comfortably
+STEP_BUDGET = 100_000_000
+STEP_INTERVAL = 1_000
+AGENT_TIMEOUT_SECONDS = 10
+
+MAX_ROWS = 100
+
+# A LIMIT clause (with an optional offset) ending the statement, once comments are removed
+TRAILING_LIMIT = re.compile(
+    r"\blimit\s+[^\s,]+(\s*(,|\boffset\b)\s*[^\s,]+)?\s*$", re.IGNORECASE
+)
+
+# Quoted strings and identifiers, which are kept, and comments, which are removed before looking for a LIMIT
+LITERAL_OR_COMMENT = re.compile(
+    r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"|`[^`]*`|\[[^\]]*\]|--[^\n]*|/\*.*?(?:\*/|$)",
+    re.DOTALL,
+)
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+class StepCounter:
+    def __init__(self):
+        self.steps = 0
+
+
+@contextmanager
+def step_budget(connection, max_steps, seconds):
+    """
+    Interrupt any statement run on the connection once it has used `max_steps` virtual machine steps or `seconds`
+    have passed, whichever comes first.
+
+    Yields:
+    - A StepCounter whose `steps` is the number of steps used so far, to a resolution of STEP_INTERVAL.
+    """
+    counter = StepCounter()
+    expires_at = time.monotonic() + seconds
+
+    def progress():
+        counter.steps += STEP_INTERVAL
+        return counter.steps > max_steps or time.monotonic() > expires_at
+
+    connection.set_progress_handler(progress, STEP_INTERVAL)
+    try:
+        yield counter
+    except sqlite3.OperationalError as error:
+        if str(error) == "interrupted":
+            raise QueryBudgetExceeded(
+                f"Query was stopped after {counter.steps:,} steps; "
+                "it scans too many rows. Filter or aggregate more narrowly."
+            ) from error
+        raise
+    finally:
+        connection.set_progress_handler(None, 0)
+
+
+def strip_comments(sql):
+    """The statement with its comments replaced by spaces; comment markers inside quotes are left alone."""
+    return LITERAL_OR_COMMENT.sub(
+        lambda match: " " if match.group().startswith(("--", "/*")) else match.group(),
+        sql,
+    )
+
+
+def add_limit(sql, max_rows=MAX_ROWS):
+    """
+    Returns:
+    - (sql, added): The statement with a LIMIT of max_rows appended unless it already ends with one, ignoring
+      trailing comments.
+    """
+    if TRAILING_LIMIT.search(strip_comments(sql)):
+        return sql, False
+    # On its own line, so a trailing line comment cannot swallow it
+    return f"{sql}\nLIMIT {max_rows}", True
+
+
+class AgentQueryResult:
+    def __init__(self, columns, rows, steps, elapsed_seconds, limit_added, truncated):
+        self.columns = columns
+        self.rows = rows
+        self.steps = steps
+        self.elapsed_seconds = elapsed_seconds
+        self.limit_added = limit_added
+        self.truncated = truncated
+
+
+class AgentQueryExecutor:
+    """
+    Parameters:
+    - path: Database file.
+    - pool_size: Read-only connections kept open.
+    - max_steps: Virtual machine step budget of a query.
+    - timeout: Deadline of a query in seconds.
+    - max_rows: Rows after which a result is cut off.
+    """
+
+    def __init__(
+        self,
+        path=constants.DATABASE_PATH,
+        pool_size=AGENT_POOL_SIZE,
+        max_steps=STEP_BUDGET,
+        timeout=AGENT_TIMEOUT_SECONDS,
+        max_rows=MAX_ROWS,
+    ):
+        self.path = path
+        self.pool_size = pool_size
+        self.max_steps = max_steps
+        self.timeout = timeout
+        self.max_rows = max_rows
+        self._lock = threading.Lock()
+        self._pool = None
+        self._pool_signature = None
+
+    def _current_pool(self):
+        # A redeployed database file gets fresh connections, as in QueryExecutor
+        stat = os.stat(self.path)
+        signature = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            if signature != self._pool_signature:
+                self._pool = ReadOnlyConnectionPool(self.path, self.pool_size)
+                self._pool_signature = signature
+            return self._pool
+
+    def run(self, sql, max_rows=None):
+        """
+        Run one agent query within the sandbox's limits.
+
+        Parameters:
+        - sql: Query text; validated against the console's allow-list.
+        - max_rows: Row cap of this query, at most the executor's max_rows.
+
+        Returns:
+        - AgentQueryResult.
+
+        Raises:
+        - ConsoleQueryError if the statement is not allowed, QueryBudgetExceeded if it ran out of steps or time, or
+          sqlite3.Error if SQLite rejected it.
+        """
+        max_rows = min(max_rows or self.max_rows, self.max_rows)
+        sql, limit_added = add_limit(validate_sql(sql), max_rows)
+
+        start = time.perf_counter()
+        with self._current_pool().connection() as connection:
+            connection.set_authorizer(authorize_read_only)
+            try:
+                with step_budget(connection, self.max_steps, self.timeout) as counter:
+                    cursor = connection.execute(sql)
+                    columns = [column[0] for column in cursor.description or []]
+                    rows = cursor.fetchmany(max_rows + 1)
+                    cursor.close()
+            except (sqlite3.Error, QueryBudgetExceeded) as error:
+                print(
+                    f"Agent query failed after {(time.perf_counter() - start) * 1000:.0f} ms: {error}"
+                )
+                raise
+            finally:
+                connection.set_authorizer(None)
+        elapsed_seconds = time.perf_counter() - start
+
+        truncated = len(rows) > max_rows
+        rows = rows[:max_rows]
+
+        print(
+            f"Agent query: {elapsed_seconds * 1000:.0f} ms, {len(rows)} rows, "
+            f"{counter.steps:,} VM steps{' (limit added)' if limit_added else ''}"
+            f"{' (truncated)' if truncated else ''}: {' '.join(sql.split())[:200]}"
+        )
+
+        return AgentQueryResult(
+            columns, rows, counter.steps, elapsed_seconds, limit_added, truncated
+        )
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def shared_agent_executor():
+    """The process-wide agent query executor on the app database, created on first use."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = AgentQueryExecutor()
+        return _executor
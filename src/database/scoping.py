@@ -0,0 +1,50 @@
+"""
+Shared scoping of listing queries.
+
+Metrics and chart producers narrow their queries to a city, a neighborhood and a quarter cohort. `scoped` applies
+those filters to a query over ListingsCore, joining Cities and Neighborhoods on their keys, so no caller filters on
+a lookup table it has not joined (which SQLite turns into a cartesian product).
+"""
+
+from database import models
+
+ALL_CITIES = "All Cities"
+
+# Quarter cohorts, named after the ListingsCore.was_active_* columns
+CURRENT_COHORT = "most_recent_quarter"
+PRIOR_COHORT = "four_quarters_prior"
+
+
+def active_in(cohort: str):
+    """Filter expression for listings that were active in the cohort's quarter."""
+    return getattr(models.ListingsCore, f"was_active_{cohort}") == 1
+
+
+def scoped(query, city=ALL_CITIES, neighborhood=None, cohort=None):
+    """
+    Scope a query over ListingsCore to a city, a neighborhood and a cohort.
+
+    Parameters:
+    - query: ORM query or select statement whose FROM clause includes ListingsCore.
+    - city: City to filter by. If "All Cities", no city filter is applied.
+    - neighborhood: Neighborhood to filter by, or None for every neighborhood.
+    - cohort: Quarter the listings must have been active in, or None for every listing.
+
+    Returns:
+    - The query with the lookup tables joined on their keys and the filters applied.
+    """
+    if city != ALL_CITIES:
+        query = query.join(
+            models.Cities, models.Cities.city_id == models.ListingsCore.city_id
+        ).filter(models.Cities.city == city)
+
+    if neighborhood is not None:
+        query = query.join(
+            models.Neighborhoods,
+            models.Neighborhoods.neighborhood_id == models.ListingsCore.neighborhood_id,
+        ).filter(models.Neighborhoods.neighborhood == neighborhood)
+
+    if cohort is not None:
+        query = query.filter(active_in(cohort))
+
+    return query
@@ -1,17 +1,28 @@
-from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 
+from database.engine import BUILD, SERVE, create_session, get_engine
 from database.models import Base
-import constants
+from database.spatial import create_location_index
 
-DATABASE_URI = "sqlite:///" + constants.DATABASE_PATH
-
-engine = create_engine(DATABASE_URI, echo=False)  # echo=True will show generated SQL, remove in production
+engine = get_engine(BUILD)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+
+def create_readonly_session():
+    # Build workers only query the finished database, so they share the serving settings
+    return create_session(SERVE)
+
 def init_db():
     # Create tables
     Base.metadata.create_all(bind=engine)
 
+    # create_all only indexes the tables it creates; add indexes declared since an existing table was built
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+
+    # The R*Tree of listing locations is a virtual table, which the models cannot declare
+    create_location_index(engine)
+
 if __name__ == '__main__':
-    init_db()
\ No newline at end of file
+    init_db()
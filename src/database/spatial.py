@@ -0,0 +1,155 @@
+"""
+Bounding-box and radius lookups of listings.
+
+Coordinates live in ListingsLocation as fixed-point integers (see models.FixedPointCoordinate). Each listing is also
+a point in LOCATION_INDEX, an SQLite R*Tree of the `rtree_i32` kind: it keeps the same 32-bit integers, so a box
+query on the index is exact, where the default R*Tree would round every coordinate to a 32-bit float. A radius
+lookup searches the index for the radius's bounding box and keeps the candidates within the great-circle distance.
+
+Coordinates and bounds in and out of this module are in degrees; radii and distances in metres. Boxes crossing the
+antimeridian are not supported.
+
+The index is created with the other tables by `init_db` and filled by `index_locations` once ListingsLocation has
+been populated. `setup/benchmark_spatial_queries.py` checks the table and index against LOCATION_BYTES_BUDGET and
+times both lookups.
+"""
+
+import math
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+from database.models import FixedPointCoordinate
+
+LOCATION_INDEX = "ListingsLocationIndex"
+
+LOCATION_INDEX_DDL = (
+    f'CREATE VIRTUAL TABLE IF NOT EXISTS "{LOCATION_INDEX}" USING rtree_i32('
+    "listing_id, min_latitude, max_latitude, min_longitude, max_longitude)"
+)
+
+# Bytes per listing the coordinates may take, table and R*Tree together
+LOCATION_BYTES_BUDGET = 96
+
+# Mean radius of the Earth
+EARTH_RADIUS_METERS = 6_371_008.8
+
+# The R*Tree holds the exact fixed-point coordinates, so a lookup never reads ListingsLocation
+BOX_QUERY = text(
+    f'SELECT listing_id, min_latitude, min_longitude FROM "{LOCATION_INDEX}" '
+    "WHERE max_latitude >= :south AND min_latitude <= :north "
+    "AND max_longitude >= :west AND min_longitude <= :east"
+)
+
+
+def create_location_index(engine):
+    """Create the (empty) R*Tree of listing locations if the database has none."""
+    with engine.begin() as connection:
+        connection.exec_driver_sql(LOCATION_INDEX_DDL)
+
+
+def index_locations(session):
+    """Rebuild the R*Tree from ListingsLocation; every listing is a point, so each box has equal bounds."""
+    session.execute(text(f'DELETE FROM "{LOCATION_INDEX}"'))
+    session.execute(
+        text(
+            f'INSERT INTO "{LOCATION_INDEX}" '
+            "SELECT listing_id, latitude, latitude, longitude, longitude "
+            'FROM "ListingsLocation" '
+            "WHERE latitude IS NOT NULL AND longitude IS NOT NULL"
+        )
+    )
+    session.commit()
+
+
+def bounding_box(latitude, longitude, radius_meters):
+    """
+    Returns:
+    - (south, west, north, east) of the smallest box holding every point within the radius.
+    """
+    latitude_delta = math.degrees(radius_meters / EARTH_RADIUS_METERS)
+    longitude_delta = math.degrees(
+        radius_meters
+        / (EARTH_RADIUS_METERS * max(math.cos(math.radians(latitude)), 1e-12))
+    )
+    return (
+        latitude - latitude_delta,
+        longitude - longitude_delta,
+        latitude + latitude_delta,
+        longitude + longitude_delta,
+    )
+
+
+def haversine_meters(latitude, longitude, latitudes, longitudes):
+    """Great-circle distances in metres from one point to arrays of points."""
+    latitude, longitude = math.radians(latitude), math.radians(longitude)
+    latitudes, longitudes = np.radians(latitudes), np.radians(longitudes)
+    a = (
+        np.sin((latitudes - latitude) / 2) ** 2
+        + math.cos(latitude)
+        * np.cos(latitudes)
+        * np.sin((longitudes - longitude) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_METERS * np.arcsin(np.sqrt(a))
+
+
+def fixed_point_bound(value, outward):
+    """
+    A box bound as a fixed-point coordinate, moved outward to the next stored value rather than rounded to the
+    nearest, so no listing just inside the bound is left out.
+
+    Parameters:
+    - value: Bound in degrees.
+    - outward: math.floor for a south or west bound, math.ceil for a north or east bound.
+    """
+    scaled = float(value) * FixedPointCoordinate.scale
+    nearest = round(scaled)
+    # A bound that is already a stored value, up to float error, is kept as it is
+    if math.isclose(scaled, nearest, rel_tol=0, abs_tol=1e-6):
+        return nearest
+    return outward(scaled)
+
+
+def listings_in_box(session, south, west, north, east):
+    """
+    Listings whose coordinates fall in a box, bounds included.
+
+    Returns:
+    - DataFrame with listing_id, latitude and longitude columns.
+    """
+    rows = session.execute(
+        BOX_QUERY,
+        {
+            "south": fixed_point_bound(south, math.floor),
+            "west": fixed_point_bound(west, math.floor),
+            "north": fixed_point_bound(north, math.ceil),
+            "east": fixed_point_bound(east, math.ceil),
+        },
+    ).all()
+
+    listings = pd.DataFrame(rows, columns=["listing_id", "latitude", "longitude"])
+    listings[["latitude", "longitude"]] = (
+        listings[["latitude", "longitude"]].astype(float) / FixedPointCoordinate.scale
+    )
+    return listings
+
+
+def listings_within(session, latitude, longitude, radius_meters):
+    """
+    Listings within a distance of a point, e.g. every listing within 1 km.
+
+    Returns:
+    - DataFrame with listing_id, latitude, longitude and distance_meters columns, nearest first.
+    """
+    listings = listings_in_box(
+        session, *bounding_box(latitude, longitude, radius_meters)
+    )
+    listings["distance_meters"] = haversine_meters(
+        latitude, longitude, listings["latitude"], listings["longitude"]
+    )
+    return (
+        listings[listings["distance_meters"] <= radius_meters]
+        .sort_values("distance_meters")
+        .reset_index(drop=True)
+    )
@@ -0,0 +1,71 @@
+"""
+Availability metrics of the listings active in a quarter.
+
+Availability is a snapshot taken at the scrape, so a cohort selects which listings are measured but the values do
+not change with it, and the metrics have no year-on-year delta. Values are read from the packed arrays of
+`database.availability`; listings without availability are left out.
+"""
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from database import models
+from database.availability import availability_of
+from database.scoping import CURRENT_COHORT, scoped
+
+
+def cohort_availability(
+    session: Session, city: str, window: str, cohort: str = CURRENT_COHORT
+):
+    """
+    Returns:
+    - Float array of the days available in the window of each listing of the cohort, without missing values.
+    """
+    query = session.query(models.ListingsCore.listing_id, models.ListingsCore.city_id)
+    listings = scoped(query, city, cohort=cohort).all()
+    if not listings:
+        return np.empty(0)
+
+    listing_ids, city_ids = zip(*listings)
+    values = availability_of(session, listing_ids, window, city_ids=set(city_ids))
+    return values[~np.isnan(values)]
+
+
+def _mean_days(values):
+    return float(values.mean()) if len(values) else None
+
+
+def _booked_out_percent(values):
+    return float((values == 0).mean() * 100) if len(values) else None
+
+
+def mean_availability_30(session: Session, city: str, cohort: str = CURRENT_COHORT):
+    """Mean number of days listings are available to book in the next 30 days."""
+    return _mean_days(cohort_availability(session, city, "availability_30", cohort))
+
+
+def mean_availability_365(session: Session, city: str, cohort: str = CURRENT_COHORT):
+    """Mean number of days listings are available to book in the next 365 days."""
+    return _mean_days(cohort_availability(session, city, "availability_365", cohort))
+
+
+def booked_out_percent(session: Session, city: str, cohort: str = CURRENT_COHORT):
+    """Percentage of listings with no day available to book in the next 30 days."""
+    return _booked_out_percent(
+        cohort_availability(session, city, "availability_30", cohort)
+    )
+
+
+def availability_metrics(session: Session, city: str):
+    """
+    Returns:
+    - Dict of the availability metrics of the current cohort, keyed like the registered metrics in metrics.json.
+    """
+    # Each window is decoded once; both 30-day metrics come from the same values
+    next_30_days = cohort_availability(session, city, "availability_30")
+    next_365_days = cohort_availability(session, city, "availability_365")
+    return {
+        "mean_availability_30": _mean_days(next_30_days),
+        "mean_availability_365": _mean_days(next_365_days),
+        "booked_out_percent": _booked_out_percent(next_30_days),
+    }
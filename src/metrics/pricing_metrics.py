@@ -4,24 +4,21 @@ from sqlalchemy import and_, desc, func
 from sqlalchemy.orm import Session
 
 from database import models
+from database.scoping import CURRENT_COHORT, PRIOR_COHORT, scoped
 
+# Year in which a listing's first review must fall to count as new in each cohort
+NEW_LISTING_YEARS = {CURRENT_COHORT: "2023", PRIOR_COHORT: "2022"}
 
-def median_superhost_price(session: Session, city: str):
+
+def median_superhost_price(session: Session, city: str, cohort: str = CURRENT_COHORT):
     """
     Calculate the median price for listings owned by superhosts.
     """
     query = session.query(models.ListingsCore.price).join(models.Hosts)
 
-    if city != "All Cities":
-        query = query.join(
-            models.Cities, models.ListingsCore.city_id == models.Cities.city_id
-        )
-        query = query.filter(models.Cities.city == city)
+    query = scoped(query, city, cohort=cohort)
 
-    prices = query.filter(
-        models.Hosts.host_is_superhost == 1,
-        models.ListingsCore.was_active_most_recent_quarter == 1,
-    ).all()
+    prices = query.filter(models.Hosts.host_is_superhost == 1).all()
     prices = [p[0] for p in prices]
     return sorted(prices)[len(prices) // 2] if prices else None
 
@@ -29,36 +26,28 @@ def median_superhost_price(session: Session, city: str):
 # Similar changes can be made to other functions
 
 
-def mean_price(session: Session, city: str):
+def mean_price(session: Session, city: str, cohort: str = CURRENT_COHORT):
     """
     Calculate the mean price across all active listings.
     """
     query = session.query(func.avg(models.ListingsCore.price))
 
-    if city != "All Cities":
-        query = query.join(
-            models.Cities, models.ListingsCore.city_id == models.Cities.city_id
-        )
-        query = query.filter(models.Cities.city == city)
+    query = scoped(query, city, cohort=cohort)
 
-    return query.filter(
-        models.ListingsCore.was_active_most_recent_quarter == 1
-    ).scalar()
+    return query.scalar()
 
 
-def ninetieth_percentile_price(session: Session, city: str):
+def ninetieth_percentile_price(
+    session: Session, city: str, cohort: str = CURRENT_COHORT
+):
     """
     Calculate the price which is higher than 90% of the listing prices.
     """
     query = session.query(models.ListingsCore.price)
 
-    if city != "All Cities":
-        query = query.join(
-            models.Cities, models.ListingsCore.city_id == models.Cities.city_id
-        )
-        query = query.filter(models.Cities.city == city)
+    query = scoped(query, city, cohort=cohort)
 
-    prices = query.filter(models.ListingsCore.was_active_most_recent_quarter == 1).all()
+    prices = query.all()
     prices = sorted([p[0] for p in prices])
     idx = int(0.9 * len(prices))
     return prices[idx] if prices else None
@@ -69,20 +58,7 @@ def median_superhost_price_delta(session: Session, city: str):
     Calculate the change in median superhost price from four quarters ago.
     """
     current_price = median_superhost_price(session, city)
-
-    query = session.query(models.ListingsCore.price).join(models.Hosts)
-    if city != "All Cities":
-        query = query.join(
-            models.Cities, models.ListingsCore.city_id == models.Cities.city_id
-        )
-        query = query.filter(models.Cities.city == city)
-
-    prices = query.filter(
-        models.Hosts.host_is_superhost == 1,
-        models.ListingsCore.was_active_four_quarters_prior == 1,
-    ).all()
-    prices = [p[0] for p in prices]
-    previous_price = sorted(prices)[len(prices) // 2] if prices else None
+    previous_price = median_superhost_price(session, city, PRIOR_COHORT)
 
     return (current_price or 0) - (previous_price or 0)
 
@@ -92,41 +68,25 @@ def mean_price_delta(session: Session, city: str):
     Calculate the change in mean price from four quarters ago.
     """
     current_mean = mean_price(session, city)
-    query = session.query(func.avg(models.ListingsCore.price))
-
-    if city != "All Cities":
-        query = query.join(
-            models.Cities, models.ListingsCore.city_id == models.Cities.city_id
-        )
-        query = query.filter(models.Cities.city == city)
-
-    previous_mean = query.filter(
-        models.ListingsCore.was_active_four_quarters_prior == 1
-    ).scalar()
+    previous_mean = mean_price(session, city, PRIOR_COHORT)
     return (current_mean or 0) - (previous_mean or 0)
 
 
-def mean_new_listing_price(session: Session, city: str):
+def mean_new_listing_price(session: Session, city: str, cohort: str = CURRENT_COHORT):
     """
-    Calculate the mean listing price of new listings in the most recent quarter.
+    Calculate the mean listing price of new listings in the cohort's quarter.
     """
-    query = (
-        session.query(models.ListingsCore.price)
-        .join(
-            models.ListingsReviewsSummary,
-            models.ListingsReviewsSummary.listing_id == models.ListingsCore.listing_id,
-        )
-        .filter(models.ListingsCore.was_active_most_recent_quarter == 1)
+    query = session.query(models.ListingsCore.price).join(
+        models.ListingsReviewsSummary,
+        models.ListingsReviewsSummary.listing_id == models.ListingsCore.listing_id,
     )
 
-    if city != "All Cities":
-        query = query.join(
-            models.Cities, models.ListingsCore.city_id == models.Cities.city_id
-        )
-        query = query.filter(models.Cities.city == city)
+    query = scoped(query, city, cohort=cohort)
 
     new_listing_prices = query.filter(
-        models.ListingsReviewsSummary.first_review.like("2023-%")
+        models.ListingsReviewsSummary.first_review.between(
+            f"{NEW_LISTING_YEARS[cohort]}-01-01", f"{NEW_LISTING_YEARS[cohort]}-12-31"
+        )
     ).all()
     new_listing_prices = [p[0] for p in new_listing_prices]
 
@@ -140,32 +100,9 @@ def mean_new_listing_price_delta(session: Session, city: str):
     Calculate the change in the mean listing price for new listings from four quarters prior.
     """
     current_mean_price = mean_new_listing_price(session, city)
-    query = (
-        session.query(models.ListingsCore.price)
-        .join(
-            models.ListingsReviewsSummary,
-            models.ListingsReviewsSummary.listing_id == models.ListingsCore.listing_id,
-        )
-        .filter(models.ListingsCore.was_active_four_quarters_prior == 1)
-    )
-
-    if city != "All Cities":
-        query = query.join(
-            models.Cities, models.ListingsCore.city_id == models.Cities.city_id
-        )
-        query = query.filter(models.Cities.city == city)
-
-    previous_new_listing_prices = query.filter(
-        models.ListingsReviewsSummary.first_review.like("2022-%")
-    ).all()
-    previous_new_listing_prices = [p[0] for p in previous_new_listing_prices]
+    previous_mean_price = mean_new_listing_price(session, city, PRIOR_COHORT)
 
-    return (
-        current_mean_price
-        - sum(previous_new_listing_prices) / len(previous_new_listing_prices)
-        if previous_new_listing_prices
-        else 0
-    )
+    return current_mean_price - previous_mean_price if previous_mean_price else 0
 
 
 def ninetieth_percentile_price_delta(session: Session, city: str):
@@ -173,17 +110,6 @@ def ninetieth_percentile_price_delta(session: Session, city: str):
     Calculate the change in 90th percentile price from four quarters ago.
     """
     current_90th = ninetieth_percentile_price(session, city)
-    query = session.query(models.ListingsCore.price)
-
-    if city != "All Cities":
-        query = query.join(
-            models.Cities, models.ListingsCore.city_id == models.Cities.city_id
-        )
-        query = query.filter(models.Cities.city == city)
-
-    prices = query.filter(models.ListingsCore.was_active_four_quarters_prior == 1).all()
-    prices = sorted([p[0] for p in prices])
-    idx = int(0.9 * len(prices))
-    previous_90th = prices[idx] if prices else None
+    previous_90th = ninetieth_percentile_price(session, city, PRIOR_COHORT)
 
     return (current_90th or 0) - (previous_90th or 0)
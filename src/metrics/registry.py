@@ -0,0 +1,352 @@
+"""
+Declarative registry of the dashboard metrics.
+
+Each metric names an aggregation, a value column, the cohort it is measured on and an optional delta cohort
+(normally the same quarter one year earlier). Rather than running one query per metric, the registry compiles
+every registered metric into a single statement per city using conditional aggregates, so adding a metric does
+not add a scan. Order statistics (medians and percentiles) cannot be expressed as SQLite aggregates; they share
+one projected scan whose rows are flagged with the cohorts they belong to.
+"""
+
+from sqlalchemy import and_, case, distinct, func, or_, select
+from sqlalchemy.orm import Session
+
+from database import models
+from database.scoping import scoped
+
+# Cohort predicates --------------------------------------------------------------------------------------------------
+CURRENT_QUARTER = models.ListingsCore.was_active_most_recent_quarter == 1
+PRIOR_YEAR_QUARTER = models.ListingsCore.was_active_four_quarters_prior == 1
+SUPERHOST = models.Hosts.host_is_superhost == 1
+
+# Aggregations that compile to a single SQL aggregate; the rest are computed from the shared projected scan
+SQL_AGGREGATIONS = ("count", "count_distinct", "mean", "percent")
+ORDER_AGGREGATIONS = ("median", "quantile")
+
+
+class Metric:
+    """
+    A single registered metric.
+
+    Parameters:
+    - name: Key of the metric in metrics.json; the delta is stored under "<name>_delta".
+    - aggregation: One of "count", "count_distinct", "mean", "percent", "median" or "quantile".
+    - column: Value column. For "percent" this is the condition whose share of the cohort is measured.
+    - cohort: Predicate selecting the rows the metric is measured on.
+    - delta_cohort: Predicate for the comparison cohort, or None if the metric has no delta.
+    - delta: How the delta is derived; "difference", "if_previous" or "if_both" (see `_delta`).
+    - empty: Value reported when the cohort is empty.
+    - quantile: Position used by the "quantile" aggregation.
+    """
+
+    def __init__(
+        self,
+        name,
+        aggregation,
+        column,
+        cohort,
+        delta_cohort=None,
+        delta="difference",
+        empty=None,
+        quantile=0.5,
+    ):
+        if aggregation not in SQL_AGGREGATIONS + ORDER_AGGREGATIONS:
+            raise ValueError(f"Unknown aggregation for metric {name}: {aggregation}")
+
+        self.name = name
+        self.aggregation = aggregation
+        self.column = column
+        self.cohort = cohort
+        self.delta_cohort = delta_cohort
+        self.delta = delta
+        self.empty = empty
+        self.quantile = quantile
+
+    def cohorts(self):
+        if self.delta_cohort is None:
+            return [self.cohort]
+        return [self.cohort, self.delta_cohort]
+
+
+METRICS = [
+    # Overview ------------------------------------------------------------------------------------------------------
+    Metric(
+        "active_listings",
+        "count",
+        models.ListingsCore.listing_id,
+        CURRENT_QUARTER,
+        PRIOR_YEAR_QUARTER,
+    ),
+    Metric(
+        "active_hosts",
+        "count_distinct",
+        models.ListingsCore.host_id,
+        CURRENT_QUARTER,
+        PRIOR_YEAR_QUARTER,
+    ),
+    Metric(
+        "median_price",
+        "quantile",
+        models.ListingsCore.price,
+        CURRENT_QUARTER,
+        PRIOR_YEAR_QUARTER,
+    ),
+    Metric(
+        "median_review_score",
+        "quantile",
+        models.ListingsReviewsSummary.review_scores_rating,
+        CURRENT_QUARTER,
+        PRIOR_YEAR_QUARTER,
+    ),
+    # Pricing -------------------------------------------------------------------------------------------------------
+    Metric(
+        "mean_price",
+        "mean",
+        models.ListingsCore.price,
+        CURRENT_QUARTER,
+        PRIOR_YEAR_QUARTER,
+    ),
+    Metric(
+        "ninetieth_percentile_price",
+        "quantile",
+        models.ListingsCore.price,
+        CURRENT_QUARTER,
+        PRIOR_YEAR_QUARTER,
+        quantile=0.9,
+    ),
+    Metric(
+        "median_superhost_price",
+        "quantile",
+        models.ListingsCore.price,
+        and_(CURRENT_QUARTER, SUPERHOST),
+        and_(PRIOR_YEAR_QUARTER, SUPERHOST),
+    ),
+    Metric(
+        "mean_new_listing_price",
+        "mean",
+        models.ListingsCore.price,
+        and_(
+            CURRENT_QUARTER,
+            models.ListingsReviewsSummary.first_review.between(
+                "2023-01-01", "2023-12-31"
+            ),
+        ),
+        and_(
+            PRIOR_YEAR_QUARTER,
+            models.ListingsReviewsSummary.first_review.between(
+                "2022-01-01", "2022-12-31"
+            ),
+        ),
+        delta="if_previous",
+        empty=0,
+    ),
+    # Reviews -------------------------------------------------------------------------------------------------------
+    Metric(
+        "mean_reviews_score",
+        "mean",
+        models.ListingsReviewsSummary.review_scores_rating,
+        CURRENT_QUARTER,
+        PRIOR_YEAR_QUARTER,
+        delta="if_previous",
+    ),
+    Metric(
+        "median_review_count",
+        "median",
+        models.ListingsReviewsSummary.number_of_reviews,
+        CURRENT_QUARTER,
+        PRIOR_YEAR_QUARTER,
+        delta="if_both",
+    ),
+    Metric(
+        "mean_superhost_reviews_score",
+        "mean",
+        models.ListingsReviewsSummary.review_scores_rating,
+        and_(CURRENT_QUARTER, SUPERHOST),
+        and_(PRIOR_YEAR_QUARTER, SUPERHOST),
+        delta="if_previous",
+    ),
+    Metric(
+        "superhost_percent",
+        "percent",
+        SUPERHOST,
+        CURRENT_QUARTER,
+        PRIOR_YEAR_QUARTER,
+        empty=0,
+    ),
+]
+
+
+# Compiler -----------------------------------------------------------------------------------------------------------
+def _expression_key(expression):
+    return str(expression.compile(compile_kwargs={"literal_binds": True}))
+
+
+def _scope(statement, city):
+    """Join the review summary and host rows of each listing and apply the city filter."""
+    statement = statement.select_from(models.ListingsCore).outerjoin(
+        models.ListingsReviewsSummary,
+        models.ListingsReviewsSummary.listing_id == models.ListingsCore.listing_id,
+    )
+    statement = statement.outerjoin(
+        models.Hosts, models.Hosts.host_id == models.ListingsCore.host_id
+    )
+
+    return scoped(statement, city)
+
+
+def _sql_aggregates(aggregation, column, cohort):
+    if aggregation == "count":
+        return [func.count(case((cohort, 1)))]
+    if aggregation == "count_distinct":
+        return [func.count(distinct(case((cohort, column))))]
+    if aggregation == "mean":
+        # Typed like the column, so encoded columns (see models.ScaledScore) come back decoded
+        return [func.avg(case((cohort, column)), type_=column.type)]
+    # "percent" needs the matching rows and the cohort size
+    return [func.count(case((and_(cohort, column), 1))), func.count(case((cohort, 1)))]
+
+
+def compile_metrics(metrics, city):
+    """
+    Compile the metrics into two statements scoped to the city.
+
+    Returns:
+    - The aggregate statement with one conditional aggregate per distinct (aggregation, column, cohort), or None.
+    - The projected scan used for order statistics, or None.
+    - A dict mapping each (metric name, cohort index) to the output positions it reads.
+    - The number of value columns in the projected scan; the cohort flags follow them.
+    """
+    aggregate_columns = []
+    aggregate_positions = {}
+    sample_columns = []
+    sample_cohorts = []
+    sample_column_keys = {}
+    sample_cohort_keys = {}
+    layout = {}
+
+    for metric in metrics:
+        for cohort_index, cohort in enumerate(metric.cohorts()):
+            if metric.aggregation in SQL_AGGREGATIONS:
+                key = (
+                    metric.aggregation,
+                    _expression_key(metric.column),
+                    _expression_key(cohort),
+                )
+                if key not in aggregate_positions:
+                    expressions = _sql_aggregates(
+                        metric.aggregation, metric.column, cohort
+                    )
+                    aggregate_positions[key] = list(
+                        range(
+                            len(aggregate_columns),
+                            len(aggregate_columns) + len(expressions),
+                        )
+                    )
+                    aggregate_columns.extend(expressions)
+                layout[(metric.name, cohort_index)] = aggregate_positions[key]
+            else:
+                column_key = _expression_key(metric.column)
+                cohort_key = _expression_key(cohort)
+                if column_key not in sample_column_keys:
+                    sample_column_keys[column_key] = len(sample_columns)
+                    sample_columns.append(metric.column)
+                if cohort_key not in sample_cohort_keys:
+                    sample_cohort_keys[cohort_key] = len(sample_cohorts)
+                    sample_cohorts.append(cohort)
+                layout[(metric.name, cohort_index)] = [
+                    sample_column_keys[column_key],
+                    sample_cohort_keys[cohort_key],
+                ]
+
+    aggregate_statement = None
+    if aggregate_columns:
+        aggregate_statement = _scope(select(*aggregate_columns), city)
+
+    sample_statement = None
+    if sample_columns:
+        flags = [case((cohort, 1), else_=0) for cohort in sample_cohorts]
+        sample_statement = _scope(select(*sample_columns, *flags), city).where(
+            or_(*sample_cohorts)
+        )
+
+    return aggregate_statement, sample_statement, layout, len(sample_columns)
+
+
+# Evaluation ---------------------------------------------------------------------------------------------------------
+def _median(values):
+    values = sorted(values)
+    mid_idx = len(values) // 2
+    if len(values) % 2 == 0:
+        return (values[mid_idx - 1] + values[mid_idx]) / 2
+    return values[mid_idx]
+
+
+def _quantile(values, quantile):
+    return sorted(values)[int(quantile * len(values))]
+
+
+def _delta(mode, current, previous):
+    if mode == "difference":
+        return (current or 0) - (previous or 0)
+    if mode == "if_previous":
+        return current - previous if previous else None
+    # "if_both"
+    if current is None or previous is None:
+        return None
+    return current - previous
+
+
+def evaluate_metrics(session: Session, city: str, metrics=None):
+    """
+    Evaluate the registered metrics for a city with one aggregate statement and at most one projected scan.
+
+    Returns a dict with each metric's value followed by its "<name>_delta" if the metric has a delta cohort.
+    """
+    metrics = METRICS if metrics is None else metrics
+    aggregate_statement, sample_statement, layout, sample_width = compile_metrics(
+        metrics, city
+    )
+
+    aggregates = ()
+    if aggregate_statement is not None:
+        aggregates = session.execute(aggregate_statement).one()
+
+    samples = []
+    if sample_statement is not None:
+        samples = session.execute(sample_statement).all()
+
+    def value(metric, cohort_index):
+        positions = layout[(metric.name, cohort_index)]
+
+        if metric.aggregation in ("count", "count_distinct", "mean"):
+            result = aggregates[positions[0]]
+        elif metric.aggregation == "percent":
+            matching, total = (aggregates[position] for position in positions)
+            result = (matching / total) * 100 if total else None
+        else:
+            column_idx, cohort_idx = positions
+            values = [
+                row[column_idx]
+                for row in samples
+                if row[sample_width + cohort_idx] and row[column_idx] is not None
+            ]
+            if not values:
+                result = None
+            elif metric.aggregation == "median":
+                result = _median(values)
+            else:
+                result = _quantile(values, metric.quantile)
+
+        return metric.empty if result is None else result
+
+    results = {}
+    for metric in metrics:
+        current = value(metric, 0)
+        results[metric.name] = current
+
+        if metric.delta_cohort is not None:
+            previous = value(metric, 1)
+            delta = _delta(metric.delta, current, previous)
+            results[f"{metric.name}_delta"] = metric.empty if delta is None else delta
+
+    return results
@@ -1,9 +1,21 @@
 import json
+import sqlite3
 import webbrowser
 
 import pandas as pd
 import streamlit as st
 
+from database.console import (
+    CONSOLE_TIMEOUT_SECONDS,
+    IDLE_TIMEOUT_SECONDS,
+    MAX_ROWS,
+    PAGE_SIZE,
+    ConsoleCursor,
+    ConsoleQueryError,
+)
+from database.executor import QueryTimeout, shared_executor
+from database.query_cache import describe_query_cache
+
 # Load queries from JSON file
 with open("data/exploration_queries.json", "r") as file:
     queries = json.load(file)
@@ -23,31 +35,43 @@ st.sidebar.markdown("Developed by Ben Harman and powered by Streamlit.")
 if st.sidebar.button("🌐 benharman.dev"):
     webbrowser.open_new_tab("https://benharman.dev")
 
-conn = st.experimental_connection("listings_sqlite", type="sql")
-
 st.title("🔍 SQL Exploration")
 
 
-def refresh_data():
-    for query_info in queries:
-        # Use the value from JSON if it exists, otherwise execute the query
-        if "value" in query_info:
-            value = query_info["value"]
-        else:
-            try:
-                result = conn.query(query_info["query"])
-                value = result.iloc[0, 0] if not result.empty else "No result"
-            except Exception as e:
-                value = f"Error: {e}"
+def format_value(result):
+    if isinstance(result, Exception):
+        return f"Error: {result}"
+    return result.iloc[0, 0] if not result.empty else "No result"
+
+
+def refresh_data(text_placeholders):
+    """
+    Run every query against the database and fill in its text as soon as it finishes.
+
+    Queries run concurrently on read-only connections, each bounded by the executor's deadline, so one slow query
+    neither blocks nor delays the others. Results already computed on this dataset version come from the cache.
+    """
+    queries_by_id = {query_info["id"]: query_info for query_info in queries}
 
-        # Format the text with the retrieved or given value
-        query_info["text"] = query_info["text"].format(value=value)
+    for query_id, result in shared_executor().run_queries(
+        {
+            query_id: query_info["query"]
+            for query_id, query_info in queries_by_id.items()
+        }
+    ):
+        text_placeholders[query_id].markdown(
+            queries_by_id[query_id]["text"].format(value=format_value(result))
+        )
 
 
 def display_query_info(query_info):
+    """Display a query with its stored value and return the placeholder holding its text."""
     with st.container():
-        # Display the main text
-        st.markdown(query_info["text"])
+        # Display the main text, with the value stored in the JSON file until the query is refreshed
+        text_placeholder = st.empty()
+        text_placeholder.markdown(
+            query_info["text"].format(value=query_info.get("value", "…"))
+        )
         st.code(query_info["query"])
 
         # Expander for the logic
@@ -67,12 +91,77 @@ def display_query_info(query_info):
 
         st.text("")
 
+    return text_placeholder
 
-refresh_data()
 
+refresh_requested = st.button("Refresh Data")
 
-if st.button("Refresh Data"):
-    refresh_data()
+text_placeholders = {
+    query_info["id"]: display_query_info(query_info) for query_info in queries
+}
 
-for query_info in queries:
-    display_query_info(query_info)
+if refresh_requested:
+    refresh_data(text_placeholders)
+
+
+# Ad-hoc query console ---------------------------------------------------------
+st.header("🧪 Run your own query")
+st.caption(
+    f"Read-only SELECT queries only. Each query and page fetch is stopped after {CONSOLE_TIMEOUT_SECONDS} s, "
+    f"and at most {MAX_ROWS:,} rows are returned, {PAGE_SIZE} at a time."
+)
+
+console_sql = st.text_area(
+    "SQL",
+    value="SELECT city, COUNT(*) AS listings\nFROM ListingsCore\nJOIN Cities USING (city_id)\nGROUP BY city",
+)
+run_column, next_column = st.columns(2)
+
+
+def close_console_cursor():
+    if "console_cursor" in st.session_state:
+        st.session_state.console_cursor.close()
+        del st.session_state.console_cursor
+
+
+if run_column.button("Run query"):
+    close_console_cursor()
+    try:
+        st.session_state.console_cursor = ConsoleCursor(console_sql)
+        st.session_state.console_page = st.session_state.console_cursor.next_page()
+    except (ConsoleQueryError, QueryTimeout, sqlite3.Error) as error:
+        close_console_cursor()
+        st.error(str(error))
+
+console_cursor = st.session_state.get("console_cursor")
+
+if console_cursor is not None:
+    if next_column.button("Next page", disabled=console_cursor.exhausted):
+        try:
+            st.session_state.console_page = console_cursor.next_page()
+        except (QueryTimeout, sqlite3.Error) as error:
+            st.error(str(error))
+
+    first_row = console_cursor.rows_fetched - len(st.session_state.console_page) + 1
+    st.caption(
+        f"Page {console_cursor.pages_fetched} (rows {first_row:,}–{console_cursor.rows_fetched:,}) · "
+        f"{console_cursor.elapsed_seconds * 1000:.0f} ms executing"
+        + (" · cut off at the row limit" if console_cursor.truncated else "")
+        + (
+            f" · closed after {IDLE_TIMEOUT_SECONDS // 60} min idle; run the query again for more rows"
+            if console_cursor.closed_idle
+            else ""
+        )
+        + (
+            " · end of results"
+            if console_cursor.exhausted
+            and not (console_cursor.truncated or console_cursor.closed_idle)
+            else ""
+        )
+    )
+    st.dataframe(st.session_state.console_page, use_container_width=True)
+
+    with st.expander("🧭 Query plan", expanded=False):
+        st.code("\n".join(console_cursor.plan) or "No plan")
+
+st.sidebar.caption(describe_query_cache())
@@ -3,10 +3,13 @@ import webbrowser
 import altair as alt
 import pandas as pd
 import streamlit as st
-from sqlalchemy import func, literal_column
 
+from charts.hex_grid import RESOLUTIONS, hex_features
+from charts.map_shapes import load_neighborhood_shapes
 from constants import CITIES
-from database.models import Cities, Hosts, ListingsCore, Neighborhoods
+from database.engine import SERVE, create_session
+from database.page_queries import HEX_LAYERS, MAP_LAYERS, hex_cells, neighborhood_stats
+from database.query_cache import cached_query, describe_query_cache
 
 # Set up streamlit page
 st.set_page_config(
@@ -17,8 +20,6 @@ st.set_page_config(
     menu_items=None,
 )
 
-conn = st.experimental_connection("listings_sqlite", type="sql")
-
 # Configure the sidebar
 st.sidebar.text("")
 st.sidebar.text("")
@@ -32,50 +33,111 @@ st.title("🗺️ Airbnb Advisor | Map")
 # Add session state variable for city selection
 selected_city = st.selectbox("Which city would you like to explore?", CITIES)
 
-# Update the URL to include the selected city
-geojson_url = f"https://raw.githubusercontent.com/benharmandev/airbnb-advisor/main/data/usa/{selected_city}/neighbourhoods.geojson"
-geojson_data = alt.Data(url=geojson_url, format=alt.DataFormat(property="features"))
-
+selected_grid = st.radio(
+    "How would you like to divide the city?",
+    ["Neighborhoods", "Hex grid"],
+    horizontal=True,
+)
 
 # Set the selected city to "Los Angeles" if "All Cities" is selected
 if selected_city == "All Cities":
     selected_city = "Los Angeles"
 
-# Query to get data from the database using conn.session
-result = (
-    conn.session.query(
-        Neighborhoods.neighborhood,
-        func.count(ListingsCore.listing_id).label("num_listings"),
-        func.sum(Hosts.host_is_superhost).label("num_superhosts"),
+if selected_grid == "Neighborhoods":
+    selected_layer = st.selectbox(
+        "What would you like to color neighborhoods by?", list(MAP_LAYERS)
     )
-    .join(ListingsCore, ListingsCore.neighborhood_id == Neighborhoods.neighborhood_id)
-    .join(Hosts, Hosts.host_id == ListingsCore.host_id)
-    .filter(
-        Neighborhoods.city_id
-        == (conn.session.query(Cities.city_id).filter_by(city=selected_city).first()[0])
-    )
-    .group_by(Neighborhoods.neighborhood)
-    .all()
-)
 
-# Process the result and pass it to the Altair chart for visualization
-neighborhood_data = pd.DataFrame(result)
+    # Load the city's neighborhood shapes from local disk (simplified by setup/generate_map_shapes.py)
+    neighborhood_shapes = load_neighborhood_shapes(selected_city)
+    if neighborhood_shapes is None:
+        st.info(f"No neighborhood shapes are available for {selected_city}.")
+        map_chart = None
+    else:
+        geojson_data = alt.Data(values=neighborhood_shapes)
 
+        # Read the city's precomputed neighborhood aggregates (setup/generate_neighborhood_stats.py); results are
+        # cached per dataset version and shared by every session. The page's session is closed as soon as the query
+        # returns, which hands its connection back to the serving pool
+        with create_session(SERVE) as session:
+            neighborhood_data = cached_query(session, neighborhood_stats(selected_city))
+        layer_column = MAP_LAYERS[selected_layer]
 
-# Visualize the map
-map_chart = (
-    alt.Chart(geojson_data)
-    .mark_geoshape(stroke="rgba(49, 51, 63, 0.2)", strokeWidth=1)
-    .encode(
-        color="num_listings:Q",
-        tooltip=["properties.neighbourhood:N", "num_listings:Q", "num_superhosts:Q"],
+        # Visualize the map
+        map_chart = (
+            alt.Chart(geojson_data)
+            .mark_geoshape(stroke="rgba(49, 51, 63, 0.2)", strokeWidth=1)
+            .encode(
+                color=alt.Color(f"{layer_column}:Q", title=selected_layer),
+                tooltip=[
+                    alt.Tooltip("properties.neighbourhood:N", title="Neighborhood"),
+                    alt.Tooltip("listing_count:Q", title="Listings"),
+                    alt.Tooltip("active_listing_count:Q", title="Active listings"),
+                    alt.Tooltip(
+                        "superhost_listing_count:Q", title="Superhost listings"
+                    ),
+                    alt.Tooltip(
+                        "superhost_share:Q", title="Superhost share (%)", format=".1f"
+                    ),
+                    alt.Tooltip("median_price:Q", title="Median price", format="$,.0f"),
+                    alt.Tooltip("mean_rating:Q", title="Mean rating", format=".2f"),
+                    alt.Tooltip("area_square_km:Q", title="Area (km²)", format=",.1f"),
+                    alt.Tooltip(
+                        "listing_density:Q", title="Listings per km²", format=",.1f"
+                    ),
+                ],
+            )
+            .transform_lookup(
+                lookup="properties.neighbourhood",
+                from_=alt.LookupData(
+                    neighborhood_data,
+                    "neighborhood",
+                    [
+                        column
+                        for column in neighborhood_data.columns
+                        if column != "neighborhood"
+                    ],
+                ),
+            )
+            .properties(width="container", height=600)
+        )
+else:
+    selected_resolution = st.selectbox(
+        "How large should the cells be?", list(RESOLUTIONS)
     )
-    .transform_lookup(
-        lookup="properties.neighbourhood",
-        from_=alt.LookupData(
-            neighborhood_data, "neighborhood", ["num_listings", "num_superhosts"]
-        ),
+    selected_layer = st.selectbox(
+        "What would you like to color cells by?", list(HEX_LAYERS)
     )
-    .properties(width="container", height=600)
-)
-st.altair_chart(map_chart, use_container_width=True)
+
+    # Read only the city's cells at the chosen size (setup/generate_hex_cell_stats.py); cells are drawn from their
+    # grid coordinates, so no shapes are loaded
+    with create_session(SERVE) as session:
+        cell_data = cached_query(
+            session, hex_cells(selected_city, RESOLUTIONS[selected_resolution])
+        )
+    layer_column = HEX_LAYERS[selected_layer]
+
+    # Visualize the map
+    map_chart = (
+        alt.Chart(alt.Data(values=hex_features(cell_data)))
+        .mark_geoshape(stroke="rgba(49, 51, 63, 0.2)", strokeWidth=0.5)
+        .encode(
+            color=alt.Color(f"properties.{layer_column}:Q", title=selected_layer),
+            tooltip=[
+                alt.Tooltip("properties.listing_count:Q", title="Listings"),
+                alt.Tooltip(
+                    "properties.superhost_share:Q",
+                    title="Superhost share (%)",
+                    format=".1f",
+                ),
+                alt.Tooltip(
+                    "properties.median_price:Q", title="Median price", format="$,.0f"
+                ),
+            ],
+        )
+        .properties(width="container", height=600)
+    )
+if map_chart is not None:
+    st.altair_chart(map_chart, use_container_width=True)
+
+st.sidebar.caption(describe_query_cache())
@@ -2,14 +2,18 @@ import webbrowser
 from pathlib import Path
 
 import streamlit as st
-from langchain.agents import create_sql_agent
-from langchain.agents.agent_toolkits import SQLDatabaseToolkit
-from langchain.agents.agent_types import AgentType
 from langchain.callbacks import StreamlitCallbackHandler
-from langchain.llms.openai import OpenAI
-from langchain.sql_database import SQLDatabase
 
-import constants
+from chat.agent import (
+    cached_answer,
+    create_agent,
+    create_database,
+    create_llm,
+    describe_chat_cache,
+    store_answer,
+    using_fake_llm,
+)
+from database.engine import SERVE, get_engine
 
 st.set_page_config(
     page_title="Airbnb Advisor | AI Chat",
@@ -44,21 +48,18 @@ example_queries = [
     "What's the average review score of listings in Los Angeles?",
 ]
 
+example_query = None
 for query in example_queries:
     if st.button(query, type="primary"):
-        user_query = query
-        # Now, the user_query will be processed the same way as it's processed below in the code.
-        # The code to process the user_query can be put into a separate function to avoid duplication.
-        # For simplicity, I'm just setting user_query here.
-
-# Database URI from constants
-db_uri = f"sqlite:///{constants.DATABASE_PATH}"
+        example_query = query
 
 # Set or get user's OpenAI API key
 if "openai_query_count" not in st.session_state:
     st.session_state.openai_query_count = 0
 
-if st.session_state.openai_query_count < 5:
+if using_fake_llm():
+    openai_api_key = None
+elif st.session_state.openai_query_count < 5:
     openai_api_key = st.secrets["openai_key"]
 else:
     if "user_openai_key" not in st.session_state:
@@ -75,30 +76,22 @@ else:
     else:
         openai_api_key = st.session_state.user_openai_key
 
-# Setup agent
-llm = OpenAI(
-    openai_api_key=openai_api_key,
-    temperature=0,
-    streaming=True,
-    model="gpt-3.5-turbo-instruct",
-)
-
 
+# The database wrapper and agent are built once per process (and API key), not on every rerun
 @st.cache_resource(ttl="2h")
-def configure_db(db_uri):
-    return SQLDatabase.from_uri(database_uri=db_uri)
+def configure_db():
+    # The agent only reflects tables through the serving engine; its queries run in the read-only sandbox
+    return create_database(get_engine(SERVE))
 
 
-db = configure_db(db_uri)
+@st.cache_resource(ttl="2h")
+def configure_agent(openai_api_key):
+    return create_agent(create_llm(openai_api_key), configure_db())
 
-toolkit = SQLDatabaseToolkit(db=db, llm=llm)
 
-agent = create_sql_agent(
-    llm=llm,
-    toolkit=toolkit,
-    verbose=True,
-    agent_type=AgentType.ZERO_SHOT_REACT_DESCRIPTION,
-)
+agent = configure_agent(openai_api_key)
+
+st.sidebar.caption(describe_chat_cache())
 
 if "messages" not in st.session_state or st.sidebar.button("Clear message history"):
     st.session_state["messages"] = [
@@ -112,16 +105,19 @@ user_query_input = st.chat_input(
     placeholder="Ask me anything about the Airbnb dataset!"
 )
 
-if user_query_input:
-    user_query = user_query_input
+user_query = user_query_input or example_query
 
+if user_query:
     st.session_state.messages.append({"role": "user", "content": user_query})
     st.chat_message("user").write(user_query)
 
     with st.chat_message("assistant"):
-        st_cb = StreamlitCallbackHandler(st.container())
-        response = agent.run(user_query, callbacks=[st_cb])
+        # Repeated and example questions are answered without asking the model again
+        response = cached_answer(user_query)
+        if response is None:
+            st_cb = StreamlitCallbackHandler(st.container())
+            response = agent.run(user_query, callbacks=[st_cb])
+            store_answer(user_query, response)
+            st.session_state.openai_query_count += 1
         st.session_state.messages.append({"role": "assistant", "content": response})
         st.write(response)
-
-    st.session_state.openai_query_count += 1
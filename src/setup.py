@@ -4,6 +4,9 @@ import constants
 from database.session import SessionLocal, init_db
 from setup import data_cleaning, data_reading, db_populating
 from setup.amenity_processing import process_amenities
+from setup.assign_neighborhoods import assign_neighborhoods
+from setup.generate_hex_cell_stats import generate_hex_cell_stats
+from setup.generate_neighborhood_stats import generate_neighborhood_stats
 
 
 def clean_listings_df(listings_df):
@@ -101,12 +104,28 @@ def main():
     # Populate tables
     db_populating.populate_initial_tables(session, listings_df_clean)
     db_populating.populate_listings_tables(session, listings_df_clean)
+
+    # Move listings from their neighborhood label to the polygon their coordinates fall in
+    assign_neighborhoods(session)
+
     db_populating.populate_amenity_tables(session)
     db_populating.update_listing_active_quarters(session)
 
     # Map amenities to listings through the ListingsAmenities table
     process_amenities(session, listings_df_clean)
 
+    # Materialise the per-neighborhood aggregates the map reads
+    generate_neighborhood_stats(session)
+
+    # ... and the per-cell aggregates of its hexagonal grids
+    generate_hex_cell_stats(session)
+
+    # Record when the listings were scraped; age charts count years up to it
+    db_populating.stamp_scrape_date(session, listings_df_clean)
+
+    # Stamp the build so cached page queries of the previous database are dropped
+    db_populating.stamp_dataset_version(session)
+
     # Commit and Close Session
     session.commit()
     session.close()
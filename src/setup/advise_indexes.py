@@ -0,0 +1,347 @@
+"""
+Index advisor for the app's query workload.
+
+Replays the workload the app puts on the database, namely every metric and chart-data query of the build units
+(recorded as in check_query_plans), the Home and Maps page queries (database/page_queries.py, for one city and every
+hex grid resolution) and the SQL Exploration page queries. For each query it records the best-of-five time,
+the EXPLAIN QUERY PLAN and the indexes the plan uses, and from those it suggests:
+
+- missing indexes: columns SQLite had to build an automatic index on, and full scans of large tables by slow
+  queries;
+- unused indexes: indexes no plan uses, with the space they take in the file.
+
+With --measure, each index is dropped in turn from an in-memory copy of the database and the queries that used it
+re-timed, so the space every index takes can be weighed against the query time it saves.
+
+Indexes declared in the models are added to a database built before they were declared by running
+database/session.py.
+
+Usage: advise_indexes.py [--measure]
+"""
+
+import io
+import json
+import re
+import sqlite3
+import sys
+import time
+from contextlib import redirect_stdout
+
+from sqlalchemy import event
+
+from charts.hex_grid import RESOLUTIONS
+from constants import DATABASE_PATH
+from database import page_queries
+from database.engine import SERVE, connect
+from database.models import Base
+from database.session import create_readonly_session
+from setup.check_query_plans import CHECKED_CITIES, record_queries
+
+EXPLORATION_QUERIES_PATH = "data/exploration_queries.json"
+
+# Runs per query; the fastest is reported, which is the least disturbed by other work on the machine
+TIMING_RUNS = 5
+
+# Full scans are only worth an index when the query is slow and the table is large
+SLOW_QUERY_SECONDS = 0.05
+LARGE_TABLE_ROWS = 10_000
+
+TABLES = set(Base.metadata.tables)
+
+# "FROM ListingsCore AS l", "JOIN Amenities a" and the like, to map plan aliases back to tables
+TABLE_REFERENCE = re.compile(
+    r'\b(?:FROM|JOIN)\s+"?(\w+)"?(?:\s+(?:AS\s+)?"?(\w+)"?)?', re.IGNORECASE
+)
+PLAN_INDEX = re.compile(r"USING (?:COVERING )?INDEX (\w+)")
+PLAN_AUTOMATIC_INDEX = re.compile(
+    r"^SEARCH (\w+) USING AUTOMATIC (?:PARTIAL )?(?:COVERING )?INDEX \(([^)]*)\)"
+)
+PLAN_SCAN = re.compile(r"^SCAN (\w+)(?: USING| *$)")
+
+SQL_KEYWORDS = {
+    "where",
+    "on",
+    "join",
+    "left",
+    "right",
+    "inner",
+    "outer",
+    "cross",
+    "group",
+    "order",
+    "limit",
+    "using",
+    "natural",
+    "union",
+}
+
+
+def page_statements():
+    """Statements of the Home and Maps pages, by query key."""
+    # The Maps page has no all-cities view, so one city stands for all of them
+    city = CHECKED_CITIES["city"]
+
+    statements = {
+        f"home {name} count": statement
+        for name, statement in page_queries.dataset_counts().items()
+    }
+    statements["home listings by city"] = page_queries.listings_by_city()
+    statements["maps neighborhoods [city]"] = page_queries.neighborhood_stats(city)
+    for label, cell_size_meters in RESOLUTIONS.items():
+        statements[f"maps {label} hex cells [city]"] = page_queries.hex_cells(
+            city, cell_size_meters
+        )
+    return statements
+
+
+def record_page_queries(session):
+    """
+    Run the page statements and record the SQL each one sends.
+
+    Returns:
+    - Dict mapping a query key to (SQL, parameters).
+    """
+    connection = session.connection()
+    sent = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, many):
+        sent.append((statement, parameters))
+
+    queries = {}
+    event.listen(connection, "before_cursor_execute", before_cursor_execute)
+    try:
+        for key, statement in page_statements().items():
+            sent.clear()
+            session.execute(statement).all()
+            queries[key] = sent[-1]
+    finally:
+        event.remove(connection, "before_cursor_execute", before_cursor_execute)
+
+    return queries
+
+
+def workload():
+    """
+    The queries the app sends.
+
+    Returns:
+    - Dict mapping a query key to (SQL, parameters).
+    """
+    session = create_readonly_session()
+    try:
+        # The producers report progress; only their queries matter here
+        with redirect_stdout(io.StringIO()):
+            queries, _ = record_queries(session)
+        queries.update(record_page_queries(session))
+    finally:
+        session.close()
+
+    with open(EXPLORATION_QUERIES_PATH, "r") as file:
+        for query in json.load(file):
+            queries[f"exploration #{query['id']}"] = (query["query"], ())
+
+    return queries
+
+
+def table_aliases(sql):
+    """Map every name a table is referred to by in a query (its own name and any alias) to the table."""
+    aliases = {}
+    for table, alias in TABLE_REFERENCE.findall(sql):
+        if table not in TABLES:
+            continue
+        aliases[table] = table
+        if alias and alias.lower() not in SQL_KEYWORDS:
+            aliases[alias] = table
+    return aliases
+
+
+def time_query(connection, sql, parameters, runs=TIMING_RUNS):
+    """Fastest seconds out of `runs` to run a query and fetch all its rows."""
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        connection.execute(sql, parameters).fetchall()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def explain(connection, sql, parameters):
+    return [
+        row[3] for row in connection.execute(f"EXPLAIN QUERY PLAN {sql}", parameters)
+    ]
+
+
+def existing_indexes(connection):
+    """
+    Returns:
+    - Dict mapping each index that can be dropped (not one enforcing a UNIQUE or PRIMARY KEY constraint) to its table.
+    """
+    return dict(
+        connection.execute(
+            "SELECT name, tbl_name FROM sqlite_master "
+            "WHERE type = 'index' AND name NOT LIKE 'sqlite_autoindex_%'"
+        ).fetchall()
+    )
+
+
+def index_sizes(connection):
+    """Bytes used by each index, or an empty dict if SQLite was built without the dbstat table."""
+    try:
+        return dict(
+            connection.execute(
+                "SELECT name, SUM(pgsize) FROM dbstat GROUP BY name"
+            ).fetchall()
+        )
+    except sqlite3.OperationalError:
+        return {}
+
+
+def table_rows(connection):
+    return {
+        table: connection.execute(f'SELECT COUNT(*) FROM "{table}"').fetchone()[0]
+        for table in TABLES
+        if connection.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)
+        ).fetchone()
+    }
+
+
+def analyze_workload(connection, queries):
+    """
+    Time and explain every query.
+
+    Returns:
+    - Dict mapping each query key to a dict with its "seconds", "plan", "indexes" (used by the plan), "automatic"
+      ((table, columns) SQLite built an automatic index on) and "scans" (tables read in full).
+    """
+    results = {}
+    for key, (sql, parameters) in queries.items():
+        aliases = table_aliases(sql)
+        plan = explain(connection, sql, parameters)
+
+        automatic = []
+        scans = []
+        for detail in plan:
+            if match := PLAN_AUTOMATIC_INDEX.match(detail):
+                columns = [
+                    column.split("=")[0] for column in match.group(2).split(" AND ")
+                ]
+                automatic.append((aliases.get(match.group(1), match.group(1)), columns))
+            elif (match := PLAN_SCAN.match(detail)) and match.group(1) in aliases:
+                scans.append(aliases[match.group(1)])
+
+        results[key] = {
+            "seconds": time_query(connection, sql, parameters),
+            "plan": plan,
+            "indexes": {
+                index for detail in plan for index in PLAN_INDEX.findall(detail)
+            },
+            "automatic": automatic,
+            "scans": scans,
+        }
+    return results
+
+
+def suggest_indexes(results, indexes, rows):
+    """
+    Returns:
+    - List of suggested indexes to add, as (table, columns, reason).
+    - List of indexes no query uses.
+    """
+    missing = {}
+    for key, result in results.items():
+        for table, columns in result["automatic"]:
+            missing.setdefault((table, tuple(columns)), []).append(
+                f"automatic index in {key}"
+            )
+        if result["seconds"] >= SLOW_QUERY_SECONDS:
+            for table in result["scans"]:
+                if rows.get(table, 0) >= LARGE_TABLE_ROWS:
+                    missing.setdefault((table, ()), []).append(
+                        f"full scan in {key} ({result['seconds'] * 1000:.0f} ms)"
+                    )
+
+    used = set().union(*(result["indexes"] for result in results.values()))
+    unused = sorted(set(indexes) - used)
+
+    return [
+        (table, columns, reasons) for (table, columns), reasons in missing.items()
+    ], unused
+
+
+def measure_indexes(queries, indexes, results):
+    """
+    Query time each index saves.
+
+    The queries whose plans use an index are timed on an in-memory copy of the database with and without it; the
+    plans of the other queries do not change when it is dropped.
+
+    Returns:
+    - Dict mapping each index to the seconds of workload time it saves (negative if the workload is faster without
+      it).
+    """
+    source = connect(SERVE, DATABASE_PATH, in_memory=False)
+
+    def seconds(keys, drop=None):
+        copy = sqlite3.connect(":memory:")
+        source.backup(copy)
+        if drop is not None:
+            copy.execute(f'DROP INDEX "{drop}"')
+        total = sum(time_query(copy, *queries[key]) for key in keys)
+        copy.close()
+        return total
+
+    savings = {}
+    for index in indexes:
+        keys = [key for key, result in results.items() if index in result["indexes"]]
+        savings[index] = seconds(keys, drop=index) - seconds(keys) if keys else 0.0
+    source.close()
+    return savings
+
+
+def main(measure=False):
+    queries = workload()
+
+    connection = connect(SERVE, DATABASE_PATH, in_memory=False)
+    results = analyze_workload(connection, queries)
+    indexes = existing_indexes(connection)
+    sizes = index_sizes(connection)
+    rows = table_rows(connection)
+    connection.close()
+
+    print(f"Workload: {len(queries)} queries\n")
+    for key, result in sorted(results.items(), key=lambda item: -item[1]["seconds"]):
+        used = ", ".join(sorted(result["indexes"])) or "no index"
+        print(f"{result['seconds'] * 1000:8.2f} ms  {key}  [{used}]")
+
+    missing, unused = suggest_indexes(results, indexes, rows)
+
+    print("\nSuggested indexes:")
+    for table, columns, reasons in missing:
+        target = (
+            f"{table}({', '.join(columns)})"
+            if columns
+            else f"{table} (filtered columns)"
+        )
+        print(f"  {target}: {'; '.join(reasons)}")
+    if not missing:
+        print("  none")
+
+    print("\nUnused indexes:")
+    for index in unused:
+        size = f"{sizes[index] / 1024:.0f} KiB" if index in sizes else "size unknown"
+        print(f"  {index} on {indexes[index]} ({size})")
+    if not unused:
+        print("  none")
+
+    if measure:
+        print("\nWorkload time saved by each index:")
+        for index, saved in measure_indexes(queries, indexes, results).items():
+            size = (
+                f"{sizes[index] / 1024:.0f} KiB" if index in sizes else "size unknown"
+            )
+            print(f"  {index}: {saved * 1000:+.1f} ms for {size}")
+
+
+if __name__ == "__main__":
+    main(measure="--measure" in sys.argv[1:])
@@ -55,12 +55,17 @@ def bulk_insert_matched_amenities(session, listings_df_clean, matched_amenities)
     insert_list = []
     for _, row in listings_df_clean.iterrows():
         listing_amenities = eval(row["amenities"])
-        for amenity in listing_amenities:
-            amenity_id = matched_amenities.get(amenity)
-            if amenity_id:
-                insert_list.append(
-                    {"listing_id": row["listing_id"], "amenity_id": amenity_id}
-                )
+        # Different amenity strings can match the same amenity; the (amenity_id, listing_id) key allows one row
+        amenity_ids = {
+            matched_amenities.get(amenity) for amenity in listing_amenities
+        } - {None}
+        for amenity_id in amenity_ids:
+            insert_list.append(
+                {"listing_id": row["listing_id"], "amenity_id": amenity_id}
+            )
+
+    # In key order, rows are appended to the clustered table rather than splitting its pages
+    insert_list.sort(key=lambda row: (row["amenity_id"], row["listing_id"]))
     session.bulk_insert_mappings(ListingsAmenities, insert_list)
     session.commit()
 
@@ -0,0 +1,253 @@
+"""
+Point-in-polygon assignment of listings to neighborhoods.
+
+Inside Airbnb labels every listing with a `neighbourhood_cleansed` string, which is what the build first stores. This
+stage replaces the label with the neighbourhoods.geojson polygon the listing's coordinates (ListingsLocation) fall
+in:
+
+- each city's polygons are read from data/usa/<city>/neighbourhoods.geojson, repaired, and dissolved by name, since
+  some names are split over several features;
+- all of a city's listings are tested against an STRtree of its polygons in one vectorized query;
+- cities are processed in parallel, one task per city.
+
+A point on the border of two polygons goes to the first by name. Listings outside every polygon, and listings
+without coordinates, keep their label. Neighborhoods no listing is left in are removed.
+
+Databases built while neighborhood names had to be unique across cities need a rebuild before this stage can add a
+name another city already has.
+
+Usage: assign_neighborhoods.py [<workers>]
+"""
+
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import shapely
+from sqlalchemy import exists
+
+from charts.map_shapes import source_shapes_path
+from database.models import (
+    AmenityPriceImpacts,
+    Cities,
+    ListingsCore,
+    ListingsLocation,
+    Neighborhoods,
+)
+from database.session import SessionLocal
+
+# Equal-area projection the polygons are measured in
+EQUAL_AREA_CRS = "EPSG:6933"
+
+
+def load_neighborhood_polygons(city):
+    """
+    Returns:
+    - GeoDataFrame with a `neighbourhood` column and one valid geometry per name, ordered by name, or None if the
+      city has no shapes.
+    """
+    path = source_shapes_path(city)
+    if not os.path.exists(path):
+        return None
+
+    with open(path, "r") as file:
+        features = [
+            feature
+            for feature in json.load(file)["features"]
+            if feature["geometry"] and feature["properties"].get("neighbourhood")
+        ]
+    if not features:
+        return None
+
+    shapes = gpd.GeoDataFrame.from_features(features, crs="EPSG:4326")
+    shapes = shapes.set_geometry(
+        # Some source polygons are invalid (e.g. self-touching rings), which the predicates cannot handle
+        gpd.GeoSeries(
+            shapely.make_valid(shapes.geometry.values),
+            index=shapes.index,
+            crs=shapes.crs,
+        )
+    )
+    return (
+        shapes[["neighbourhood", "geometry"]].dissolve(by="neighbourhood").reset_index()
+    )
+
+
+def neighborhood_areas(city):
+    """Dict mapping each neighborhood name of a city to the area of its polygons in square kilometres."""
+    shapes = load_neighborhood_polygons(city)
+    if shapes is None:
+        return {}
+    areas = shapes.to_crs(EQUAL_AREA_CRS).area / 1_000_000
+    return dict(zip(shapes["neighbourhood"], areas))
+
+
+def locate_points(city, latitudes, longitudes):
+    """
+    Name of the neighborhood polygon each point falls in.
+
+    Returns:
+    - Object array aligned with the points, holding None for points outside every polygon.
+    """
+    names = np.full(len(latitudes), None, dtype=object)
+    shapes = load_neighborhood_polygons(city)
+    if shapes is None or not len(names):
+        return names
+
+    tree = shapely.STRtree(shapes.geometry.values)
+    point_indices, polygon_indices = tree.query(
+        shapely.points(longitudes, latitudes), predicate="intersects"
+    )
+
+    # A point on a border matches every polygon sharing it; keep the first by name
+    order = np.lexsort((polygon_indices, point_indices))
+    points, first = np.unique(point_indices[order], return_index=True)
+    names[points] = shapes["neighbourhood"].to_numpy()[polygon_indices[order][first]]
+    return names
+
+
+def _locate_city(task):
+    return locate_points(*task)
+
+
+def listing_points(session):
+    """
+    Returns:
+    - DataFrame with the listing_id, city_id, city, neighborhood_id, latitude and longitude of every listing with
+      coordinates.
+    """
+    query = (
+        session.query(
+            ListingsCore.listing_id,
+            ListingsCore.city_id,
+            Cities.city,
+            ListingsCore.neighborhood_id,
+            ListingsLocation.latitude,
+            ListingsLocation.longitude,
+        )
+        .join(Cities, Cities.city_id == ListingsCore.city_id)
+        .join(ListingsLocation, ListingsLocation.listing_id == ListingsCore.listing_id)
+        .filter(
+            ListingsLocation.latitude.is_not(None),
+            ListingsLocation.longitude.is_not(None),
+        )
+    )
+    return pd.DataFrame(
+        query.all(),
+        columns=[
+            "listing_id",
+            "city_id",
+            "city",
+            "neighborhood_id",
+            "latitude",
+            "longitude",
+        ],
+    )
+
+
+def assign_neighborhoods(session, workers=None):
+    """
+    Point the neighborhood_id of every listing at the polygon its coordinates fall in.
+
+    Parameters:
+    - session: Read-write session on the database being built.
+    - workers: Number of worker processes; defaults to the number of cores. 1 runs in-process.
+    """
+    workers = workers or os.cpu_count() or 1
+    listings = listing_points(session)
+    groups = list(listings.groupby("city"))
+    tasks = [
+        (city, group["latitude"].to_numpy(), group["longitude"].to_numpy())
+        for city, group in groups
+    ]
+
+    start = time.perf_counter()
+    if workers == 1 or len(tasks) <= 1:
+        results = [_locate_city(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as pool:
+            # map() yields results in submission order, which is the groupby order
+            results = list(pool.map(_locate_city, tasks))
+    elapsed = time.perf_counter() - start
+
+    listings["polygon"] = None
+    for (_, group), names in zip(groups, results):
+        listings.loc[group.index, "polygon"] = names
+    located = listings[listings["polygon"].notna()]
+
+    # Neighborhoods of the polygons, added where the labels never named them
+    neighborhood_ids = {
+        (city_id, name): neighborhood_id
+        for neighborhood_id, city_id, name in session.query(
+            Neighborhoods.neighborhood_id,
+            Neighborhoods.city_id,
+            Neighborhoods.neighborhood,
+        )
+    }
+    # Sorted, so the new ids do not depend on set order
+    for key in sorted(
+        set(zip(located["city_id"], located["polygon"])) - set(neighborhood_ids)
+    ):
+        neighborhood = Neighborhoods(city_id=key[0], neighborhood=key[1])
+        session.add(neighborhood)
+        session.flush()
+        neighborhood_ids[key] = neighborhood.neighborhood_id
+
+    assigned = pd.Series(
+        [neighborhood_ids[key] for key in zip(located["city_id"], located["polygon"])],
+        index=located.index,
+        dtype="int64",
+    )
+    moved = located[assigned != located["neighborhood_id"]]
+    session.bulk_update_mappings(
+        ListingsCore,
+        [
+            {"listing_id": int(listing_id), "neighborhood_id": int(neighborhood_id)}
+            for listing_id, neighborhood_id in zip(
+                moved["listing_id"], assigned[moved.index]
+            )
+        ],
+    )
+
+    # Labels no listing is left in, unless an amenity price impact still refers to them
+    removed = (
+        session.query(Neighborhoods)
+        .filter(
+            ~exists().where(
+                ListingsCore.neighborhood_id == Neighborhoods.neighborhood_id
+            ),
+            ~exists().where(
+                AmenityPriceImpacts.neighborhood_id == Neighborhoods.neighborhood_id
+            ),
+        )
+        .delete(synchronize_session=False)
+    )
+    session.commit()
+
+    for city, _ in groups:
+        in_city = listings["city"] == city
+        print(
+            f"{city}: {listings[in_city]['polygon'].notna().sum():,} of {in_city.sum():,} listings "
+            f"in a neighborhood polygon, {moved['city'].eq(city).sum():,} moved from their label"
+        )
+    print(
+        f"Assigned {len(located):,} listings to neighborhood polygons in {elapsed:.1f}s with "
+        f"{min(workers, len(tasks))} worker(s); removed {removed} neighborhoods left empty."
+    )
+
+
+if __name__ == "__main__":
+    # Imported here: the stats import this module for the polygon areas
+    from setup.generate_neighborhood_stats import generate_neighborhood_stats
+
+    session = SessionLocal()
+    assign_neighborhoods(session, int(sys.argv[1]) if len(sys.argv) > 1 else None)
+
+    # The per-neighborhood aggregates follow the listings
+    generate_neighborhood_stats(session)
+    session.close()
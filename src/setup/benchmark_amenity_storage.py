@@ -0,0 +1,141 @@
+"""
+Size and lookup latency of ListingsAmenities storage layouts.
+
+The (listing_id, amenity_id) pairs of the current database are loaded into a scratch database per layout:
+
+- rowid: the original table, a surrogate autoincrement id and no index on the real keys;
+- rowid + indexes: the same table with an index on each key order;
+- without rowid: the layout declared in the models, clustered on (amenity_id, listing_id) with a listing index.
+
+Each layout reports its size and the time of the three lookups the app and the build make: the listings of an
+amenity, the amenities of a listing, and whether a listing has an amenity.
+
+Usage: benchmark_amenity_storage.py
+"""
+
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+from sqlalchemy.dialects import sqlite
+from sqlalchemy.schema import CreateIndex, CreateTable
+
+from constants import DATABASE_PATH
+from database.engine import SERVE, connect
+from database.models import ListingsAmenities
+
+ROWID_TABLE = (
+    "CREATE TABLE ListingsAmenities ("
+    "listing_amenity_id INTEGER PRIMARY KEY AUTOINCREMENT, listing_id INTEGER, amenity_id INTEGER)"
+)
+ROWID_INDEXES = [
+    "CREATE INDEX ix_amenity_listing ON ListingsAmenities (amenity_id, listing_id)",
+    "CREATE INDEX ix_listing_amenity ON ListingsAmenities (listing_id, amenity_id)",
+]
+
+
+def model_ddl():
+    """CREATE statements of the ListingsAmenities table and indexes as declared in the models."""
+    dialect = sqlite.dialect()
+    table = ListingsAmenities.__table__
+    statements = [str(CreateTable(table).compile(dialect=dialect))]
+    statements += [
+        str(CreateIndex(index).compile(dialect=dialect)) for index in table.indexes
+    ]
+    return statements
+
+
+LAYOUTS = {
+    "rowid": [ROWID_TABLE],
+    "rowid + indexes": [ROWID_TABLE] + ROWID_INDEXES,
+    "without rowid": model_ddl(),
+}
+
+LOOKUPS = {
+    "listings of an amenity": "SELECT listing_id FROM ListingsAmenities WHERE amenity_id = ?",
+    "amenities of a listing": "SELECT amenity_id FROM ListingsAmenities WHERE listing_id = ?",
+    "listing has amenity": (
+        "SELECT 1 FROM ListingsAmenities WHERE amenity_id = ? AND listing_id = ?"
+    ),
+}
+
+# Keys looked up per lookup kind
+SAMPLE_SIZE = 1_000
+
+
+def load_pairs():
+    connection = connect(SERVE, DATABASE_PATH)
+    pairs = connection.execute(
+        "SELECT DISTINCT listing_id, amenity_id FROM ListingsAmenities "
+        "ORDER BY amenity_id, listing_id"
+    ).fetchall()
+    connection.close()
+    return pairs
+
+
+def lookup_keys(pairs):
+    """Keys of every lookup kind, sampled from the pairs with a fixed seed so every layout gets the same ones."""
+    sample = random.Random(0).sample(pairs, min(SAMPLE_SIZE, len(pairs)))
+    return {
+        "listings of an amenity": [(amenity_id,) for _, amenity_id in sample],
+        "amenities of a listing": [(listing_id,) for listing_id, _ in sample],
+        "listing has amenity": [
+            (amenity_id, listing_id) for listing_id, amenity_id in sample
+        ],
+    }
+
+
+def benchmark_layout(statements, pairs, keys):
+    """
+    Returns:
+    - (bytes of the scratch database after VACUUM, dict mapping each lookup to its mean seconds)
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "amenities.sqlite")
+        connection = sqlite3.connect(path)
+        for statement in statements:
+            connection.execute(statement)
+        connection.executemany(
+            "INSERT INTO ListingsAmenities (listing_id, amenity_id) VALUES (?, ?)",
+            pairs,
+        )
+        connection.commit()
+        connection.execute("VACUUM")
+        size_bytes = os.path.getsize(path)
+
+        timings = {}
+        for lookup, sql in LOOKUPS.items():
+            start = time.perf_counter()
+            for parameters in keys[lookup]:
+                connection.execute(sql, parameters).fetchall()
+            timings[lookup] = (time.perf_counter() - start) / len(keys[lookup])
+
+        connection.close()
+    return size_bytes, timings
+
+
+def main():
+    pairs = load_pairs()
+    if not pairs:
+        print("ListingsAmenities is empty; nothing to benchmark.")
+        return
+
+    keys = lookup_keys(pairs)
+    print(f"{len(pairs):,} listing amenities\n")
+
+    baseline_bytes = None
+    for layout, statements in LAYOUTS.items():
+        size_bytes, timings = benchmark_layout(statements, pairs, keys)
+        baseline_bytes = baseline_bytes or size_bytes
+        print(
+            f"{layout}: {size_bytes / 1024:,.0f} KiB "
+            f"({size_bytes / baseline_bytes:.0%} of rowid)"
+        )
+        for lookup, seconds in timings.items():
+            print(f"    {lookup}: {seconds * 1_000_000:,.1f} µs")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Size and read time of the packed availability against a table with a row per listing.
+
+The stored availability is copied into a scratch database as the ListingsAvailability table it replaced (listing_id
+and the four windows as INTEGER columns); each layout reports the bytes it takes per listing and the time to read
+every listing's 30-day availability into an array.
+
+Usage: benchmark_availability_storage.py
+"""
+
+import os
+import sqlite3
+import tempfile
+import time
+
+import numpy as np
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from database.availability import AVAILABILITY_WINDOWS, load_availability
+from database.engine import SERVE, create_session
+
+# Runs per read; the fastest is reported
+TIMING_RUNS = 20
+
+
+def fastest(read):
+    runs = []
+    for _ in range(TIMING_RUNS):
+        start = time.perf_counter()
+        read()
+        runs.append(time.perf_counter() - start)
+    return min(runs)
+
+
+def packed_bytes(session):
+    """Bytes of the packed table, or None if SQLite was built without the dbstat table."""
+    try:
+        return session.execute(
+            text("SELECT SUM(pgsize) FROM dbstat WHERE name = 'ListingsAvailability'")
+        ).scalar()
+    except OperationalError:
+        return None
+
+
+def build_row_table(path, availability):
+    """Store the availability at `path` with a row per listing, missing values as NULL."""
+    connection = sqlite3.connect(path)
+    connection.execute(
+        'CREATE TABLE "ListingsAvailability" (listing_id INTEGER PRIMARY KEY, '
+        + ", ".join(f"{window} INTEGER" for window in AVAILABILITY_WINDOWS)
+        + ")"
+    )
+    rows = availability.astype(object).where(availability.notna(), None)
+    connection.executemany(
+        f'INSERT INTO "ListingsAvailability" VALUES ({", ".join("?" * len(rows.columns))})',
+        [
+            tuple(None if value is None else int(value) for value in row)
+            for row in rows.itertuples(index=False, name=None)
+        ],
+    )
+    connection.commit()
+    connection.execute("VACUUM")
+    return connection
+
+
+def main():
+    session = create_session(SERVE)
+    try:
+        availability = load_availability(session)
+        count = len(availability)
+        if not count:
+            print("ListingsAvailability is empty; nothing to benchmark.")
+            return
+
+        size_bytes = packed_bytes(session)
+        seconds = fastest(
+            lambda: load_availability(session, windows=["availability_30"])
+        )
+        if size_bytes is None:
+            print("packed: size unknown (SQLite was built without the dbstat table)")
+        else:
+            print(
+                f"packed: {size_bytes / 1024:,.0f} KiB, {size_bytes / count:.1f} bytes per listing"
+            )
+        print(
+            f"    30-day availability of {count:,} listings: {seconds * 1000:,.3f} ms"
+        )
+    finally:
+        session.close()
+
+    with tempfile.TemporaryDirectory() as directory:
+        connection = build_row_table(
+            os.path.join(directory, "rows.sqlite"), availability
+        )
+        try:
+            (size_bytes,) = connection.execute(
+                "SELECT SUM(pgsize) FROM dbstat WHERE name = 'ListingsAvailability'"
+            ).fetchone()
+        except sqlite3.OperationalError:
+            size_bytes = None
+        seconds = fastest(
+            lambda: np.array(
+                connection.execute(
+                    'SELECT availability_30 FROM "ListingsAvailability" ORDER BY listing_id'
+                ).fetchall(),
+                dtype=float,
+            )
+        )
+        connection.close()
+        if size_bytes is None:
+            print("row per listing: size unknown")
+        else:
+            print(
+                f"row per listing: {size_bytes / 1024:,.0f} KiB, {size_bytes / count:.1f} bytes per listing"
+            )
+        print(
+            f"    30-day availability of {count:,} listings: {seconds * 1000:,.3f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+"""
+Size and query time of the review and host tables before and after the compact column types.
+
+Hosts and ListingsReviewsSummary are copied, with their legacy values (ISO date strings and REAL review scores), into
+a scratch database; a copy of it is then migrated with setup/migrate_compact_columns.py. Each layout reports its
+size and the time of the queries that read the converted columns:
+
+- the active-quarter filter of the build (a range on first_review and last_review);
+- the new-listing filter of the pricing metrics (first_review within a year);
+- the start dates the age chart reads, converted to timestamps as the chart converts them;
+- the mean review score.
+
+Works on databases of either layout.
+
+Usage: benchmark_compact_columns.py
+"""
+
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+from datetime import date, timedelta
+
+import pandas as pd
+from sqlalchemy.dialects import sqlite
+from sqlalchemy.schema import CreateIndex
+
+from charts.overview_data import day_numbers_to_timestamps
+from constants import DATABASE_PATH
+from database.engine import SERVE, connect
+from database.models import Base, DayNumber, ScaledScore
+from setup.migrate_compact_columns import compact_columns, legacy_values, migrate
+
+# Types the compact columns were declared with before the migration
+LEGACY_TYPES = {DayNumber: "VARCHAR", ScaledScore: "INTEGER"}
+
+# Runs per query; the fastest is reported
+TIMING_RUNS = 20
+
+DAY_NUMBER = DayNumber()
+
+QUERIES = {
+    "active in the last quarter": (
+        "SELECT listing_id FROM ListingsReviewsSummary "
+        "WHERE first_review <= ? AND last_review >= ?"
+    ),
+    "first reviewed in the last year": (
+        "SELECT COUNT(*) FROM ListingsReviewsSummary "
+        "WHERE first_review BETWEEN ? AND ?"
+    ),
+    "start dates for the age chart": (
+        "SELECT host_since FROM Hosts UNION ALL "
+        "SELECT first_review FROM ListingsReviewsSummary"
+    ),
+    "mean review score": "SELECT AVG(review_scores_rating) FROM ListingsReviewsSummary",
+}
+
+
+def legacy_ddl(table):
+    """CREATE statements of a table and its indexes with the column types it had before the migration."""
+    dialect = sqlite.dialect()
+    columns = []
+    for column in table.columns:
+        declared = LEGACY_TYPES.get(type(column.type)) or column.type.compile(
+            dialect=dialect
+        )
+        columns.append(
+            f'"{column.name}" {declared}'
+            + (" PRIMARY KEY" if column.primary_key else "")
+        )
+    statements = [f'CREATE TABLE "{table.name}" ({", ".join(columns)})']
+    statements += [
+        str(CreateIndex(index).compile(dialect=dialect)) for index in table.indexes
+    ]
+    return statements
+
+
+def build_legacy_copy(path):
+    """Copy the tables with compact columns into a new database at `path`, in their legacy layout."""
+    source = connect(SERVE, DATABASE_PATH, in_memory=False)
+    scratch = sqlite3.connect(path)
+    for table_name in compact_columns():
+        table = Base.metadata.tables[table_name]
+        for statement in legacy_ddl(table):
+            scratch.execute(statement)
+
+        values = legacy_values(source, table_name)
+        rows = source.execute(
+            f'SELECT {", ".join(values.values())} FROM "{table_name}"'
+        ).fetchall()
+        scratch.executemany(
+            f'INSERT INTO "{table_name}" ({", ".join(values)}) '
+            f'VALUES ({", ".join("?" for _ in values)})',
+            rows,
+        )
+    scratch.commit()
+    scratch.execute("VACUUM")
+    scratch.close()
+    source.close()
+
+
+def query_parameters(connection):
+    """
+    Date bounds of the filters as ISO strings: the quarter and year up to the most recent review.
+    """
+    (last_review,) = connection.execute(
+        "SELECT MAX(last_review) FROM ListingsReviewsSummary"
+    ).fetchone()
+    end = date.fromisoformat(last_review)
+    return {
+        "active in the last quarter": (
+            end.isoformat(),
+            (end - timedelta(days=91)).isoformat(),
+        ),
+        "first reviewed in the last year": (
+            (end - timedelta(days=365)).isoformat(),
+            end.isoformat(),
+        ),
+    }
+
+
+def time_queries(path, parameters, compact):
+    """
+    Returns:
+    - Dict mapping each query to the fastest of TIMING_RUNS runs, in seconds.
+    """
+    connection = sqlite3.connect(path)
+    timings = {}
+    for query, sql in QUERIES.items():
+        values = parameters.get(query, ())
+        if compact:
+            values = tuple(
+                DAY_NUMBER.process_bind_param(value, None) for value in values
+            )
+
+        runs = []
+        for _ in range(TIMING_RUNS):
+            start = time.perf_counter()
+            rows = connection.execute(sql, values).fetchall()
+            if query == "start dates for the age chart":
+                dates = pd.Series([row[0] for row in rows])
+                if compact:
+                    day_numbers_to_timestamps(dates)
+                else:
+                    pd.to_datetime(dates, errors="coerce")
+            runs.append(time.perf_counter() - start)
+        timings[query] = min(runs)
+    connection.close()
+    return timings
+
+
+def main():
+    with tempfile.TemporaryDirectory() as directory:
+        legacy_path = os.path.join(directory, "legacy.sqlite")
+        compact_path = os.path.join(directory, "compact.sqlite")
+
+        build_legacy_copy(legacy_path)
+        shutil.copyfile(legacy_path, compact_path)
+        migrate(compact_path)
+
+        connection = sqlite3.connect(legacy_path)
+        parameters = query_parameters(connection)
+        connection.close()
+
+        layouts = {
+            "legacy": (legacy_path, False),
+            "compact": (compact_path, True),
+        }
+        baseline_bytes = os.path.getsize(legacy_path)
+        for layout, (path, compact) in layouts.items():
+            size_bytes = os.path.getsize(path)
+            print(
+                f"{layout}: {size_bytes / 1024:,.0f} KiB "
+                f"({size_bytes / baseline_bytes:.0%} of legacy)"
+            )
+            for query, seconds in time_queries(path, parameters, compact).items():
+                print(f"    {query}: {seconds * 1000:,.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
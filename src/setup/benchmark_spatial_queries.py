@@ -0,0 +1,116 @@
+"""
+Size and latency check of the listing coordinates and their R*Tree.
+
+Reports the bytes ListingsLocation and the R*Tree of `database.spatial` (with its shadow tables) take per listing
+against LOCATION_BYTES_BUDGET, and times the two lookups around a fixed-seed sample of listings:
+
+- box: every listing in a square of BOX_SIDE_METERS centred on the listing;
+- radius: every listing within RADIUS_METERS of the listing.
+
+Exits with status 1 if the coordinates are over budget.
+
+Usage: benchmark_spatial_queries.py
+"""
+
+import random
+import statistics
+import sys
+import time
+
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from database.engine import SERVE, create_session
+from database.models import ListingsLocation
+from database.spatial import (
+    LOCATION_BYTES_BUDGET,
+    LOCATION_INDEX,
+    bounding_box,
+    listings_in_box,
+    listings_within,
+)
+
+BOX_SIDE_METERS = 2_000
+RADIUS_METERS = 1_000
+
+# Listings the lookups are centred on
+SAMPLE_SIZE = 200
+
+
+def location_bytes(session):
+    """Bytes of ListingsLocation and the R*Tree, or None if SQLite was built without the dbstat table."""
+    try:
+        return session.execute(
+            text(
+                "SELECT SUM(pgsize) FROM dbstat "
+                "WHERE name = 'ListingsLocation' OR name LIKE :index_tables"
+            ),
+            {"index_tables": f"{LOCATION_INDEX}%"},
+        ).scalar()
+    except OperationalError:
+        return None
+
+
+def time_lookup(lookup, centres):
+    """
+    Returns:
+    - (median seconds, slowest seconds, median listings found) of the lookup around each centre.
+    """
+    # The first lookup opens the connection and reads the top of the R*Tree
+    lookup(*centres[0])
+
+    timings = []
+    found = []
+    for latitude, longitude in centres:
+        start = time.perf_counter()
+        listings = lookup(latitude, longitude)
+        timings.append(time.perf_counter() - start)
+        found.append(len(listings))
+    return statistics.median(timings), max(timings), statistics.median(found)
+
+
+def main():
+    session = create_session(SERVE)
+    try:
+        listings = session.query(ListingsLocation.latitude, ListingsLocation.longitude)
+        centres = [tuple(row) for row in listings.all() if None not in row]
+        if not centres:
+            print("ListingsLocation is empty; nothing to benchmark.")
+            return True
+        count = len(centres)
+        centres = random.Random(0).sample(centres, min(SAMPLE_SIZE, count))
+
+        size_bytes = location_bytes(session)
+        within_budget = True
+        if size_bytes is None:
+            print("Size unknown: SQLite was built without the dbstat table")
+        else:
+            per_listing = size_bytes / count
+            within_budget = per_listing <= LOCATION_BYTES_BUDGET
+            print(
+                f"{count:,} listings: {size_bytes / 1024:,.0f} KiB, {per_listing:.1f} bytes per listing "
+                f"({'within' if within_budget else 'over'} the {LOCATION_BYTES_BUDGET} byte budget)"
+            )
+
+        lookups = {
+            f"box of {BOX_SIDE_METERS:,} m": lambda latitude, longitude: listings_in_box(
+                session, *bounding_box(latitude, longitude, BOX_SIDE_METERS / 2)
+            ),
+            f"radius of {RADIUS_METERS:,} m": lambda latitude, longitude: listings_within(
+                session, latitude, longitude, RADIUS_METERS
+            ),
+        }
+        for lookup, function in lookups.items():
+            median, slowest, found = time_lookup(function, centres)
+            print(
+                f"{lookup}: {median * 1000:.2f} ms median, {slowest * 1000:.2f} ms slowest, "
+                f"{found:,.0f} listings found (median)"
+            )
+    finally:
+        session.close()
+
+    return within_budget
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,243 @@
+"""
+Query plan guard for the metric and chart-data queries.
+
+Runs every build unit (each city's metrics and every chart producer) and every individual metric function once for
+all cities and once for a single city, records each SELECT it sends, and asks SQLite for its EXPLAIN QUERY PLAN.
+Queries are keyed by their unit and a hash of the normalized statement, so adding a query does not rename the
+others. The check fails when
+
+- SQLAlchemy's FROM linting warns that a statement is a cartesian product (a table filtered on but never joined);
+- a query scans more than one table in the same SELECT, which is how SQLite plans a join on a column with no
+  usable key;
+- SQLite has to build an automatic index to run a join;
+- a query scans a table that it searched by key in the recorded plans (data/query_plans.json).
+
+Usage: check_query_plans.py [--update]
+    --update records the current plans as the new baseline.
+"""
+
+import hashlib
+import inspect
+import json
+import os
+import re
+import sys
+import warnings
+
+from sqlalchemy import event
+
+from constants import CITIES
+from database.models import Base
+from database.scoping import ALL_CITIES
+from database.session import create_readonly_session
+from metrics import (
+    availability_metrics,
+    overview_metrics,
+    pricing_metrics,
+    reviews_metrics,
+)
+from setup.build_runner import build_units
+from setup.generate_chart_data import chart_data_values
+from setup.generate_metrics import calculate_city_metrics
+
+PLANS_PATH = "data/query_plans.json"
+
+# One city is enough: the queries only differ by the bound city name
+CHECKED_CITIES = {"all": ALL_CITIES, "city": CITIES[1]}
+
+TABLES = set(Base.metadata.tables)
+
+# Modules of the individual metric functions, kept alongside the registry for one-off use
+METRIC_MODULES = (
+    overview_metrics,
+    pricing_metrics,
+    reviews_metrics,
+    availability_metrics,
+)
+
+
+def metric_functions():
+    """Public functions of METRIC_MODULES that take (session, city) and nothing else without a default, by name."""
+    functions = {}
+    for module in METRIC_MODULES:
+        for name, function in inspect.getmembers(module, inspect.isfunction):
+            if name.startswith("_") or function.__module__ != module.__name__:
+                continue
+            parameters = list(inspect.signature(function).parameters.values())
+            names = [parameter.name for parameter in parameters]
+            optional = all(
+                parameter.default is not parameter.empty for parameter in parameters[2:]
+            )
+            if names[:2] == ["session", "city"] and optional:
+                functions[name] = function
+    return functions
+
+
+def check_units(city):
+    """Build units of a city, followed by one unit per metric function."""
+    units = build_units(cities=[city])
+    units += [("metric", name, city) for name in metric_functions()]
+    return units
+
+
+def _run_unit(session, unit):
+    kind, name, city = unit
+    if kind == "metrics":
+        return calculate_city_metrics(session, city)
+    if kind == "metric":
+        return metric_functions()[name](session, city)
+    return chart_data_values(name, session, city)
+
+
+def statement_key(statement):
+    """Short hash of a statement with its whitespace and expanded IN lists normalized."""
+    normalized = re.sub(r"\s+", " ", statement).strip()
+    normalized = re.sub(r"\?(?:\s*,\s*\?)+", "?", normalized)
+    return hashlib.sha256(normalized.encode()).hexdigest()[:12]
+
+
+def record_queries(session):
+    """
+    Run every build unit and record the SELECT statements it sends.
+
+    Returns:
+    - Dict mapping "<unit> [<scope>] <statement hash>" to (statement, parameters); a statement sent more than once
+      by a unit is recorded once.
+    - Dict mapping "<unit> [<scope>]" to the cartesian product warnings raised while it ran.
+    """
+    connection = session.connection()
+    recorded = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, many):
+        if statement.lstrip().upper().startswith(("SELECT", "WITH")):
+            recorded.append((statement, parameters))
+
+    queries = {}
+    cartesian_warnings = {}
+    event.listen(connection, "before_cursor_execute", before_cursor_execute)
+    try:
+        for scope, city in CHECKED_CITIES.items():
+            for kind, name, _ in check_units(city):
+                unit_key = f"{name or kind} [{scope}]"
+                recorded.clear()
+
+                with warnings.catch_warnings(record=True) as caught:
+                    warnings.simplefilter("always")
+                    _run_unit(session, (kind, name, city))
+
+                messages = [
+                    str(warning.message)
+                    for warning in caught
+                    if "cartesian product" in str(warning.message)
+                ]
+                if messages:
+                    cartesian_warnings[unit_key] = messages
+
+                for statement, parameters in recorded:
+                    key = f"{unit_key} {statement_key(statement)}"
+                    queries.setdefault(key, (statement, parameters))
+    finally:
+        event.remove(connection, "before_cursor_execute", before_cursor_execute)
+
+    return queries, cartesian_warnings
+
+
+def explain(session, statement, parameters):
+    """EXPLAIN QUERY PLAN rows of a statement as (id, parent, detail) tuples."""
+    rows = session.connection().exec_driver_sql(
+        f"EXPLAIN QUERY PLAN {statement}", parameters
+    )
+    return [(row[0], row[1], row[3]) for row in rows]
+
+
+def scanned_tables(plan):
+    """(parent, table) for every full scan of a database table in a plan."""
+    scans = []
+    for _, parent, detail in plan:
+        match = re.match(r"SCAN (\w+)", detail)
+        if match and match.group(1) in TABLES:
+            scans.append((parent, match.group(1)))
+    return scans
+
+
+def plan_problems(plan, baseline_plan=None):
+    """
+    Problems with a query plan.
+
+    Parameters:
+    - plan: Plan rows returned by `explain`.
+    - baseline_plan: Recorded plan details of the same query, or None if it is new.
+
+    Returns:
+    - List of problem descriptions; empty if the plan is fine.
+    """
+    problems = []
+    scans = scanned_tables(plan)
+
+    scans_by_select = {}
+    for parent, table in scans:
+        scans_by_select.setdefault(parent, []).append(table)
+    for tables in scans_by_select.values():
+        if len(tables) > 1:
+            problems.append(f"unkeyed join of {', '.join(tables)}")
+
+    for _, _, detail in plan:
+        if "AUTOMATIC" in detail:
+            problems.append(f"automatic index: {detail}")
+
+    if baseline_plan is not None:
+        baseline_scans = {
+            match.group(1)
+            for detail in baseline_plan
+            if (match := re.match(r"SCAN (\w+)", detail))
+        }
+        for table in sorted({table for _, table in scans} - baseline_scans):
+            problems.append(f"full scan of {table} regressed from a keyed search")
+
+    return problems
+
+
+def check_query_plans(update=False):
+    """
+    Check the plan of every metric, metric function and chart-data query.
+
+    Parameters:
+    - update: Record the current plans in data/query_plans.json instead of comparing against them.
+
+    Returns:
+    - Dict mapping query keys to their problems, for the queries that have any.
+    """
+    session = create_readonly_session()
+
+    baseline = {}
+    if os.path.exists(PLANS_PATH) and not update:
+        with open(PLANS_PATH, "r") as file:
+            baseline = json.load(file)
+
+    queries, failures = record_queries(session)
+
+    plans = {}
+    for key, (statement, parameters) in queries.items():
+        plan = explain(session, statement, parameters)
+        plans[key] = [detail for _, _, detail in plan]
+
+        problems = plan_problems(plan, baseline.get(key))
+        if problems:
+            failures[key] = problems
+
+    if update:
+        with open(PLANS_PATH, "w") as file:
+            json.dump(plans, file, indent=4, sort_keys=True)
+        print(f"Recorded {len(plans)} query plans in {PLANS_PATH}")
+
+    return failures
+
+
+if __name__ == "__main__":
+    failures = check_query_plans(update="--update" in sys.argv[1:])
+
+    for key, problems in failures.items():
+        for problem in problems:
+            print(f"{key}: {problem}")
+
+    sys.exit(1 if failures else 0)
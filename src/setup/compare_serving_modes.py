@@ -0,0 +1,103 @@
+"""
+Compare serving the app database from disk and from memory.
+
+Replays the metric and chart queries behind the pages on a SERVE engine reading the file and on one reading the
+in-memory copy, then weighs the one-off cost of making the copy against the time it saves per query.
+
+Usage: compare_serving_modes.py [<city> ...]
+"""
+
+import io
+import statistics
+import sys
+import time
+from contextlib import redirect_stdout
+
+from sqlalchemy import event
+from sqlalchemy.orm import sessionmaker
+
+from constants import CITIES, DATABASE_PATH
+from database.engine import SERVE, create_database_engine, memory_copy
+from metrics.registry import evaluate_metrics
+from setup.generate_chart_data import CHART_PRODUCERS
+
+# Timed runs of the workload per mode, after one warm-up run
+RUNS = 5
+
+
+def run_workload(session, cities):
+    # The chart producers report progress; only the timings matter here
+    with redirect_stdout(io.StringIO()):
+        for city in cities:
+            evaluate_metrics(session, city)
+            for producer in CHART_PRODUCERS.values():
+                producer(session, city)
+
+
+def time_workload(cities, in_memory):
+    """
+    Time the page workload on a fresh SERVE engine.
+
+    Returns:
+    - (median seconds of a run, number of queries in a run)
+    """
+    engine = create_database_engine(SERVE, DATABASE_PATH, in_memory)
+    statements = []
+    event.listen(
+        engine, "before_cursor_execute", lambda *args: statements.append(args[2])
+    )
+    session = sessionmaker(bind=engine)()
+
+    try:
+        # The warm-up opens the connection and fills its page cache
+        run_workload(session, cities)
+        statements.clear()
+
+        timings = []
+        for _ in range(RUNS):
+            start = time.perf_counter()
+            run_workload(session, cities)
+            timings.append(time.perf_counter() - start)
+    finally:
+        session.close()
+        engine.dispose()
+
+    return statistics.median(timings), len(statements) // RUNS
+
+
+def main(cities):
+    copy = memory_copy(DATABASE_PATH)
+    if copy is None:
+        print("The database is served from disk; nothing to compare.")
+        return
+
+    disk_seconds, queries = time_workload(cities, in_memory=False)
+    memory_seconds, _ = time_workload(cities, in_memory=True)
+
+    print(f"Workload: {queries} queries over {len(cities)} cities")
+    print(
+        f"Disk:   {disk_seconds * 1000:.1f} ms per run, "
+        f"{disk_seconds / queries * 1000:.3f} ms per query"
+    )
+    print(
+        f"Memory: {memory_seconds * 1000:.1f} ms per run, "
+        f"{memory_seconds / queries * 1000:.3f} ms per query"
+    )
+
+    saved_per_query = (disk_seconds - memory_seconds) / queries
+    if saved_per_query <= 0:
+        print(
+            f"Loading into memory costs {copy.load_seconds * 1000:.0f} ms at startup "
+            "and saves no query time on this machine."
+        )
+        return
+
+    print(
+        f"Loading into memory costs {copy.load_seconds * 1000:.0f} ms at startup and saves "
+        f"{saved_per_query * 1000:.3f} ms per query; it pays off after "
+        f"{copy.load_seconds / saved_per_query:,.0f} queries."
+    )
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:] or CITIES)
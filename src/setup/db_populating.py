@@ -1,3 +1,6 @@
+import uuid
+from datetime import datetime, timezone
+
 import pandas as pd
 from sqlalchemy import and_, func
 from sqlalchemy.exc import IntegrityError
@@ -5,12 +8,15 @@ from sqlalchemy.orm import Session
 
 from constants import AMENITY_CATEGORIES, CHUNK_SIZE
 from database import models
+from database.availability import AVAILABILITY_WINDOWS, store_availability
+from database.spatial import index_locations
 
 
 def populate_initial_tables(session: Session, df: pd.DataFrame):
     def populate_neighborhoods(city_col: str, neighborhood_col: str):
+        # Names are only unique within a city
         unique_neighborhoods = df.dropna(subset=[neighborhood_col]).drop_duplicates(
-            subset=[neighborhood_col]
+            subset=[city_col, neighborhood_col]
         )
 
         for _, record in unique_neighborhoods.iterrows():
@@ -157,10 +163,10 @@ def populate_initial_tables(session: Session, df: pd.DataFrame):
         )
 
 
-def get_neighborhood_id(session, neighborhood_name):
+def get_neighborhood_id(session, city_id, neighborhood_name):
     neighborhood = (
         session.query(models.Neighborhoods)
-        .filter_by(neighborhood=neighborhood_name)
+        .filter_by(city_id=city_id, neighborhood=neighborhood_name)
         .first()
     )
     return neighborhood.neighborhood_id if neighborhood else None
@@ -189,6 +195,7 @@ def get_room_type_id(session, room_type_name):
 
 def populate_listings_core(session, df):
     for _, row in df.iterrows():
+        city_id = get_city_id(session, row["city"])
         listing = models.ListingsCore(
             listing_id=row["listing_id"],
             host_id=row["host_id"],
@@ -202,34 +209,29 @@ def populate_listings_core(session, df):
             maximum_nights=row["maximum_nights"],
             has_availability=row["has_availability"],
             instant_bookable=row["instant_bookable"],
-            neighborhood_id=get_neighborhood_id(session, row["neighborhood"]),
-            city_id=get_city_id(session, row["city"]),
+            neighborhood_id=get_neighborhood_id(session, city_id, row["neighborhood"]),
+            city_id=city_id,
             # license=row["license"],
         )
         session.add(listing)
 
 
 def populate_listings_availability(session, df):
-    for _, row in df.iterrows():
-        availability = models.ListingsAvailability(
-            listing_id=row["listing_id"],
-            availability_30=row["availability_30"],
-            availability_60=row["availability_60"],
-            availability_90=row["availability_90"],
-            availability_365=row["availability_365"],
-        )
-        session.add(availability)
+    # Packed into one row of arrays per city; a row per listing made the database too large for GitHub
+    store_availability(session, df[["listing_id", "city", *AVAILABILITY_WINDOWS]])
 
 
-# def populate_listings_location(session, df):
-#     for _, row in df.iterrows():
-#         location = models.ListingsLocation(
-#             listing_id=row["listing_id"],
-#             neighborhood_id=get_neighborhood_id(session, row["neighborhood"]),
-#             # latitude=row["latitude"],  # not used in the app (makes DB too large for GitHub)
-#             # longitude=row["longitude"],  # not used in the app (makes DB too large for GitHub)
-#         )
-#         session.add(location)
+def populate_listings_location(session, df):
+    # Bulk inserted like the amenities; then every listing with coordinates is indexed for spatial lookups
+    locations = df.dropna(subset=["latitude", "longitude"])[
+        ["listing_id", "latitude", "longitude"]
+    ]
+    session.bulk_insert_mappings(
+        models.ListingsLocation, locations.to_dict(orient="records")
+    )
+    session.commit()
+
+    index_locations(session)
 
 
 def populate_listings_reviews_summary(session, df):
@@ -254,12 +256,13 @@ def populate_listings_reviews_summary(session, df):
 
 def populate_listings_tables(session, df):
     populate_listings_core(session, df)
-    # populate_listings_availability(session, df) # not used in the app (makes DB too large for GitHub)
-    # populate_listings_location(session, df)
     populate_listings_reviews_summary(session, df)
 
     session.commit()
 
+    populate_listings_location(session, df)
+    populate_listings_availability(session, df)
+
 
 def populate_amenity_tables(session: Session):
     """Populate Amenities and AmenityCategories tables with predefined data."""
@@ -355,3 +358,34 @@ def update_listing_active_quarters(session):
                 models.ListingsCore.listing_id.in_(chunk)
             ).update({column_map[i]: 1}, synchronize_session="fetch")
             session.commit()
+
+
+def stamp_scrape_date(session, df):
+    """
+    Record the date the listings were scraped, the latest `last_scraped` of the CSVs, in BuildMetadata.
+
+    Charts measure ages up to this date (see charts.overview_data.dataset_as_of_date).
+    """
+    scraped = pd.to_datetime(df["last_scraped"], errors="coerce").max()
+    if pd.isna(scraped):
+        print("No last_scraped dates in the listings; the scrape date is not stamped.")
+        return
+    session.merge(
+        models.BuildMetadata(key="scrape_date", value=scraped.date().isoformat())
+    )
+    session.commit()
+
+
+def stamp_dataset_version(session):
+    """
+    Record a new dataset version in BuildMetadata.
+
+    Every build gets a fresh version, so caches keyed on it (see database.query_cache) drop the results of the
+    previous database as soon as the new file is deployed.
+    """
+    for key, value in {
+        "dataset_version": uuid.uuid4().hex,
+        "built_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+    }.items():
+        session.merge(models.BuildMetadata(key=key, value=value))
+    session.commit()
@@ -1,63 +1,64 @@
-import json
-import os  # Import the os module to use file deletion function
+import sys
+import time
 
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from charts import overview_data, pricing_data, reviews_data
+from charts.store import write_shards
+from constants import CITIES
+from database.engine import BUILD, create_session
 
-from charts.overview_charts import *
-from charts.pricing_charts import *
-from charts.reviews_charts import *
-from constants import CITIES, DATABASE_PATH
+# Data producer of each chart, keyed by the name of the chart function that renders it in the app. The build only
+# runs the producers, so it never builds Altair specs or imports Altair.
+CHART_PRODUCERS = {
+    "chart_active_listings_hosts_age": overview_data.active_listings_hosts_age_data,
+    "chart_room_types": overview_data.room_types_data,
+    "chart_neighborhood_listings_count": overview_data.neighborhood_listings_count_data,
+    "chart_median_neighborhood_prices": pricing_data.median_neighborhood_prices_data,
+    "chart_mean_room_type_prices": pricing_data.mean_room_type_prices_data,
+    "chart_review_scores_price_correlation": reviews_data.review_scores_price_correlation_data,
+    "chart_review_scores_superhost": reviews_data.review_scores_superhost_data,
+}
 
+CHARTS = list(CHART_PRODUCERS)
 
-def main(charts):
-    # File path to the JSON file
-    file_path = "data/charts_data.json"
 
-    # Checking if the file exists, and if it does, deleting it
-    if os.path.exists(file_path):
-        os.remove(file_path)
+def chart_data_values(chart_name, session, city):
+    source = CHART_PRODUCERS[chart_name](session, city)
+
+    if source is None or source.empty:
+        print(f"No chart data generated for {chart_name} in city: {city}")
+        return None
 
-    DATABASE_URI = "sqlite:///" + DATABASE_PATH
+    return source
 
-    engine = create_engine(
-        DATABASE_URI, echo=False
-    )  # echo=True will show generated SQL, remove in production
-    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
-    # Assuming session is already created and connected to your database
-    session = SessionLocal()
+def main(charts):
+    session = create_session(BUILD)
 
     cities = CITIES
 
+    start = time.perf_counter()
     charts_data_values = {}
-    for chart_func in charts:
+    for chart_name in charts:
         for city in cities:
-            chart = chart_func(session, city)
+            charts_data_values[(chart_name, city)] = chart_data_values(
+                chart_name, session, city
+            )
+    print(f"Produced chart data in {time.perf_counter() - start:.1f}s")
+
+    write_shards(charts_data_values, replace=True)
+    session.close()
 
-            chart_func_name = chart_func.__name__
-            if chart is not None:
-                chart_dict = chart.to_dict(format="vega")
-                # Extracting the ["data"][0]["values"]
-                chart_data_values = chart_dict.get("data", [{}])[0].get("values", {})
-                charts_data_values[f"{chart_func_name}_{city}"] = chart_data_values
-            else:
-                print(f"No chart generated for city: {city}")
-                charts_data_values[f"{chart_func_name}_{city}"] = None
 
-    # Saving all chart data values to a JSON file
-    with open(file_path, "w") as file:
-        json.dump(charts_data_values, file)
+def rebuild_shard(chart_name, city):
+    """Regenerate the stored data of one chart for one city, leaving the other shards as they are."""
+    session = create_session(BUILD)
+    write_shards({(chart_name, city): chart_data_values(chart_name, session, city)})
+    session.close()
 
 
 if __name__ == "__main__":
-    charts = [
-        chart_active_listings_hosts_age,
-        chart_room_types,
-        chart_neighborhood_listings_count,
-        chart_median_neighborhood_prices,
-        chart_mean_room_type_prices,
-        chart_review_scores_price_correlation,
-        chart_review_scores_superhost,
-    ]
-    main(charts)
+    # Usage: generate_chart_data.py [<chart name> <city>]
+    if len(sys.argv) == 3:
+        rebuild_shard(sys.argv[1], sys.argv[2])
+    else:
+        main(CHARTS)
@@ -0,0 +1,115 @@
+"""
+Per-cell listing aggregates on each city's hexagonal grid, at every resolution of charts/hex_grid.py.
+
+Listings are binned by their coordinates (ListingsLocation) in NumPy, one city and resolution at a time; only cells
+holding listings are stored.
+
+Usage: generate_hex_cell_stats.py
+"""
+
+import pandas as pd
+from sqlalchemy import insert
+
+from charts.hex_grid import RESOLUTIONS, hex_bin, project, reference_latitude
+from database.models import Hosts, HexCellStats, ListingsCore, ListingsLocation
+from database.session import SessionLocal, engine, init_db
+
+
+def listing_locations(session):
+    """
+    Listings with coordinates, counted through their host like the neighborhood stats.
+
+    Returns:
+    - DataFrame with city_id, latitude, longitude, price and superhost columns.
+    """
+    query = (
+        session.query(
+            ListingsCore.city_id,
+            ListingsLocation.latitude,
+            ListingsLocation.longitude,
+            ListingsCore.price,
+            Hosts.host_is_superhost,
+        )
+        .join(ListingsLocation, ListingsLocation.listing_id == ListingsCore.listing_id)
+        .join(Hosts, Hosts.host_id == ListingsCore.host_id)
+        .filter(
+            ListingsLocation.latitude.is_not(None),
+            ListingsLocation.longitude.is_not(None),
+        )
+    )
+    listings = pd.DataFrame(
+        query.all(),
+        columns=["city_id", "latitude", "longitude", "price", "superhost"],
+    )
+    listings["superhost"] = listings["superhost"] == 1
+    return listings
+
+
+def hex_cell_stats_frame(session):
+    """
+    Aggregate the listings of every grid cell.
+
+    Returns:
+    - DataFrame with one row per city, resolution and cell that has listings, with the HexCellStats columns.
+    """
+    listings = listing_locations(session)
+
+    frames = []
+    for city_id, city_listings in listings.groupby("city_id"):
+        reference = reference_latitude(city_listings["latitude"])
+        x, y = project(
+            city_listings["latitude"].to_numpy(),
+            city_listings["longitude"].to_numpy(),
+            reference,
+        )
+        for cell_size in RESOLUTIONS.values():
+            q, r = hex_bin(x, y, cell_size)
+            cells = (
+                city_listings.assign(q=q, r=r)
+                .groupby(["q", "r"], as_index=False)
+                .agg(
+                    listing_count=("price", "size"),
+                    median_price=("price", "median"),
+                    superhost_share=("superhost", "mean"),
+                )
+            )
+            cells["superhost_share"] *= 100
+            cells["city_id"] = city_id
+            cells["cell_size_meters"] = cell_size
+            cells["reference_latitude"] = reference
+            frames.append(cells)
+
+    if not frames:
+        return pd.DataFrame(
+            columns=[column.name for column in HexCellStats.__table__.columns]
+        )
+    return pd.concat(frames, ignore_index=True)
+
+
+def generate_hex_cell_stats(session):
+    # Clearing all records from HexCellStats table
+    session.query(HexCellStats).delete()
+
+    stats = hex_cell_stats_frame(session)
+
+    # NaN (no prices) is stored as NULL
+    records = stats.astype(object).where(stats.notna(), None).to_dict("records")
+    if records:
+        session.execute(insert(HexCellStats), records)
+    session.commit()
+
+    for cell_size in RESOLUTIONS.values():
+        print(
+            f"{cell_size:,} m cells: {(stats['cell_size_meters'] == cell_size).sum():,} with listings"
+        )
+    print(f"Stored stats of {len(records):,} grid cells in HexCellStats.")
+
+
+if __name__ == "__main__":
+    # The table only holds derived rows; recreating it adds the columns declared since it was built
+    HexCellStats.__table__.drop(bind=engine, checkfirst=True)
+    init_db()
+
+    session = SessionLocal()
+    generate_hex_cell_stats(session)
+    session.close()
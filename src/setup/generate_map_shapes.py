@@ -0,0 +1,186 @@
+"""
+Build simplified neighborhood shapes for the Maps page.
+
+Each city's full-resolution neighbourhoods.geojson under data/usa/ is simplified to SIMPLIFY_TOLERANCE (in degrees),
+snapped to a GRID_SIZE coordinate grid and written as compact GeoJSON to data/maps/. The build reports the size
+reduction and the parse-time improvement of every city.
+
+Borders are simplified as shared arcs, as TopoJSON does, rather than polygon by polygon: the boundaries of all
+neighborhoods are merged into a network of arcs between junctions, each arc is simplified once, and the faces of
+the simplified network are reassigned to the neighborhoods they fall in. Neighboring shapes therefore keep the same
+border, without the gaps and overlaps of simplifying each polygon separately.
+
+Usage: generate_map_shapes.py [<city> ...]
+"""
+
+import json
+import os
+import sys
+import time
+
+import geopandas as gpd
+import numpy as np
+import shapely
+
+from charts.map_shapes import (
+    MAPS_DIR,
+    SOURCE_DIR,
+    simplified_shapes_path,
+    source_shapes_path,
+)
+
+# About 11 m at the equator, well below what a city-wide map can show
+SIMPLIFY_TOLERANCE = 0.0001
+
+# Coordinates are quantized to about 1 m
+GRID_SIZE = 0.00001
+
+# Shapely type ids of Polygon and MultiPolygon
+POLYGON_TYPE_IDS = [3, 6]
+
+# Parses timed per file when reporting load times
+TIMING_RUNS = 5
+
+
+def polygonal_parts(geometries):
+    """Repair geometries and keep their polygons; make_valid can turn a self-touching ring into lines and points."""
+    repaired = []
+    for geometry in shapely.make_valid(geometries):
+        parts = shapely.get_parts(geometry)
+        polygons = parts[np.isin(shapely.get_type_id(parts), POLYGON_TYPE_IDS)]
+        repaired.append(shapely.union_all(polygons))
+    return np.array(repaired)
+
+
+def simplify_shared_borders(geometries):
+    """
+    Simplify a set of neighboring polygons along their shared arcs.
+
+    Parameters:
+    - geometries: Array of valid polygons or multipolygons.
+
+    Returns:
+    - Array of simplified geometries aligned with `geometries`, on the GRID_SIZE grid; empty where a shape collapsed
+      below the grid size.
+    """
+    # Merging the boundaries splits them at every junction, so each arc borders the same neighborhoods end to end
+    network = shapely.line_merge(shapely.union_all(shapely.boundary(geometries)))
+    arcs = shapely.simplify(
+        shapely.get_parts(network), SIMPLIFY_TOLERANCE, preserve_topology=True
+    )
+
+    # Snapping and unioning the simplified arcs nodes any crossings, so the network polygonizes cleanly
+    noded = shapely.union_all(arcs, grid_size=GRID_SIZE)
+    faces = shapely.get_parts(shapely.polygonize(shapely.get_parts(noded)))
+
+    face_indices, geometry_indices = shapely.STRtree(geometries).query(
+        shapely.point_on_surface(faces), predicate="within"
+    )
+    simplified = np.array(
+        [
+            shapely.union_all(
+                faces[face_indices[geometry_indices == index]], grid_size=GRID_SIZE
+            )
+            for index in range(len(geometries))
+        ]
+    )
+
+    # A sliver narrower than the tolerance loses every face; it is simplified on its own instead, so no neighborhood
+    # disappears from the map
+    collapsed = shapely.is_empty(simplified)
+    simplified[collapsed] = shapely.set_precision(
+        shapely.simplify(
+            geometries[collapsed], SIMPLIFY_TOLERANCE, preserve_topology=True
+        ),
+        GRID_SIZE,
+    )
+    return simplified
+
+
+def simplify_shapes(geojson):
+    """
+    Simplify and quantize the features of a GeoJSON FeatureCollection.
+
+    Returns:
+    - A FeatureCollection dict with the same properties and simplified geometries.
+    """
+    shapes = gpd.GeoDataFrame.from_features(geojson["features"])
+    # Some source polygons are invalid (e.g. self-touching rings), which the boundary network cannot be built from
+    geometries = polygonal_parts(shapes.geometry.values)
+    shapes = shapes.set_geometry(
+        gpd.GeoSeries(simplify_shared_borders(geometries), index=shapes.index)
+    )
+
+    # Shapes that collapse below the grid size are dropped rather than drawn as empty features
+    shapes = shapes[~shapes.geometry.is_empty]
+
+    return shapes.__geo_interface__
+
+
+def parse_seconds(path):
+    """Median time to read and parse a GeoJSON file."""
+    timings = []
+    for _ in range(TIMING_RUNS):
+        start = time.perf_counter()
+        with open(path, "r") as file:
+            json.load(file)
+        timings.append(time.perf_counter() - start)
+    return sorted(timings)[len(timings) // 2]
+
+
+def generate_city_shapes(city):
+    """
+    Write the simplified shapes of a city.
+
+    Returns:
+    - Dict with the source and simplified sizes in bytes and parse times in seconds.
+    """
+    source_path = source_shapes_path(city)
+    with open(source_path, "r") as file:
+        geojson = json.load(file)
+
+    simplified = simplify_shapes(geojson)
+    # Drop the bounding boxes geopandas adds; the page does not use them
+    simplified.pop("bbox", None)
+    for feature in simplified["features"]:
+        feature.pop("bbox", None)
+        feature.pop("id", None)
+
+    path = simplified_shapes_path(city)
+    with open(path, "w") as file:
+        json.dump(simplified, file, separators=(",", ":"))
+
+    return {
+        "source_bytes": os.path.getsize(source_path),
+        "simplified_bytes": os.path.getsize(path),
+        "source_seconds": parse_seconds(source_path),
+        "simplified_seconds": parse_seconds(path),
+    }
+
+
+def main(cities):
+    os.makedirs(MAPS_DIR, exist_ok=True)
+
+    total_source = total_simplified = 0
+    for city in cities:
+        report = generate_city_shapes(city)
+        total_source += report["source_bytes"]
+        total_simplified += report["simplified_bytes"]
+
+        print(
+            f"{city}: {report['source_bytes'] / 1024:.0f} KB -> "
+            f"{report['simplified_bytes'] / 1024:.0f} KB "
+            f"({1 - report['simplified_bytes'] / report['source_bytes']:.0%} smaller), "
+            f"parse {report['source_seconds'] * 1000:.1f} ms -> "
+            f"{report['simplified_seconds'] * 1000:.1f} ms"
+        )
+
+    if total_source:
+        print(
+            f"Total: {total_source / 1024:.0f} KB -> {total_simplified / 1024:.0f} KB "
+            f"({1 - total_simplified / total_source:.0%} smaller)"
+        )
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:] or sorted(os.listdir(SOURCE_DIR)))
@@ -0,0 +1,114 @@
+import pandas as pd
+from sqlalchemy import insert
+
+from database.models import (
+    Cities,
+    Hosts,
+    ListingsCore,
+    ListingsReviewsSummary,
+    Neighborhoods,
+    NeighborhoodStats,
+)
+from database.session import SessionLocal, engine, init_db
+from setup.assign_neighborhoods import neighborhood_areas
+
+
+def neighborhood_stats_frame(session):
+    """
+    Aggregate the listings of every neighborhood.
+
+    Listings are counted the way the map always has: through their host, so listings without a host row are left
+    out.
+
+    Returns:
+    - DataFrame with one row per neighborhood that has listings, with the NeighborhoodStats columns.
+    """
+    query = (
+        session.query(
+            Neighborhoods.neighborhood_id,
+            Neighborhoods.city_id,
+            Neighborhoods.neighborhood,
+            ListingsCore.price,
+            ListingsCore.was_active_most_recent_quarter,
+            Hosts.host_is_superhost,
+            ListingsReviewsSummary.review_scores_rating,
+        )
+        .join(
+            ListingsCore, ListingsCore.neighborhood_id == Neighborhoods.neighborhood_id
+        )
+        .join(Hosts, Hosts.host_id == ListingsCore.host_id)
+        .outerjoin(
+            ListingsReviewsSummary,
+            ListingsReviewsSummary.listing_id == ListingsCore.listing_id,
+        )
+    )
+
+    listings = pd.DataFrame(
+        query.all(),
+        columns=[
+            "neighborhood_id",
+            "city_id",
+            "neighborhood",
+            "price",
+            "active",
+            "superhost",
+            "rating",
+        ],
+    )
+    listings["active"] = listings["active"] == 1
+    listings["superhost"] = listings["superhost"] == 1
+
+    stats = listings.groupby(
+        ["neighborhood_id", "city_id", "neighborhood"], as_index=False
+    ).agg(
+        listing_count=("price", "size"),
+        active_listing_count=("active", "sum"),
+        superhost_listing_count=("superhost", "sum"),
+        median_price=("price", "median"),
+        mean_rating=("rating", "mean"),
+    )
+    stats["superhost_share"] = (
+        stats["superhost_listing_count"] / stats["listing_count"] * 100
+    )
+
+    # Areas are measured on the polygons listings were assigned by (setup/assign_neighborhoods.py)
+    areas = {
+        (city_id, neighborhood): area
+        for city_id, city in session.query(Cities.city_id, Cities.city)
+        for neighborhood, area in neighborhood_areas(city).items()
+    }
+    stats["area_square_km"] = pd.to_numeric(
+        pd.Series(
+            [areas.get(key) for key in zip(stats["city_id"], stats["neighborhood"])],
+            index=stats.index,
+            dtype=object,
+        )
+    )
+    stats["listing_density"] = stats["listing_count"] / stats["area_square_km"]
+
+    return stats
+
+
+def generate_neighborhood_stats(session):
+    # Clearing all records from NeighborhoodStats table
+    session.query(NeighborhoodStats).delete()
+
+    stats = neighborhood_stats_frame(session)
+
+    # NaN (no prices or ratings) is stored as NULL
+    records = stats.astype(object).where(stats.notna(), None).to_dict("records")
+    if records:
+        session.execute(insert(NeighborhoodStats), records)
+    session.commit()
+
+    print(f"Stored stats of {len(records)} neighborhoods in NeighborhoodStats.")
+
+
+if __name__ == "__main__":
+    # The table only holds derived rows; recreating it adds the columns declared since it was built
+    NeighborhoodStats.__table__.drop(bind=engine, checkfirst=True)
+    init_db()
+
+    session = SessionLocal()
+    generate_neighborhood_stats(session)
+    session.close()
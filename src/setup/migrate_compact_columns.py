@@ -0,0 +1,184 @@
+"""
+Migrate a database built with ISO date strings and REAL review scores to the compact column types of the models.
+
+Hosts.host_since and ListingsReviewsSummary.first_review and last_review become day numbers (models.DayNumber), and
+the review scores become hundredths (models.ScaledScore). SQLite cannot change the type of a column, so every table
+with such a column is rebuilt:
+
+1. the old table is renamed (with `legacy_alter_table`, so the foreign keys of other tables keep naming it) and its
+   indexes dropped;
+2. the table is created from the models and the rows copied, converting the values in SQL;
+3. the old table is dropped and the indexes declared on the table created.
+
+The file is then vacuumed and a new dataset version stamped, since raw SQL on the converted columns now returns
+different values. Tables already in the compact layout are left as they are.
+
+Usage: migrate_compact_columns.py [<database path>]
+"""
+
+import os
+import sys
+
+from sqlalchemy.dialects import sqlite
+from sqlalchemy.schema import CreateIndex, CreateTable
+
+from constants import DATABASE_PATH
+from database.engine import BUILD, connect, create_session
+from database.models import Base, BuildMetadata, DayNumber, ScaledScore
+from setup.db_populating import stamp_dataset_version
+
+# SQL converting a legacy value to the compact encoding, and back
+ENCODE = {
+    DayNumber: "CAST(julianday({column}) - 2440587.5 AS INTEGER)",
+    ScaledScore: "CAST(ROUND({column} * 100) AS INTEGER)",
+}
+DECODE = {
+    DayNumber: "date({column} * 86400, 'unixepoch')",
+    ScaledScore: "{column} / 100.0",
+}
+
+
+def compact_columns():
+    """
+    Returns:
+    - Dict mapping each table with a compact column to a dict of those columns and their type class.
+    """
+    tables = {}
+    for table in Base.metadata.sorted_tables:
+        for column in table.columns:
+            if type(column.type) in ENCODE:
+                tables.setdefault(table.name, {})[column.name] = type(column.type)
+    return tables
+
+
+def declared_types(connection, table):
+    return dict(
+        connection.execute(
+            "SELECT name, type FROM pragma_table_info(?)", (table,)
+        ).fetchall()
+    )
+
+
+def is_compact(connection, table):
+    """Whether every compact column of a table is declared with the type of its model, i.e. already migrated."""
+    dialect = sqlite.dialect()
+    declared = declared_types(connection, table)
+    return all(
+        declared.get(column.name) == column.type.compile(dialect=dialect)
+        for column in Base.metadata.tables[table].columns
+        if type(column.type) in ENCODE
+    )
+
+
+def legacy_values(connection, table):
+    """
+    SQL expressions reading each column of a table with its legacy values (date strings and REAL scores), whichever
+    layout the table has.
+    """
+    columns = compact_columns().get(table, {})
+    compact = is_compact(connection, table)
+    return {
+        column.name: (
+            DECODE[columns[column.name]].format(column=f'"{column.name}"')
+            if compact and column.name in columns
+            else f'"{column.name}"'
+        )
+        for column in Base.metadata.tables[table].columns
+    }
+
+
+def rebuild_table(connection, table_name, columns):
+    """Rebuild a table in the layout of its model, encoding the given compact columns."""
+    dialect = sqlite.dialect()
+    table = Base.metadata.tables[table_name]
+    legacy_name = f"{table_name}_legacy"
+
+    connection.execute(f'ALTER TABLE "{table_name}" RENAME TO "{legacy_name}"')
+    for (index,) in connection.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = ? "
+        "AND name NOT LIKE 'sqlite_autoindex_%'",
+        (legacy_name,),
+    ).fetchall():
+        connection.execute(f'DROP INDEX "{index}"')
+
+    connection.execute(str(CreateTable(table).compile(dialect=dialect)))
+
+    names = [f'"{column.name}"' for column in table.columns]
+    values = [
+        (
+            ENCODE[columns[column.name]].format(column=name)
+            if column.name in columns
+            else name
+        )
+        for column, name in zip(table.columns, names)
+    ]
+    connection.execute(
+        f'INSERT INTO "{table_name}" ({", ".join(names)}) '
+        f'SELECT {", ".join(values)} FROM "{legacy_name}"'
+    )
+
+    connection.execute(f'DROP TABLE "{legacy_name}"')
+    for index in table.indexes:
+        connection.execute(str(CreateIndex(index).compile(dialect=dialect)))
+
+
+def migrate(path=DATABASE_PATH):
+    """
+    Returns:
+    - Names of the tables that were rebuilt.
+    """
+    connection = connect(BUILD, path)
+    # Explicit transactions: the rebuild of every table commits or rolls back as a whole
+    connection.isolation_level = None
+
+    pending = {
+        table: columns
+        for table, columns in compact_columns().items()
+        if not is_compact(connection, table)
+    }
+    if not pending:
+        connection.close()
+        return []
+
+    connection.execute("PRAGMA legacy_alter_table = ON")
+    connection.execute("BEGIN")
+    try:
+        for table, columns in pending.items():
+            print(f"Rebuilding {table}: encoding {', '.join(columns)}")
+            rebuild_table(connection, table, columns)
+        connection.execute("COMMIT")
+    except Exception:
+        connection.execute("ROLLBACK")
+        raise
+    finally:
+        connection.execute("PRAGMA legacy_alter_table = OFF")
+
+    connection.execute("VACUUM")
+    connection.close()
+    return list(pending)
+
+
+def main(path=DATABASE_PATH):
+    size_before = os.path.getsize(path)
+    rebuilt = migrate(path)
+    if not rebuilt:
+        print(f"{path} already uses the compact column types.")
+        return
+
+    session = create_session(BUILD, path)
+    try:
+        # Databases built before the dataset version was recorded have no metadata table yet
+        BuildMetadata.__table__.create(bind=session.get_bind(), checkfirst=True)
+        stamp_dataset_version(session)
+    finally:
+        session.close()
+
+    size_after = os.path.getsize(path)
+    print(
+        f"Migrated {', '.join(rebuilt)}: {size_before / 1_048_576:.1f} MiB -> "
+        f"{size_after / 1_048_576:.1f} MiB ({size_after / size_before:.0%})"
+    )
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:2])
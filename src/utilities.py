@@ -1,14 +1,85 @@
 import base64
+import hashlib
 import json
+import os
+import threading
+import time
+
+CHARTS_DATA_PATH = "data/charts_data.json"
+
+
+class JsonFileCache:
+    """
+    Process-wide cache of a parsed JSON file, shared by every Streamlit session.
+
+    Used for the legacy charts data file, the chart-data manifest (charts/store.py) and the neighborhood shapes
+    (charts/map_shapes.py). The file is parsed once and re-parsed only when its contents change: a cheap stat on
+    each call detects a new modification time or size, and a content hash then decides whether the file actually
+    differs.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._values = None
+        self._signature = None
+        self._digest = None
+        self.loads = 0
+        self.hits = 0
+        self.last_load_seconds = None
+        self.total_load_seconds = 0.0
+
+    def get(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            with self._lock:
+                self._values = self._signature = self._digest = None
+            return None
+
+        signature = (stat.st_mtime_ns, stat.st_size)
+
+        with self._lock:
+            if signature == self._signature:
+                self.hits += 1
+                return self._values
+
+            start = time.perf_counter()
+            with open(self.path, "rb") as file:
+                raw = file.read()
+            digest = hashlib.sha256(raw).hexdigest()
+
+            # Touched but unchanged files keep the parsed values
+            if digest != self._digest:
+                self._values = json.loads(raw)
+                self._digest = digest
+                self.loads += 1
+                self.last_load_seconds = time.perf_counter() - start
+                self.total_load_seconds += self.last_load_seconds
+                print(f"Loaded {self.path} in {self.last_load_seconds * 1000:.1f} ms")
+            else:
+                self.hits += 1
+
+            self._signature = signature
+            return self._values
+
+    def stats(self):
+        return {
+            "loads": self.loads,
+            "hits": self.hits,
+            "last_load_seconds": self.last_load_seconds,
+            "total_load_seconds": self.total_load_seconds,
+        }
+
+
+_chart_data_cache = JsonFileCache(CHARTS_DATA_PATH)
 
 
 def load_chart_data_from_file(chart_name):
-    try:
-        with open("data/charts_data.json", "r") as file:
-            charts_data_values = json.load(file)
-            return charts_data_values.get(chart_name, None)
-    except FileNotFoundError:
+    charts_data_values = _chart_data_cache.get()
+    if charts_data_values is None:
         return None
+    return charts_data_values.get(chart_name, None)
 
 
 def get_image_with_encoding(image_path):